@@ -9,11 +9,70 @@ from .settings import *
 __all__ = [
     'EMBEDDING_MODEL',
     'LLM_MODEL', 
+    'STREAM_RESPONSES',
+    'LLM_MAX_CONCURRENCY',
+    'LLM_CLIENT_CACHE_SIZE',
+    'EMBEDDING_WARMUP',
+    'EMBEDDING_CACHE_ENABLED',
+    'EMBEDDING_CACHE_PATH',
+    'EMBEDDING_CACHE_MAX_ENTRIES',
+    'EMBED_MAX_BATCH_SIZE',
+    'EMBED_BATCH_TOKENS',
+    'EMBED_MAX_SEQ_TOKENS',
+    'EMBED_THREADS',
+    'EMBED_NORMALIZE',
     'CHUNK_SIZE',
     'CHUNK_OVERLAP',
+    'PDF_PARSE_WORKERS',
+    'STREAMING_INGESTION',
+    'INGEST_BATCH_SIZE',
+    'BACKGROUND_INGESTION',
+    'INGEST_WORKERS',
+    'INGEST_POLL_SECONDS',
+    'VECTOR_STORE_BACKEND',
+    'VECTOR_STORE_DTYPE',
+    'SHARDED_INDEX_PATH',
+    'SHARD_SIZE',
+    'SHARD_SEARCH_WORKERS',
+    'CORPUS_SHARING_ENABLED',
+    'CORPUS_MAX_UNREFERENCED_FILES',
+    'CORPUS_MAX_CHUNKS',
+    'RETRIEVAL_MODE',
+    'RETRIEVER_K',
+    'HYBRID_FETCH_K',
+    'RRF_K',
+    'CONTEXT_PACKING_ENABLED',
+    'CONTEXT_TOKEN_BUDGET',
+    'CONTEXT_MMR_ENABLED',
+    'CONTEXT_MMR_LAMBDA',
+    'CONTEXT_MIN_OVERLAP_CHARS',
+    'REWRITE_CACHE_SIZE',
+    'REWRITE_MIN_WORDS',
+    'SPECULATIVE_RETRIEVAL',
+    'SPECULATIVE_REUSE_SIMILARITY',
+    'SPECULATIVE_WORKERS',
+    'SESSION_STORE_BACKEND',
+    'SESSION_DB_PATH',
+    'SESSION_DB_POOL_SIZE',
+    'SESSION_HISTORY_WINDOW',
+    'SESSION_IDLE_SECONDS',
+    'SESSION_CACHE_MAX_SESSIONS',
+    'HISTORY_MODE',
+    'HISTORY_TOKEN_BUDGET',
+    'HISTORY_KEEP_TURNS',
+    'HISTORY_SUMMARY_MAX_SESSIONS',
+    'ANSWER_CACHE_ENABLED',
+    'ANSWER_CACHE_SIMILARITY_THRESHOLD',
+    'ANSWER_CACHE_MAX_ENTRIES',
+    'ANSWER_CACHE_TTL_SECONDS',
+    'TRACING_ENABLED',
+    'TRACE_HISTORY_SIZE',
+    'TRACE_LOG_ENABLED',
+    'TRACE_PROMETHEUS_PATH',
+    'TRACE_DEBUG_PANEL',
     'CONTEXTUALIZE_Q_SYSTEM_PROMPT',
+    'SUMMARIZE_HISTORY_PROMPT',
     'QA_SYSTEM_PROMPT',
-    'TEMP_PDF_PATH',
     'HF_TOKEN',
     'GROQ_API_KEY'
 ] 
\ No newline at end of file
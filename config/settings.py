@@ -7,11 +7,102 @@ load_dotenv()
 # Model Configuration
 EMBEDDING_MODEL = "all-MiniLM-L6-v2"
 LLM_MODEL = "Gemma2-9b-It"
+STREAM_RESPONSES = True  # Render answer tokens as they are generated
+LLM_MAX_CONCURRENCY = 8  # LLM calls in flight at once in the headless serving layer
+LLM_CLIENT_CACHE_SIZE = 16  # Groq clients kept for reuse (one per API key); least recently used are dropped
+# Load the embedding model in the background when the app starts
+EMBEDDING_WARMUP = True
+
+# Embedding Cache Configuration
+EMBEDDING_CACHE_ENABLED = True
+EMBEDDING_CACHE_PATH = "./.cache/embeddings.sqlite"
+EMBEDDING_CACHE_MAX_ENTRIES = 200000  # Least recently used vectors are evicted beyond this
+
+# Embedding Engine Configuration
+EMBED_MAX_BATCH_SIZE = 64  # Most chunks per model call
+EMBED_BATCH_TOKENS = 8192  # Padded tokens per batch (batch size x longest chunk), so long chunks get smaller batches
+# Input length at which the embedding model truncates; None reads it from the model (max_seq_length).
+# Length-sorted batching only helps for chunks shorter than this: longer ones are all cut to it
+EMBED_MAX_SEQ_TOKENS = None
+EMBED_THREADS = None  # Intra-op threads per embedding call; None splits the cores between INGEST_WORKERS jobs
+EMBED_NORMALIZE = True  # L2-normalize vectors so distance ranking equals cosine ranking
 
 # Text Processing Configuration
 CHUNK_SIZE = 5000
 CHUNK_OVERLAP = 500
 
+# PDF Parsing Configuration
+PDF_PARSE_WORKERS = os.cpu_count() or 1  # Worker processes for parsing uploads (1 = no pool)
+
+# Ingestion Configuration
+STREAMING_INGESTION = False  # Parse, split, embed and store page by page with bounded memory
+INGEST_BATCH_SIZE = 64  # Chunks embedded and written per batch in streaming mode
+BACKGROUND_INGESTION = True  # Index uploads in a worker thread while the page stays responsive
+INGEST_WORKERS = 2  # Threads running ingestion jobs, shared by every session in the process
+INGEST_POLL_SECONDS = 0.5  # How often the page refreshes ingestion progress
+
+# Vector Store Configuration
+VECTOR_STORE_BACKEND = "chroma"  # "chroma", "numpy" (lightweight in-process arrays) or "sharded" (on-disk, memory-mapped)
+# float16 and int8 halve or quarter vector memory, but every query widens each block back to float32
+# (NumPy has no fast float16 matrix product), so scoring is several times slower, about 15x for float16;
+# keep float32 when query latency matters more than memory
+VECTOR_STORE_DTYPE = "float32"  # numpy/sharded backend precision: "float32", "float16" or "int8"
+
+# Sharded Index Configuration
+SHARDED_INDEX_PATH = "./.cache/index"  # Shard files and chunk database of the persistent "sharded" backend
+SHARD_SIZE = 50000  # Chunks per memory-mapped shard file
+SHARD_SEARCH_WORKERS = os.cpu_count() or 1  # Threads scanning shards in parallel
+
+# Corpus Sharing Configuration
+CORPUS_SHARING_ENABLED = True  # Sessions uploading identical documents share one indexed copy
+CORPUS_MAX_UNREFERENCED_FILES = 20  # Documents no session uses that stay indexed for quick re-upload
+CORPUS_MAX_CHUNKS = 200000  # Unused documents are evicted (least recently used first) beyond this
+
+# Retrieval Configuration
+RETRIEVAL_MODE = "hybrid"  # "hybrid" (BM25 + dense, reciprocal rank fusion) or "dense"
+RETRIEVER_K = 4  # Chunks passed to the answer prompt
+HYBRID_FETCH_K = 20  # Candidates taken from each of the dense and lexical rankings
+RRF_K = 60  # Reciprocal rank fusion damping constant
+
+# Context Packing Configuration
+CONTEXT_PACKING_ENABLED = True  # Deduplicate and budget retrieved chunks before the QA prompt
+CONTEXT_TOKEN_BUDGET = 3000  # Approximate tokens of retrieved text in each QA prompt
+CONTEXT_MMR_ENABLED = False  # Re-rank passages with maximal marginal relevance before packing
+CONTEXT_MMR_LAMBDA = 0.7  # 1.0 = relevance only, 0.0 = diversity only
+CONTEXT_MIN_OVERLAP_CHARS = 40  # Shortest text shared by two chunks that is treated as overlap
+
+# Question Rewrite Configuration
+REWRITE_CACHE_SIZE = 256  # Memoized (history, question) -> standalone question rewrites
+REWRITE_MIN_WORDS = 4  # Follow-up questions shorter than this are always rewritten
+SPECULATIVE_RETRIEVAL = False  # Retrieve for the raw question while the LLM rewrites a follow-up
+SPECULATIVE_REUSE_SIMILARITY = 0.8  # Word overlap (Jaccard) above which a rewrite reuses the speculative results
+SPECULATIVE_WORKERS = 8  # Threads running speculative retrievals for synchronous calls
+
+# Chat History Configuration
+SESSION_STORE_BACKEND = "memory"  # "memory" (per browser tab, lost on restart) or "sqlite" (durable)
+SESSION_DB_PATH = "./.cache/sessions.sqlite"
+SESSION_DB_POOL_SIZE = 4  # Pooled SQLite connections
+SESSION_HISTORY_WINDOW = 200  # Most recent messages loaded into memory per session
+SESSION_IDLE_SECONDS = 1800  # Histories unused for this long are dropped from memory
+SESSION_CACHE_MAX_SESSIONS = 500  # Maximum histories held in memory at once
+HISTORY_MODE = "full"  # "full" injects the whole history; "summary" keeps it within a token budget
+HISTORY_TOKEN_BUDGET = 1500  # Approximate tokens of history injected into each prompt
+HISTORY_KEEP_TURNS = 3  # Most recent question/answer turns always kept verbatim
+HISTORY_SUMMARY_MAX_SESSIONS = 1000  # Rolling summaries kept in memory (least recently used are dropped)
+
+# Answer Cache Configuration
+ANSWER_CACHE_ENABLED = True  # Reuse answers to semantically equivalent questions over the same documents
+ANSWER_CACHE_SIMILARITY_THRESHOLD = 0.95  # Minimum cosine similarity between standalone questions
+ANSWER_CACHE_MAX_ENTRIES = 1000
+ANSWER_CACHE_TTL_SECONDS = 3600
+
+# Tracing Configuration
+TRACING_ENABLED = True  # Record per-stage timings, token and chunk counts and cache hits
+TRACE_HISTORY_SIZE = 50  # Finished traces kept in memory for the debug panel
+TRACE_LOG_ENABLED = False  # Log every finished trace as one JSON line (logger "rag.tracing")
+TRACE_PROMETHEUS_PATH = None  # Write Prometheus text-format metrics here after each trace
+TRACE_DEBUG_PANEL = False  # Show the debug panel in the sidebar by default
+
 # System Prompts
 CONTEXTUALIZE_Q_SYSTEM_PROMPT = (
     "Given a chat history and the latest user question "
@@ -21,6 +112,13 @@ CONTEXTUALIZE_Q_SYSTEM_PROMPT = (
     "just reformulate it if needed and otherwise return it as is."
 )
 
+SUMMARIZE_HISTORY_PROMPT = (
+    "Progressively summarize the conversation. Given the current summary "
+    "and new conversation lines, return an updated summary that keeps the "
+    "facts, names and open questions needed to continue the conversation. "
+    "Return only the summary."
+)
+
 QA_SYSTEM_PROMPT = (
     "You are an assistant for question-answering tasks. "
     "Use the following pieces of retrieved context to answer "
@@ -31,9 +129,6 @@ QA_SYSTEM_PROMPT = (
     "{context}"
 )
 
-# File Configuration
-TEMP_PDF_PATH = "./temp.pdf"
-
 # Environment Variables
 HF_TOKEN = os.getenv("HF_TOKEN")
 GROQ_API_KEY = os.getenv("GROQ_API_KEY") 
\ No newline at end of file
@@ -3,22 +3,73 @@ Mod_Custom_RAG_CH_FU_2127
 
 This package contains the modular components for the RAG application:
 - document_processor: Handles PDF processing and vectorization
+- embedding_registry: Process-wide shared embedding models
+- embedding_engine: Length-sorted, token-budgeted embedding batches
+- embedding_cache: Persistent on-disk embedding cache
+- numpy_vector_store: Compact quantized in-process vector store
+- sharded_index: Persistent memory-mapped sharded vector index
+- ingestion_worker: Background ingestion jobs with progress and cancellation
+- corpus_registry: Cross-session shared document index with reference counting
+- pdf_parser: Parallel in-memory PDF parsing
+- hybrid_retriever: BM25 inverted index and hybrid retriever
 - rag_chain: Manages the RAG pipeline and conversational chains
+- context_packer: Token-budgeted context packing with overlap deduplication
+- question_rewriter: Skips or memoizes follow-up question rewrites
+- speculative_retrieval: Retrieval overlapped with the question rewrite
+- answer_cache: Semantic answer cache for repeated questions
+- history_compressor: Token-budgeted chat history with rolling summary
 - session_manager: Handles chat history and session state
+- session_store: Durable SQLite session store
 - ui_components: Streamlit UI components
 - app: Main application orchestrator
+- serving: Headless asyncio serving layer
+- fakes: Offline fake embeddings, stub LLM and synthetic PDFs
+- benchmark: Offline end-to-end benchmark
+- tracing: Per-stage timing, counters and metrics export
 """
 
-from .document_processor import DocumentProcessor
-from .rag_chain import RAGChain
-from .session_manager import SessionManager
-from .ui_components import UIComponents
-from .app import RAGApplication
-
-__all__ = [
-    'DocumentProcessor',
-    'RAGChain', 
-    'SessionManager',
-    'UIComponents',
-    'RAGApplication'
-] 
\ No newline at end of file
+import importlib
+
+# Public names and the submodules that define them. Submodules are imported on first
+# attribute access, so "import src" does not pull in langchain, chroma or streamlit.
+_LAZY_IMPORTS = {
+    'DocumentProcessor': '.document_processor',
+    'EmbeddingRegistry': '.embedding_registry',
+    'EmbeddingEngine': '.embedding_engine',
+    'CachedEmbeddings': '.embedding_cache',
+    'NumpyVectorStore': '.numpy_vector_store',
+    'ShardedVectorStore': '.sharded_index',
+    'IngestionWorker': '.ingestion_worker',
+    'CorpusRegistry': '.corpus_registry',
+    'PDFParser': '.pdf_parser',
+    'BM25Index': '.hybrid_retriever',
+    'HybridRetriever': '.hybrid_retriever',
+    'RAGChain': '.rag_chain',
+    'ContextPacker': '.context_packer',
+    'QuestionRewriter': '.question_rewriter',
+    'SpeculativeRetrieval': '.speculative_retrieval',
+    'SemanticAnswerCache': '.answer_cache',
+    'HistoryCompressor': '.history_compressor',
+    'SessionManager': '.session_manager',
+    'SQLiteSessionStore': '.session_store',
+    'UIComponents': '.ui_components',
+    'RAGApplication': '.app',
+    'RAGService': '.serving',
+    'Tracer': '.tracing',
+    'TracingCallbackHandler': '.tracing',
+}
+
+__all__ = list(_LAZY_IMPORTS)
+
+
+def __getattr__(name):
+    """Import the submodule defining a public name on first access"""
+    if name not in _LAZY_IMPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_IMPORTS[name], __name__), name)
+    globals()[name] = value  # Later lookups skip __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,224 @@
+from collections import OrderedDict
+import itertools
+import threading
+import time
+import numpy as np
+from config.settings import (
+    ANSWER_CACHE_MAX_ENTRIES, ANSWER_CACHE_TTL_SECONDS, ANSWER_CACHE_SIMILARITY_THRESHOLD
+)
+from src.tracing import Tracer
+
+_SWEEP_INTERVAL_SECONDS = 60  # Expired answers never match; sweeping only reclaims their memory
+
+
+# Process-wide cache of answers keyed by corpus fingerprint and standalone question embedding
+class SemanticAnswerCache:
+    _shared = None  # Instance shared by every session in this process
+    _shared_lock = threading.Lock()
+
+    def __init__(self, max_entries=ANSWER_CACHE_MAX_ENTRIES, ttl_seconds=ANSWER_CACHE_TTL_SECONDS,
+                 similarity_threshold=ANSWER_CACHE_SIMILARITY_THRESHOLD,
+                 sweep_interval=_SWEEP_INTERVAL_SECONDS):
+        """
+        Initialize the answer cache
+        Args:
+            max_entries: Maximum number of cached answers (least recently used are evicted)
+            ttl_seconds: Age after which a cached answer expires
+            similarity_threshold: Minimum cosine similarity between questions for a hit
+            sweep_interval: Minimum seconds between sweeps that drop expired entries
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.sweep_interval = sweep_interval
+        self._entries = OrderedDict()  # entry id -> cached answer, least recently used first
+        self._by_corpus = {}  # corpus fingerprint -> {entry id: cached answer}
+        self._matrices = {}  # corpus fingerprint -> (entry ids, question matrix, creation times)
+        self._version = 0  # Bumped on every change, so matrices built from stale entries are not published
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._last_sweep = time.time()
+        self.stats = {"lookups": 0, "hits": 0, "stores": 0, "evictions": 0, "expirations": 0}
+
+    @classmethod
+    def get_shared(cls):
+        """
+        Get the process-wide answer cache
+        Returns:
+            Shared SemanticAnswerCache instance
+        """
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    @classmethod
+    def get_shared_stats(cls):
+        """
+        Get metrics of the process-wide answer cache
+        Returns:
+            Stats dictionary, empty until the cache is first used
+        """
+        shared = cls._shared
+        return shared.get_stats() if shared is not None else {}
+
+    @staticmethod
+    def _normalize(vector):
+        """Convert a vector to a unit-length float32 array so dot products are cosines"""
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm else array
+
+    def _remove(self, entry_id):
+        """Drop one entry from every index (caller holds the lock)"""
+        entry = self._entries.pop(entry_id)
+        corpus_entries = self._by_corpus[entry["corpus"]]
+        del corpus_entries[entry_id]
+        if not corpus_entries:
+            del self._by_corpus[entry["corpus"]]
+        self._changed(entry["corpus"])
+
+    def _changed(self, corpus_fingerprint):
+        """Discard the stacked matrix of a corpus whose entries changed (caller holds the lock)"""
+        self._matrices.pop(corpus_fingerprint, None)
+        self._version += 1
+
+    def _expire(self, now):
+        """Drop entries older than the TTL (caller holds the lock; runs at most once per sweep interval)"""
+        self._last_sweep = now
+        expired = [
+            entry_id for entry_id, entry in self._entries.items()
+            if now - entry["created"] > self.ttl_seconds
+        ]
+        for entry_id in expired:
+            self._remove(entry_id)
+        self.stats["expirations"] += len(expired)
+
+    def _corpus_matrix(self, corpus_fingerprint):
+        """
+        Get the stacked question vectors of one corpus, building them outside the lock when stale
+        Args:
+            corpus_fingerprint: Fingerprint of the indexed document set
+        Returns:
+            Tuple of (entry ids, question matrix, creation times), or None if nothing is cached
+        """
+        with self._lock:
+            matrix = self._matrices.get(corpus_fingerprint)
+            if matrix is not None:
+                return matrix
+            entries = list(self._by_corpus.get(corpus_fingerprint, {}).items())
+            version = self._version
+        if not entries:
+            return None
+
+        matrix = (
+            [entry_id for entry_id, _ in entries],
+            np.stack([entry["vector"] for _, entry in entries]),
+            np.array([entry["created"] for _, entry in entries]),
+        )
+        with self._lock:
+            # Publish only if no store, eviction or invalidation happened meanwhile
+            if self._version == version:
+                self._matrices[corpus_fingerprint] = matrix
+        return matrix
+
+    def lookup(self, corpus_fingerprint, question_vector):
+        """
+        Find a cached answer for a semantically equivalent question over the same corpus
+        Args:
+            corpus_fingerprint: Fingerprint of the indexed document set
+            question_vector: Embedding of the standalone question
+        Returns:
+            Cached entry dict ('question', 'answer', 'context', 'similarity') or None
+        """
+        query = self._normalize(question_vector)
+        now = time.time()
+        with self._lock:
+            self.stats["lookups"] += 1
+            if now - self._last_sweep >= self.sweep_interval:
+                self._expire(now)
+
+        matrix = self._corpus_matrix(corpus_fingerprint)
+        if matrix is None:
+            return None
+
+        # One vectorized pass over the cached questions for this corpus, outside the lock;
+        # entries past their TTL but not yet swept never match
+        entry_ids, vectors, created = matrix
+        similarities = vectors @ query
+        similarities[now - created > self.ttl_seconds] = -np.inf
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.similarity_threshold:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(entry_ids[best])
+            if entry is None:  # Evicted or invalidated while scanning
+                return None
+            self._entries.move_to_end(entry_ids[best])
+            self.stats["hits"] += 1
+            return {
+                "question": entry["question"],
+                "answer": entry["answer"],
+                "context": entry["context"],
+                "similarity": float(similarities[best]),
+            }
+
+    def store(self, corpus_fingerprint, question, question_vector, answer, context):
+        """
+        Cache an answer
+        Args:
+            corpus_fingerprint: Fingerprint of the indexed document set
+            question: Standalone question
+            question_vector: Embedding of the standalone question
+            answer: Generated answer
+            context: Retrieved documents used for the answer
+        """
+        entry = {
+            "corpus": corpus_fingerprint,
+            "question": question,
+            "vector": self._normalize(question_vector),
+            "answer": answer,
+            "context": context,
+            "created": time.time(),
+        }
+        with self._lock:
+            entry_id = next(self._ids)
+            self._entries[entry_id] = entry
+            self._by_corpus.setdefault(corpus_fingerprint, {})[entry_id] = entry
+            self._changed(corpus_fingerprint)
+            self.stats["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.stats["evictions"] += 1
+
+    def invalidate(self, corpus_fingerprint=None):
+        """
+        Drop cached answers for one corpus, or all of them
+        Args:
+            corpus_fingerprint: Corpus to invalidate (None clears the whole cache)
+        """
+        with self._lock:
+            if corpus_fingerprint is None:
+                self._entries.clear()
+                self._by_corpus.clear()
+                self._matrices.clear()
+                self._version += 1
+                return
+            for entry_id in list(self._by_corpus.get(corpus_fingerprint, ())):
+                self._remove(entry_id)
+
+    def get_stats(self):
+        """
+        Get cache metrics
+        Returns:
+            Dictionary with lookups, hits, hit rate, stores, evictions, expirations and size
+        """
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self._entries)
+        stats["hit_rate"] = round(stats["hits"] / stats["lookups"], 3) if stats["lookups"] else 0.0
+        return stats
+
+
+Tracer.register_stats("answer_cache", SemanticAnswerCache.get_shared_stats)
@@ -1,8 +1,18 @@
 import streamlit as st
+import uuid
+import weakref
 from src.document_processor import DocumentProcessor
 from src.rag_chain import RAGChain
 from src.session_manager import SessionManager
 from src.ui_components import UIComponents
+from src.embedding_registry import EmbeddingRegistry
+from src.tracing import Tracer
+from src.ingestion_worker import IngestionWorker, FAILED, CANCELLED
+from src.corpus_registry import CorpusRegistry
+from config.settings import (
+    EMBEDDING_WARMUP, STREAM_RESPONSES, BACKGROUND_INGESTION, CORPUS_SHARING_ENABLED,
+    VECTOR_STORE_BACKEND
+)
 
 # Main application class that orchestrates the RAG chatbot
 class RAGApplication:
@@ -11,10 +21,25 @@ class RAGApplication:
         self.ui = UIComponents()  # Handles all Streamlit UI elements
         self.session_manager = SessionManager()  # Manages chat sessions and history
         self.document_processor = None  # Will be initialized when needed
+        self.ingestion_worker = None  # Background indexing, created with the document processor
+        self.corpus_registry = None  # Process-wide shared document index (when corpus sharing is on)
+        self.corpus_session = uuid.uuid4().hex  # This browser session's key in the corpus registry
         self.rag_chain = None  # Will be initialized after API key is provided
+        self.api_key = None  # API key the current RAG chain was created with
     
     def run(self):
         """Main application loop, executed on every Streamlit rerun"""
+        # Time the whole rerun; ingestion and answering are recorded as stages of it
+        with Tracer.trace("app_run") as trace:
+            self._run()
+        
+        # Optional per-stage timings, token and chunk counts and cache hits of this rerun
+        if trace is not None and self.ui.show_debug_toggle():
+            corpus_stats = self.corpus_registry.memory_stats() if self.corpus_registry else None
+            self.ui.display_debug_panel(trace, corpus_stats)
+    
+    def _run(self):
+        """Render the page, index uploads and answer the question (one rerun)"""
         # Set up the Streamlit page (title, description, etc.)
         self.ui.setup_page()
         
@@ -26,9 +51,10 @@ class RAGApplication:
             self.ui.show_warning("Please enter the Groq API Key")
             return
         
-        # Initialize the RAG chain if not already done
-        if not self.rag_chain:
+        # Initialize the RAG chain if not already done (or if the API key changed)
+        if not self.rag_chain or api_key != self.api_key:
             self.rag_chain = RAGChain(api_key)
+            self.api_key = api_key
         
         # Prompt user for a session ID (for chat history tracking)
         session_id = self.ui.get_session_id()
@@ -38,53 +64,81 @@ class RAGApplication:
         
         # If files are uploaded, check if they are new or changed
         if uploaded_files:
-            # Create a list of (filename, filesize) for comparison
-            current_files_info = [(f.name, f.size) for f in uploaded_files]
+            # Fingerprint uploads by content so renamed or same-size edited files are detected
+            current_hashes = {DocumentProcessor.compute_file_hash(f) for f in uploaded_files}
             
             # Initialize session state variables for file tracking and caching
-            if 'processed_files_info' not in st.session_state:
-                st.session_state.processed_files_info = None
+            if 'indexed_files' not in st.session_state:
+                st.session_state.indexed_files = {}
                 st.session_state.vectorstore = None
                 st.session_state.retriever = None
             
+            # Swap in an index the background worker finished since the last rerun
+            if self.ingestion_worker:
+                self._publish_background_index()
+            
             # Only process files if they are new or different from previous upload
-            if st.session_state.processed_files_info != current_files_info:
+            if set(st.session_state.indexed_files) != current_hashes:
                 # Initialize DocumentProcessor if not already done
                 if not self.document_processor:
                     self.document_processor = DocumentProcessor()
-                
-                try:
-                    # Process uploaded PDFs: split, embed, and store in vector DB
-                    vectorstore, retriever = self.document_processor.process_uploaded_files(uploaded_files)
-                    
-                    # Cache the vectorstore, retriever, and file info in session state
-                    st.session_state.vectorstore = vectorstore
-                    st.session_state.retriever = retriever
-                    st.session_state.processed_files_info = current_files_info
-                    
-                    # Set up the RAG chain with the new retriever
-                    self.rag_chain.create_rag_chain(retriever)
-                    
-                    # Set up the conversational chain (history-aware)
-                    self.rag_chain.create_conversational_chain(
-                        self.session_manager.get_session_history
+                    # The on-disk sharded index is one store for everyone, so it always goes through the registry
+                    if CORPUS_SHARING_ENABLED or VECTOR_STORE_BACKEND == "sharded":
+                        self.corpus_registry = CorpusRegistry.get_shared(self.document_processor)
+                        # Streamlit has no session-end hook; release the documents when this object goes away
+                        weakref.finalize(self, self.corpus_registry.release_session, self.corpus_session)
+                    self.ingestion_worker = IngestionWorker(
+                        self.document_processor,
+                        corpus_registry=self.corpus_registry,
+                        session_key=self.corpus_session
                     )
+                
+                if BACKGROUND_INGESTION:
+                    # Index in a worker thread; the chat keeps using the previous index meanwhile
+                    self._index_in_background(uploaded_files, current_hashes)
+                    if st.session_state.retriever:
+                        self._connect_chain(st.session_state.retriever, st.session_state.indexed_files)
+                else:
+                    try:
+                        # Embed new files and drop removed ones; unchanged files are left alone
+                        progress_bar, on_progress = self.ui.create_progress_callback()
+                        if self.corpus_registry:
+                            # Documents another session already indexed are shared, not embedded again
+                            vectorstore, retriever, indexed_files, _ = self.corpus_registry.sync_session(
+                                self.corpus_session, uploaded_files, progress_callback=on_progress
+                            )
+                        else:
+                            vectorstore, retriever, indexed_files, _ = self.document_processor.update_index(
+                                uploaded_files,
+                                st.session_state.vectorstore,
+                                st.session_state.indexed_files,
+                                progress_callback=on_progress
+                            )
+                        progress_bar.empty()
+                        
+                        # Cache the vectorstore, retriever, and file fingerprints in session state
+                        st.session_state.vectorstore = vectorstore
+                        st.session_state.retriever = retriever
+                        st.session_state.indexed_files = indexed_files
+                        
+                        # Set up the RAG chain with the new retriever
+                        self._connect_chain(retriever, indexed_files)
+                        
+                        # Notify user of successful processing
+                        self.ui.show_success("Documents processed successfully!")
                     
-                    # Notify user of successful processing
-                    self.ui.show_success("Documents processed successfully!")
-                    
-                except Exception as e:
-                    # Show error if document processing fails
-                    st.error(f"Error processing documents: {str(e)}")
-                    return
+                    except Exception as e:
+                        # Show error if document processing fails
+                        st.error(f"Error processing documents: {str(e)}")
+                        return
             else:
                 # If files are unchanged, use cached vectorstore and retriever
                 if st.session_state.retriever:
-                    # Re-create RAG and conversational chains with cached retriever
-                    self.rag_chain.create_rag_chain(st.session_state.retriever)
-                    self.rag_chain.create_conversational_chain(
-                        self.session_manager.get_session_history
-                    )
+                    # No-ops unless the chain was re-created (e.g. for a new API key)
+                    self._connect_chain(st.session_state.retriever, st.session_state.indexed_files)
+        elif self.ingestion_worker:
+            # Uploads were cleared: stop indexing files nobody is waiting for
+            self.ingestion_worker.cancel()
         
         # If documents are processed, show chat interface
         if uploaded_files and (st.session_state.retriever or self.rag_chain.rag_chain):
@@ -93,16 +147,19 @@ class RAGApplication:
             
             if user_input:
                 try:
-                    # Get AI response from the RAG chain
-                    response = self.rag_chain.get_response(user_input, session_id)
-                    
-                    # Display the AI response in the main area
-                    self.ui.display_response(response)
+                    # Stream the AI response into the main area token by token
+                    if STREAM_RESPONSES:
+                        self.ui.display_streaming_response(
+                            self.rag_chain.stream_response(user_input, session_id)
+                        )
+                    else:
+                        response = self.rag_chain.get_response(user_input, session_id)
+                        self.ui.display_response(response)
                     
                     # Display chat history in the sidebar
                     session_history = self.session_manager.get_session_history(session_id)
                     self.ui.display_chat_history_sidebar(session_history, session_id)
-                    
+                
                 except Exception as e:
                     # Show error if response generation fails
                     st.error(f"Error getting response: {str(e)}")
@@ -110,17 +167,68 @@ class RAGApplication:
                 # If no new question, still show chat history in sidebar
                 session_history = self.session_manager.get_session_history(session_id)
                 self.ui.display_chat_history_sidebar(session_history, session_id)
+    
+    def _connect_chain(self, retriever, indexed_files):
+        """
+        Point the RAG and conversational chains at a retriever (no-op when nothing changed)
+        Args:
+            retriever: Retriever over the indexed documents
+            indexed_files: Dictionary of file hash -> {"name", "chunk_ids"} behind the retriever
+        """
+        self.rag_chain.create_rag_chain(retriever, DocumentProcessor.corpus_fingerprint(indexed_files))
+        self.rag_chain.create_conversational_chain(self.session_manager.get_session_history)
+    
+    def _index_in_background(self, uploaded_files, current_hashes):
+        """
+        Start (or keep following) the background job for the current uploads and show its state
+        Args:
+            uploaded_files: Uploaded PDF files
+            current_hashes: Content fingerprints of the uploads
+        """
+        # Reruns from other widgets find the job already running instead of restarting it
+        job = self.ingestion_worker.job
+        if job is None or job.file_hashes != current_hashes:
+            job = self.ingestion_worker.submit(
+                uploaded_files, st.session_state.vectorstore, st.session_state.indexed_files
+            )
+        
+        if job.status == FAILED:
+            st.error(f"Error processing documents: {job.error}")
+        elif job.status == CANCELLED:
+            self.ui.show_info("Indexing cancelled. Change the uploaded files to index again.")
+        else:
+            self.ui.display_ingestion_progress(job)
+    
+    def _publish_background_index(self):
+        """Make a finished background index live, replacing the previous one in a single step"""
+        result = self.ingestion_worker.take_result()
+        if result is None:
+            return
+        vectorstore, retriever, indexed_files, _ = result
+        previous = st.session_state.vectorstore
+        
+        st.session_state.vectorstore = vectorstore
+        st.session_state.retriever = retriever
+        st.session_state.indexed_files = indexed_files
+        self._connect_chain(retriever, indexed_files)
         
-        # If no files are uploaded, clean up any temporary files
-        if not uploaded_files and self.document_processor:
-            self.document_processor.cleanup_temp_files()
+        # The job worked on a copy, so the old store is no longer referenced (the shared corpus
+        # store is the same object before and after, and is never deleted here)
+        if previous is not None and previous is not vectorstore:
+            self.document_processor.drop_index(previous)
+        self.ui.show_success("Documents processed successfully!")
 
 # Entrypoint for Streamlit: creates and runs the RAG application
 
 def main():
     """Main function to run the application"""
-    app = RAGApplication()
-    app.run()
+    # Start loading the shared embedding model once per process (no-op on reruns)
+    if EMBEDDING_WARMUP:
+        EmbeddingRegistry.warm_up()
+    # Keep one application per browser session so reruns reuse its chains instead of rebuilding them
+    if "rag_app" not in st.session_state:
+        st.session_state.rag_app = RAGApplication()
+    st.session_state.rag_app.run()
 
 # Ensures the app runs when executed directly (as required by Streamlit)
 if __name__ == "__main__":
@@ -0,0 +1,635 @@
+"""
+Offline end-to-end benchmark for ingestion, retrieval and answering.
+
+Runs against synthetic PDFs, deterministic fake embeddings and a stub LLM, and
+writes machine-readable JSON so runs can be compared across commits:
+    python -m src.benchmark --output bench.json
+    python -m src.benchmark --baseline bench.json --tolerance 0.2
+"""
+
+from langchain_core.embeddings import Embeddings
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from config.settings import (
+    EMBEDDING_MODEL, CHUNK_SIZE, CHUNK_OVERLAP, RETRIEVAL_MODE, RETRIEVER_K, PDF_PARSE_WORKERS,
+    VECTOR_STORE_BACKEND
+)
+from src.document_processor import DocumentProcessor
+from src.embedding_engine import EmbeddingEngine
+from src.embedding_registry import EmbeddingRegistry, current_rss_mb
+from src.fakes import FakeEmbeddings, StubChatModel, make_synthetic_pdf
+from src.numpy_vector_store import NumpyVectorStore
+from src.rag_chain import RAGChain
+from src.serving import InMemoryFile
+from src.sharded_index import ShardedVectorStore
+from src.session_manager import SessionManager
+from src.tracing import Tracer
+
+# Metrics checked by --baseline, and whether a higher value is better
+TRACKED_METRICS = {
+    "ingestion.pages_per_second": True,
+    "ingestion.chunks_per_second": True,
+    "embedding.chunks_per_sec": True,
+    "retrieval.p50_ms": False,
+    "retrieval.p95_ms": False,
+    "answer.p50_ms": False,
+    "answer.p95_ms": False,
+    "memory.peak_rss_mb": False,
+}
+
+
+def peak_rss_mb():
+    """
+    Get the peak resident memory of the current process
+    Returns:
+        Peak resident set size in megabytes
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KB on Linux and in bytes on macOS
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    # Take the current RSS too, since ru_maxrss is only sampled by the kernel
+    return max(peak / divisor, current_rss_mb())
+
+
+def percentile(samples, fraction):
+    """
+    Nearest-rank percentile of a list of samples
+    Args:
+        samples: Measured values
+        fraction: Percentile as a fraction (0.5 for p50)
+    Returns:
+        The percentile value, or None for an empty list
+    """
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def _git_commit():
+    """Current git commit of the working tree, if available"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True, timeout=10
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def make_corpus(files, pages):
+    """
+    Build synthetic PDFs whose pages mention distinct part numbers and clauses
+    Args:
+        files: Number of PDF files
+        pages: Pages per file
+    Returns:
+        List of InMemoryFile uploads
+    """
+    uploads = []
+    for file_index in range(files):
+        pdf = make_synthetic_pdf([
+            f"Document {file_index} section {page}. Part number PN-{file_index}{page:04d} is covered "
+            f"by clause {page}.{file_index} of the maintenance policy. " * 20
+            for page in range(pages)
+        ])
+        uploads.append(InMemoryFile(f"doc_{file_index}.pdf", pdf))
+    return uploads
+
+
+def _build_index(processor, uploads):
+    """
+    Index uploads into a fresh store owned by the benchmark, through the app's ingestion path
+    Args:
+        processor: DocumentProcessor to index with
+        uploads: Uploaded files
+    Returns:
+        Tuple of (vectorstore, retriever); drop the store with vectorstore.delete_collection()
+    """
+    # A sharded store defaults to the user's on-disk library; benchmark a private index instead
+    vectorstore = None
+    if VECTOR_STORE_BACKEND == "sharded":
+        vectorstore = processor.create_vectorstore(path=tempfile.mkdtemp(prefix="bench-index-"))
+    return processor.process_uploaded_files(uploads, vectorstore)
+
+
+def run_benchmark(files=4, pages=25, queries=50, answers=20, llm_delay=0.0, real_embeddings=False):
+    """
+    Benchmark ingestion, retrieval and end-to-end answering
+    Args:
+        files: Number of synthetic PDF files to ingest
+        pages: Pages per file
+        queries: Number of retrieval queries to time
+        answers: Number of end-to-end get_response calls to time
+        llm_delay: Simulated LLM round-trip time in seconds
+        real_embeddings: Use the configured EMBEDDING_MODEL instead of the fake embeddings
+            (ingestion bypasses the on-disk embedding cache)
+    Returns:
+        Dictionary of results (see TRACKED_METRICS for the compared figures)
+    """
+    Tracer.reset()
+    embeddings = None if real_embeddings else FakeEmbeddings()
+    uploads = make_corpus(files, pages)
+    processor = DocumentProcessor(embeddings=embeddings)
+    if real_embeddings:
+        # Time the model rather than on-disk cache hits left by earlier runs or the app
+        processor.embeddings = processor.embedding_engine
+
+    # Ingestion: parse, split, embed and index the whole corpus
+    start = time.perf_counter()
+    vectorstore, retriever = _build_index(processor, uploads)
+    ingest_seconds = time.perf_counter() - start
+    chunk_count = len(vectorstore.get(include=[])["ids"])
+    page_count = files * pages
+
+    # Retrieval latency, over questions that name specific identifiers
+    questions = [
+        f"What does clause {i % pages}.{i % files} say about part PN-{i % files}{i % pages:04d}?"
+        for i in range(max(queries, answers))
+    ]
+    retrieval_ms = []
+    for question in questions[:queries]:
+        start = time.perf_counter()
+        retriever.invoke(question)
+        retrieval_ms.append((time.perf_counter() - start) * 1000)
+
+    # End-to-end answering through the conversational chain (answer cache off so every call does the work)
+    llm = StubChatModel(delay=llm_delay)
+    rag_chain = RAGChain(None, embeddings=embeddings, llm=llm)
+    rag_chain.answer_cache = None
+    rag_chain.create_rag_chain(retriever)
+    rag_chain.create_conversational_chain(SessionManager(store={}, backend="memory").get_session_history)
+    answer_ms = []
+    for i, question in enumerate(questions[:answers]):
+        start = time.perf_counter()
+        rag_chain.get_response(question, f"bench-{i}")
+        answer_ms.append((time.perf_counter() - start) * 1000)
+
+    vectorstore.delete_collection()
+    # Throughput of the embedding stage alone
+    embedding_stats = processor.embedding_engine.get_stats()
+
+    def rounded(value):
+        return round(value, 3) if value is not None else None
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "config": {
+            "embedding_model": EMBEDDING_MODEL if real_embeddings else f"fake-{embeddings.size}",
+            "chunk_size": CHUNK_SIZE,
+            "chunk_overlap": CHUNK_OVERLAP,
+            "retrieval_mode": RETRIEVAL_MODE,
+            "vector_store_backend": VECTOR_STORE_BACKEND,
+            "retriever_k": RETRIEVER_K,
+            "pdf_parse_workers": PDF_PARSE_WORKERS,
+            "files": files,
+            "pages_per_file": pages,
+            "llm_delay_s": llm_delay,
+        },
+        "ingestion": {
+            "pages": page_count,
+            "chunks": chunk_count,
+            "seconds": rounded(ingest_seconds),
+            "pages_per_second": rounded(page_count / ingest_seconds),
+            "chunks_per_second": rounded(chunk_count / ingest_seconds),
+        },
+        "embedding": embedding_stats,
+        "retrieval": {
+            "queries": len(retrieval_ms),
+            "p50_ms": rounded(percentile(retrieval_ms, 0.5)),
+            "p95_ms": rounded(percentile(retrieval_ms, 0.95)),
+        },
+        "answer": {
+            "calls": len(answer_ms),
+            "llm_calls": llm.call_count,
+            "p50_ms": rounded(percentile(answer_ms, 0.5)),
+            "p95_ms": rounded(percentile(answer_ms, 0.95)),
+        },
+        "memory": {
+            "rss_mb": rounded(current_rss_mb()),
+            "peak_rss_mb": rounded(peak_rss_mb()),
+        },
+        # Where the time went, per pipeline stage (empty when tracing is disabled)
+        "stages": Tracer.get_stats()["stages"],
+    }
+
+
+# Serves precomputed vectors so vector store comparisons time the stores, not the embedding model
+class _PrecomputedEmbeddings(Embeddings):
+    def __init__(self, vectors):
+        self.vectors = vectors  # text -> vector
+
+    def embed_documents(self, texts):
+        return [self.vectors[text] for text in texts]
+
+    def embed_query(self, text):
+        return self.vectors[text]
+
+
+def _measure_vector_store(backend, dtype, chunks, queries, k):
+    """
+    Build one vector store over a synthetic corpus and time queries against it
+    (run in a fresh process so resident memory deltas are not skewed by earlier runs)
+    Args:
+        backend: "chroma" or "numpy"
+        dtype: NumPy store precision
+        chunks: Number of chunks to index
+        queries: Number of queries to time
+        k: Results per query
+    Returns:
+        Tuple of (figures dictionary, list of result ID lists per query)
+    """
+    fake = FakeEmbeddings()
+    # Varied vocabulary so vectors are distinct and top-k rankings have few ties
+    texts = [
+        f"Chunk {i} part PN-{i} " + " ".join(f"w{(i * 7919 + j * 104729) % 20000}" for j in range(40))
+        for i in range(chunks)
+    ]
+    query_texts = [
+        " ".join(f"w{(i * 7919 + j * 104729) % 20000}" for j in range(0, 40, 4)) for i in range(queries)
+    ]
+    vectors = dict(zip(texts, fake.embed_documents(texts)))
+    query_vectors = fake.embed_documents(query_texts)
+    embedding = _PrecomputedEmbeddings(vectors)
+    ids = [f"chunk-{i}" for i in range(chunks)]
+    metadatas = [{"file_hash": f"file-{i % 4}", "page": i} for i in range(chunks)]
+
+    gc.collect()
+    rss_before = current_rss_mb()
+    start = time.perf_counter()
+    if backend == "numpy":
+        store = NumpyVectorStore.from_texts(texts, embedding, metadatas, ids, dtype=dtype)
+    else:
+        from langchain_chroma import Chroma
+        import chromadb
+        store = Chroma.from_texts(
+            texts, embedding, metadatas=metadatas, ids=ids,
+            collection_name="bench", client=chromadb.EphemeralClient()
+        )
+    build_seconds = time.perf_counter() - start
+    gc.collect()
+    rss_delta_mb = current_rss_mb() - rss_before
+
+    latencies, results = [], []
+    for vector in query_vectors:
+        start = time.perf_counter()
+        results.append([doc.id for doc in store.similarity_search_by_vector(vector, k=k)])
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    figures = {
+        "build_seconds": round(build_seconds, 3),
+        "rss_delta_mb": round(rss_delta_mb, 2),
+        "rss_bytes_per_chunk": round(rss_delta_mb * 1024 * 1024 / chunks, 1),
+        "query_p50_ms": round(percentile(latencies, 0.5), 3),
+        "query_p95_ms": round(percentile(latencies, 0.95), 3),
+    }
+    if backend == "numpy":
+        figures["vector_bytes_per_chunk"] = round(store.memory_bytes() / chunks, 1)
+        # Every query at once through the vectorized batch path
+        start = time.perf_counter()
+        store.search_by_vectors(query_vectors, k=k)
+        figures["batched_query_ms_per_query"] = round((time.perf_counter() - start) * 1000 / queries, 4)
+    return figures, results
+
+
+def benchmark_vector_stores(chunks=5000, queries=200, k=20, dtypes=("float32", "float16", "int8")):
+    """
+    Compare memory per chunk, build time and query latency of Chroma and the NumPy store
+    Args:
+        chunks: Number of synthetic chunks to index
+        queries: Number of queries to time
+        k: Results per query
+        dtypes: NumPy store precisions to measure
+    Returns:
+        Dictionary of backend -> figures (recall is measured against exact float32 search)
+    """
+    runs = [("numpy", dtype) for dtype in dtypes] + [("chroma", None)]
+    report = {"chunks": chunks, "queries": queries, "k": k}
+    all_results = {}
+    context = multiprocessing.get_context("spawn")
+    for backend, dtype in runs:
+        name = f"numpy_{dtype}" if backend == "numpy" else backend
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            figures, results = executor.submit(
+                _measure_vector_store, backend, dtype, chunks, queries, k
+            ).result()
+        report[name] = figures
+        all_results[name] = results
+
+    # Share of the exact top-k each backend returns (float32 NumPy search is exact)
+    exact = all_results.get("numpy_float32")
+    if exact is not None:
+        for name, results in all_results.items():
+            overlap = sum(len(set(a) & set(b)) for a, b in zip(results, exact))
+            report[name]["recall_vs_exact"] = round(overlap / max(1, sum(len(b) for b in exact)), 4)
+    return report
+
+
+def _synthetic_vectors(start, end, dim=384):
+    """Deterministic unit vectors for chunk numbers start..end (the same chunk always gets the same vector)"""
+    vectors = np.stack([np.random.default_rng(i).standard_normal(dim, dtype=np.float32) for i in range(start, end)])
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _grow_sharded_index(path, chunks, shard_size, batch_size=4096):
+    """
+    Append synthetic chunks to an on-disk index until it holds `chunks` (run in a fresh process)
+    Returns:
+        Dictionary with chunks appended, seconds taken and resident memory after appending
+    """
+    store = ShardedVectorStore(FakeEmbeddings(), path, shard_size=shard_size)
+    start_count = len(store)
+    start = time.perf_counter()
+    for batch_start in range(start_count, chunks, batch_size):
+        batch_end = min(batch_start + batch_size, chunks)
+        store.add_embeddings(
+            [f"Chunk {i} part PN-{i} w{i % 997} w{i % 7919}" for i in range(batch_start, batch_end)],
+            _synthetic_vectors(batch_start, batch_end),
+            [{"file_hash": f"file-{i // 1000}", "page": i} for i in range(batch_start, batch_end)],
+            [f"chunk-{i}" for i in range(batch_start, batch_end)]
+        )
+    seconds = time.perf_counter() - start
+    figures = {
+        "appended": chunks - start_count,
+        "append_seconds": round(seconds, 2),
+        "append_rss_mb": round(current_rss_mb(), 1),
+    }
+    store.close()
+    return figures
+
+
+def _query_sharded_index(path, queries, k):
+    """
+    Open an on-disk index and time queries against it (run in a fresh process)
+    Returns:
+        Dictionary with resident memory before and after querying and query latency
+    """
+    store = ShardedVectorStore(FakeEmbeddings(), path)
+    gc.collect()
+    rss_open = current_rss_mb()
+    query_vectors = _synthetic_vectors(10 ** 9, 10 ** 9 + queries)
+    latencies = []
+    for vector in query_vectors:
+        start = time.perf_counter()
+        store.similarity_search_by_vector(vector, k=k)
+        latencies.append((time.perf_counter() - start) * 1000)
+    # A session's filtered search only scores its own documents' rows
+    start = time.perf_counter()
+    store.similarity_search_by_vector(query_vectors[0], k=k, filter={"file_hash": {"$in": ["file-0", "file-1"]}})
+    filtered_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    store.lexical_search("PN-42 w42", k=k)
+    lexical_ms = (time.perf_counter() - start) * 1000
+    figures = {
+        "open_rss_mb": round(rss_open, 1),
+        "query_rss_mb": round(current_rss_mb(), 1),
+        "query_p50_ms": round(percentile(latencies, 0.5), 2),
+        "query_p95_ms": round(percentile(latencies, 0.95), 2),
+        "filtered_query_ms": round(filtered_ms, 2),
+        "lexical_query_ms": round(lexical_ms, 2),
+        "shards": store.stats()["shards"],
+        "disk_mb": round(store.disk_bytes() / 1024 / 1024, 1),
+    }
+    store.close()
+    return figures
+
+
+def _in_memory_rss(chunks):
+    """Resident memory of the same vectors held by an in-process NumpyVectorStore (run in a fresh process)"""
+    store = NumpyVectorStore(FakeEmbeddings())
+    for batch_start in range(0, chunks, 4096):
+        batch_end = min(batch_start + 4096, chunks)
+        store.add_embeddings(
+            [f"Chunk {i} part PN-{i} w{i % 997} w{i % 7919}" for i in range(batch_start, batch_end)],
+            _synthetic_vectors(batch_start, batch_end),
+            [{"file_hash": f"file-{i // 1000}", "page": i} for i in range(batch_start, batch_end)],
+            [f"chunk-{i}" for i in range(batch_start, batch_end)]
+        )
+    gc.collect()
+    return round(current_rss_mb(), 1)
+
+
+def benchmark_sharded_index(sizes=(50000, 100000, 200000, 400000), shard_size=50000, queries=50, k=20):
+    """
+    Grow one on-disk sharded index step by step and measure resident memory and query latency at each size
+    Args:
+        sizes: Corpus sizes (in chunks) to measure, ascending; each step only appends the new chunks
+        shard_size: Chunks per shard file
+        queries: Number of queries to time per size
+        k: Results per query
+    Returns:
+        Dictionary of size -> figures, with the RSS of an in-memory NumPy store of the same size for comparison
+    """
+    context = multiprocessing.get_context("spawn")
+    report = {"shard_size": shard_size, "queries": queries, "k": k}
+    path = tempfile.mkdtemp(prefix="sharded-bench-")
+    try:
+        for chunks in sizes:
+            # Separate processes, so each figure is the memory of opening and searching the index as it stands
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                figures = executor.submit(_grow_sharded_index, path, chunks, shard_size).result()
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                figures.update(executor.submit(_query_sharded_index, path, queries, k).result())
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                figures["in_memory_rss_mb"] = executor.submit(_in_memory_rss, chunks).result()
+            report[str(chunks)] = figures
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+    return report
+
+
+def benchmark_embedding(chunks=2000, batch_sizes=(8, 16, 32, 64, 128), real_embeddings=False):
+    """
+    Measure embedding throughput at several maximum batch sizes, to tune EMBED_MAX_BATCH_SIZE per node
+    Args:
+        chunks: Number of synthetic chunks (of mixed lengths) to embed per setting
+        batch_sizes: Maximum batch sizes to try
+        real_embeddings: Use the configured EMBEDDING_MODEL instead of the fake embeddings
+    Returns:
+        Dictionary of batch size -> engine stats, plus the padding efficiency of unsorted batching
+    """
+    embeddings = EmbeddingRegistry.get(EMBEDDING_MODEL) if real_embeddings else FakeEmbeddings()
+    # Mixed chunk lengths, like a splitter's output across short and long pages
+    texts = [
+        f"Chunk {i} covers part PN-{i:05d} under clause {i % 97}. " * (1 + (i * 7919) % 40)
+        for i in range(chunks)
+    ]
+    report = {}
+    for batch_size in batch_sizes:
+        engine = EmbeddingEngine(embeddings, max_batch_size=batch_size)
+        engine.embed_documents(texts)
+        report[str(batch_size)] = engine.get_stats()
+
+    # Padding a length-blind batcher would pay: consecutive chunks in arrival order
+    engine = EmbeddingEngine(embeddings)
+    lengths = engine.token_lengths(texts)
+    padded = sum(
+        len(lengths[i:i + engine.max_batch_size]) * max(lengths[i:i + engine.max_batch_size])
+        for i in range(0, len(lengths), engine.max_batch_size)
+    )
+    report["unsorted_padding_efficiency"] = round(sum(lengths) / padded, 3)
+    return report
+
+
+def benchmark_speculative(questions=20, llm_delay=0.2, query_delays=(0.0, 0.05), files=2, pages=10):
+    """
+    Compare follow-up question latency with and without speculative retrieval against a delayed stub LLM
+    Args:
+        questions: Follow-up questions timed per setting (each needs an LLM rewrite)
+        llm_delay: Simulated LLM round-trip time in seconds
+        query_delays: Simulated query embedding latencies to measure (retrieval cost hidden by speculation)
+        files: Number of synthetic PDF files to index
+        pages: Pages per file
+    Returns:
+        Dictionary of scenario -> p50/p95 latency per mode, the p50 gain and how speculation was used
+    """
+    report = {"questions": questions, "llm_delay_s": llm_delay}
+    uploads = make_corpus(files, pages)
+    # "unchanged": the rewrite keeps the question's words, so the speculative results are reused;
+    # "changed": the rewrite adds words, so the rewritten question is retrieved too and the results fused
+    rewrites = {"unchanged": "", "changed": " regarding part PN-00001 and its warranty clause"}
+    for query_delay in query_delays:
+        embeddings = FakeEmbeddings(query_delay=query_delay)
+        vectorstore, retriever = _build_index(DocumentProcessor(embeddings=embeddings), uploads)
+        for rewrite_name, rewrite_suffix in rewrites.items():
+            scenario = {}
+            for speculative in (False, True):
+                llm = StubChatModel(delay=llm_delay, rewrite_suffix=rewrite_suffix)
+                rag_chain = RAGChain(None, embeddings=embeddings, llm=llm, speculative_retrieval=speculative)
+                rag_chain.answer_cache = None
+                rag_chain.create_rag_chain(retriever)
+                session_manager = SessionManager(store={}, backend="memory")
+                rag_chain.create_conversational_chain(session_manager.get_session_history)
+                latencies, outcomes = [], {}
+                for i in range(questions):
+                    session_id = f"spec-{query_delay}-{rewrite_name}-{speculative}-{i}"
+                    # A distinct earlier turn per session, so every follow-up misses the rewrite memo
+                    history = session_manager.get_session_history(session_id)
+                    history.add_user_message(f"Tell me about part PN-{i:05d} ({session_id})")
+                    history.add_ai_message(f"Part PN-{i:05d} is covered in clause {i % pages}.")
+                    start = time.perf_counter()
+                    response = rag_chain.get_response("What does it say about returns?", session_id)
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    outcome = response.get("speculative_retrieval") or "not_speculated"
+                    outcomes[outcome] = outcomes.get(outcome, 0) + 1
+                scenario["speculative" if speculative else "sequential"] = {
+                    "p50_ms": round(percentile(latencies, 0.5), 2),
+                    "p95_ms": round(percentile(latencies, 0.95), 2),
+                    "retrieval": outcomes,
+                }
+            scenario["p50_gain_ms"] = round(
+                scenario["sequential"]["p50_ms"] - scenario["speculative"]["p50_ms"], 2
+            )
+            report[f"query_delay_{query_delay}s_{rewrite_name}"] = scenario
+        vectorstore.delete_collection()
+    return report
+
+
+def compare_results(baseline, current, tolerance=0.2):
+    """
+    Compare two benchmark results
+    Args:
+        baseline: Earlier result dictionary
+        current: New result dictionary
+        tolerance: Allowed relative slowdown (0.2 = 20%) before a metric counts as a regression
+    Returns:
+        List of {"metric", "baseline", "current", "change", "regression"} dictionaries
+    """
+    def lookup(result, path):
+        value = result
+        for key in path.split("."):
+            value = value.get(key) if isinstance(value, dict) else None
+        return value
+
+    rows = []
+    for metric, higher_is_better in TRACKED_METRICS.items():
+        before, after = lookup(baseline, metric), lookup(current, metric)
+        if not before or after is None:
+            continue
+        change = (after - before) / before
+        regression = change < -tolerance if higher_is_better else change > tolerance
+        rows.append({
+            "metric": metric,
+            "baseline": before,
+            "current": after,
+            "change": round(change, 3),
+            "regression": regression,
+        })
+    return rows
+
+
+def main():
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Offline benchmark for ingestion, retrieval and answering")
+    parser.add_argument("--files", type=int, default=4)
+    parser.add_argument("--pages", type=int, default=25)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--answers", type=int, default=20)
+    parser.add_argument("--llm-delay", type=float, default=0.0)
+    parser.add_argument("--real-embeddings", action="store_true",
+                        help="Use the configured EMBEDDING_MODEL (uncached) instead of fake embeddings")
+    parser.add_argument("--vector-stores", action="store_true",
+                        help="Also compare Chroma with the NumPy vector store (memory per chunk, query latency)")
+    parser.add_argument("--store-chunks", type=int, default=5000)
+    parser.add_argument("--embedding-sweep", action="store_true",
+                        help="Also measure embedding chunks/sec at several maximum batch sizes")
+    parser.add_argument("--sharded-sweep", action="store_true",
+                        help="Also measure resident memory and query latency of the on-disk sharded index as it grows")
+    parser.add_argument("--speculative", action="store_true",
+                        help="Also compare follow-up latency with and without speculative retrieval")
+    parser.add_argument("--output", help="Write the JSON result to this file")
+    parser.add_argument("--baseline", help="Earlier JSON result to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    result = run_benchmark(
+        files=args.files,
+        pages=args.pages,
+        queries=args.queries,
+        answers=args.answers,
+        llm_delay=args.llm_delay,
+        real_embeddings=args.real_embeddings
+    )
+    if args.vector_stores:
+        result["vector_stores"] = benchmark_vector_stores(chunks=args.store_chunks)
+    if args.embedding_sweep:
+        result["embedding_sweep"] = benchmark_embedding(real_embeddings=args.real_embeddings)
+    if args.sharded_sweep:
+        result["sharded_index"] = benchmark_sharded_index()
+    if args.speculative:
+        result["speculative_retrieval"] = benchmark_speculative(llm_delay=args.llm_delay or 0.2)
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            result["comparison"] = compare_results(json.load(baseline_file), result, args.tolerance)
+
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(output + "\n")
+    print(output)
+
+    # Non-zero exit status so CI can fail on a regression
+    if any(row["regression"] for row in result.get("comparison", [])):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
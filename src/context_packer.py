@@ -0,0 +1,200 @@
+from langchain_core.documents import Document
+import numpy as np
+from config.settings import (
+    CONTEXT_TOKEN_BUDGET, CONTEXT_MMR_ENABLED, CONTEXT_MMR_LAMBDA, CONTEXT_MIN_OVERLAP_CHARS
+)
+from src.tracing import Tracer
+
+
+def estimate_text_tokens(text):
+    """
+    Cheaply estimate the tokens of a text (~4 characters per token)
+    Args:
+        text: Text to measure
+    Returns:
+        Estimated token count
+    """
+    return len(text) // 4
+
+
+def _source_key(document):
+    """Identify the file a chunk came from"""
+    metadata = document.metadata
+    return metadata.get("file_hash") or metadata.get("source") or metadata.get("file_name")
+
+
+def find_overlap(first, second, min_chars=CONTEXT_MIN_OVERLAP_CHARS):
+    """
+    Find the longest suffix of one text that is a prefix of another
+    Args:
+        first: Text whose end may repeat
+        second: Text whose start may repeat it
+        min_chars: Shortest overlap that counts
+    Returns:
+        Length of the overlap in characters (0 if none)
+    """
+    if len(first) < min_chars or len(second) < min_chars:
+        return 0
+    # Every candidate overlap starts with second's first min_chars characters
+    probe = second[:min_chars]
+    start = first.find(probe, max(0, len(first) - len(second)))
+    while start != -1:
+        if second.startswith(first[start:]):
+            return len(first) - start
+        start = first.find(probe, start + 1)
+    return 0
+
+
+# Assembles the QA prompt context: strips chunk overlap, optionally diversifies, packs into a token budget
+class ContextPacker:
+    def __init__(self, token_budget=CONTEXT_TOKEN_BUDGET, use_mmr=CONTEXT_MMR_ENABLED,
+                 mmr_lambda=CONTEXT_MMR_LAMBDA, min_overlap_chars=CONTEXT_MIN_OVERLAP_CHARS,
+                 get_embeddings=None):
+        """
+        Initialize the packer
+        Args:
+            token_budget: Approximate tokens of retrieved text allowed in each prompt
+            use_mmr: Re-rank passages with maximal marginal relevance before packing
+            mmr_lambda: Relevance/diversity trade-off (1.0 = relevance only)
+            min_overlap_chars: Shortest shared span between chunks treated as overlap
+            get_embeddings: Callable returning the embedding model (only needed for MMR)
+        """
+        self.token_budget = token_budget
+        self.use_mmr = use_mmr and get_embeddings is not None
+        self.mmr_lambda = mmr_lambda
+        self.min_overlap_chars = min_overlap_chars
+        self.get_embeddings = get_embeddings
+
+    def deduplicate(self, documents):
+        """
+        Drop duplicate chunks and strip overlapping text between chunks of the same file
+        Args:
+            documents: Retrieved documents, best first
+        Returns:
+            Copies of the documents with repeated text removed from the lower-ranked chunk
+        """
+        kept = []
+        for document in documents:
+            text = document.page_content
+            for better in kept:
+                better_text = better.page_content
+                # Exact duplicates and chunks contained in a better-ranked one add nothing
+                if text in better_text:
+                    text = ""
+                    break
+                if _source_key(better) != _source_key(document):
+                    continue
+                # Splitter overlap: the better chunk's tail is this chunk's head, or the reverse
+                head = find_overlap(better_text, text, self.min_overlap_chars)
+                if head:
+                    text = text[head:]
+                tail = find_overlap(text, better_text, self.min_overlap_chars)
+                if tail:
+                    text = text[:len(text) - tail]
+            if text.strip():
+                kept.append(Document(id=document.id, page_content=text, metadata=document.metadata))
+        return kept
+
+    def diversify(self, documents, query, query_vector=None, k=None):
+        """
+        Order documents by maximal marginal relevance
+        Args:
+            documents: Candidate documents
+            query: Query text (embedded if query_vector is not given)
+            query_vector: Precomputed query embedding
+            k: Number of documents to select (all by default)
+        Returns:
+            Documents in MMR order
+        """
+        if len(documents) < 3:
+            return documents
+        embeddings = self.get_embeddings()
+        doc_vectors = np.asarray(embeddings.embed_documents([d.page_content for d in documents]), dtype=np.float32)
+        if query_vector is None:
+            query_vector = embeddings.embed_query(query)
+        query_vector = np.asarray(query_vector, dtype=np.float32)
+
+        # Cosine similarities against the query and between documents
+        doc_vectors /= np.linalg.norm(doc_vectors, axis=1, keepdims=True) + 1e-12
+        query_vector /= np.linalg.norm(query_vector) + 1e-12
+        relevance = doc_vectors @ query_vector
+        similarity = doc_vectors @ doc_vectors.T
+
+        selected = [int(np.argmax(relevance))]
+        remaining = set(range(len(documents))) - set(selected)
+        while remaining and len(selected) < (k or len(documents)):
+            candidates = sorted(remaining)
+            redundancy = similarity[np.ix_(candidates, selected)].max(axis=1)
+            scores = self.mmr_lambda * relevance[candidates] - (1 - self.mmr_lambda) * redundancy
+            best = candidates[int(np.argmax(scores))]
+            selected.append(best)
+            remaining.discard(best)
+        return [documents[i] for i in selected]
+
+    def fit_budget(self, documents):
+        """
+        Keep the best passages that fit the token budget, trimming the last one at a word boundary
+        Args:
+            documents: Documents in priority order
+        Returns:
+            Documents that fit the budget
+        """
+        packed = []
+        remaining = self.token_budget
+        for document in documents:
+            tokens = estimate_text_tokens(document.page_content)
+            if tokens <= remaining:
+                packed.append(document)
+                remaining -= tokens
+                continue
+            # A partial passage is only worth including if a useful amount fits
+            if remaining >= 50:
+                words = document.page_content[:remaining * 4].rsplit(None, 1)
+                # An all-whitespace prefix leaves nothing to keep; the passage is skipped
+                if words:
+                    packed.append(Document(id=document.id, page_content=words[0], metadata=document.metadata))
+            break
+        return packed
+
+    def pack(self, documents, query="", query_vector=None):
+        """
+        Assemble the context for a QA prompt
+        Args:
+            documents: Retrieved documents, best first
+            query: Standalone question (used for MMR)
+            query_vector: Precomputed question embedding (used for MMR)
+        Returns:
+            Tuple of (packed documents, report with token and chunk counts before and after)
+        """
+        with Tracer.span("pack_context", chunks=len(documents)):
+            tokens_before = sum(estimate_text_tokens(d.page_content) for d in documents)
+            deduplicated = self.deduplicate(documents)
+            tokens_deduplicated = sum(estimate_text_tokens(d.page_content) for d in deduplicated)
+            if self.use_mmr:
+                deduplicated = self.diversify(deduplicated, query, query_vector)
+            packed = self.fit_budget(deduplicated)
+            tokens_after = sum(estimate_text_tokens(d.page_content) for d in packed)
+
+        report = {
+            "chunks_before": len(documents),
+            "chunks_after": len(packed),
+            "tokens_before": tokens_before,
+            "tokens_after_dedup": tokens_deduplicated,
+            "tokens_after": tokens_after,
+        }
+        Tracer.count("context_tokens_before", tokens_before)
+        Tracer.count("context_tokens_after", tokens_after)
+        return packed, report
+
+    def pack_inputs(self, inputs):
+        """
+        Chain step that replaces the retrieved 'context' with its packed form
+        Args:
+            inputs: Dict with 'context', 'standalone_question' and optionally 'question_vector'
+        Returns:
+            Inputs with the packed context plus a 'context_packing' report
+        """
+        packed, report = self.pack(
+            inputs["context"], inputs.get("standalone_question", ""), inputs.get("question_vector")
+        )
+        return {**inputs, "context": packed, "context_packing": report}
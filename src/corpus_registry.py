@@ -0,0 +1,275 @@
+from collections import OrderedDict
+import threading
+import time
+from config.settings import (
+    CORPUS_MAX_UNREFERENCED_FILES, CORPUS_MAX_CHUNKS, STREAMING_INGESTION
+)
+from src.document_processor import IngestionCancelled
+from src.tracing import Tracer
+
+
+# Process-wide index of uploaded documents, keyed by content hash and shared by every session
+class CorpusRegistry:
+    _shared = None  # Registry shared by every Streamlit session in this process
+    _shared_lock = threading.Lock()
+
+    def __init__(self, document_processor, max_unreferenced_files=CORPUS_MAX_UNREFERENCED_FILES,
+                 max_chunks=CORPUS_MAX_CHUNKS):
+        """
+        Initialize an empty registry
+        Args:
+            document_processor: DocumentProcessor that parses, embeds and stores documents
+            max_unreferenced_files: Documents no session uses that are kept for quick re-upload
+            max_chunks: Unreferenced documents are evicted while the index holds more chunks than this
+        """
+        self.document_processor = document_processor
+        self.max_unreferenced_files = max_unreferenced_files
+        self.max_chunks = max_chunks
+        self.vectorstore = None  # One store for every document, created on first use
+        self._files = {}  # file hash -> {"name", "chunk_ids", "refcount"}
+        self._unreferenced = OrderedDict()  # file hash -> release time, least recently used first
+        self._sessions = {}  # session key -> set of file hashes it references
+        self._indexing = {}  # file hash -> Event set once the session indexing it is done
+        self._chunk_count = 0
+        self._lock = threading.RLock()
+        self.stats = {"files_indexed": 0, "files_shared": 0, "files_evicted": 0}
+
+    @classmethod
+    def get_shared(cls, document_processor):
+        """
+        Get the process-wide registry
+        Args:
+            document_processor: DocumentProcessor used if the registry has to be created
+        Returns:
+            Shared CorpusRegistry instance
+        """
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls(document_processor)
+            return cls._shared
+
+    def _acquire(self, session_key, file_hash):
+        """Add a session's reference to a document (caller holds the lock)"""
+        held = self._sessions.setdefault(session_key, set())
+        if file_hash in held:
+            return
+        held.add(file_hash)
+        self._files[file_hash]["refcount"] += 1
+        self._unreferenced.pop(file_hash, None)
+
+    def _release(self, session_key, file_hash):
+        """Drop a session's reference to a document (caller holds the lock)"""
+        held = self._sessions.get(session_key, set())
+        if file_hash not in held:
+            return
+        held.discard(file_hash)
+        entry = self._files[file_hash]
+        entry["refcount"] -= 1
+        if entry["refcount"] == 0:
+            self._unreferenced[file_hash] = time.time()
+
+    def _adopt(self, file_hash):
+        """
+        Register a document a persistent store already holds from an earlier run (caller holds the lock)
+        Args:
+            file_hash: Content fingerprint of the document
+        Returns:
+            True if the store had the document
+        """
+        lookup = getattr(self.vectorstore, "file_entry", None)
+        entry = lookup(file_hash) if lookup else None
+        if entry is None:
+            return False
+        self._files[file_hash] = {**entry, "refcount": 0}
+        self._chunk_count += len(entry["chunk_ids"])
+        return True
+
+    def _evict(self):
+        """Delete least recently used unreferenced documents beyond the limits (caller holds the lock)"""
+        if getattr(self.vectorstore, "persistent", False):
+            # An on-disk index costs no RAM per document; keeping everything is the point of it
+            return
+        while self._unreferenced and (
+            len(self._unreferenced) > self.max_unreferenced_files or self._chunk_count > self.max_chunks
+        ):
+            file_hash, _ = self._unreferenced.popitem(last=False)
+            entry = self._files.pop(file_hash)
+            if entry["chunk_ids"]:
+                self.document_processor._delete_chunks(self.vectorstore, entry["chunk_ids"])
+            self._chunk_count -= len(entry["chunk_ids"])
+            self.stats["files_evicted"] += 1
+
+    def session_view(self, session_key):
+        """
+        Retriever and file list for one session's documents
+        Args:
+            session_key: Session identifier
+        Returns:
+            Tuple of (vectorstore, retriever, indexed_files); the retriever only returns the session's files
+        """
+        with self._lock:
+            hashes = sorted(self._sessions.get(session_key, ()))
+            indexed_files = {
+                h: {"name": self._files[h]["name"], "chunk_ids": self._files[h]["chunk_ids"]}
+                for h in hashes
+            }
+        retriever = self.document_processor.get_retriever(
+            self.vectorstore, filter={"file_hash": {"$in": hashes}}
+        )
+        return self.vectorstore, retriever, indexed_files
+
+    def sync_session(self, session_key, uploaded_files, streaming=STREAMING_INGESTION,
+                     progress_callback=None, cancel_event=None):
+        """
+        Make a session reference exactly the uploaded files, indexing only documents no session
+        has indexed yet (same interface and return value as DocumentProcessor.update_index)
+        Args:
+            session_key: Session identifier
+            uploaded_files: List of uploaded PDF files
+            streaming: Ingest page by page in bounded-memory batches
+            progress_callback: Optional callable(file_name, pages_done, total_pages, chunks_done)
+            cancel_event: Optional threading.Event; IngestionCancelled is raised when it is set
+        Returns:
+            Tuple of (vectorstore, retriever, indexed_files, changes) where changes lists the names
+            of added and removed files and of the added files that were already indexed
+        """
+        with Tracer.trace("corpus_sync", files=len(uploaded_files)):
+            current_files = self.document_processor.fingerprint_files(uploaded_files)
+            changes = {"added": [], "removed": [], "shared": []}
+            acquired = []  # References taken by this call, given back if it fails
+            pending = dict(current_files)
+            try:
+                while pending:
+                    to_index, waits = [], []
+                    with self._lock:
+                        if self.vectorstore is None:
+                            self.vectorstore = self.document_processor.create_vectorstore()
+                        held = self._sessions.get(session_key, set())
+                        for file_hash, uploaded_file in list(pending.items()):
+                            if file_hash in held:
+                                del pending[file_hash]
+                            elif file_hash in self._files or self._adopt(file_hash):
+                                # Already indexed for another session (or an earlier run): just take a reference
+                                self._acquire(session_key, file_hash)
+                                acquired.append(file_hash)
+                                changes["added"].append(uploaded_file.name)
+                                changes["shared"].append(uploaded_file.name)
+                                self.stats["files_shared"] += 1
+                                del pending[file_hash]
+                            elif file_hash in self._indexing:
+                                # Another session is embedding the same document right now
+                                waits.append(self._indexing[file_hash])
+                            else:
+                                self._indexing[file_hash] = threading.Event()
+                                to_index.append((file_hash, uploaded_file))
+                                del pending[file_hash]
+
+                    if to_index:
+                        try:
+                            for file_hash, entry in self.document_processor.iter_index_files(
+                                self.vectorstore, to_index, streaming, progress_callback, cancel_event
+                            ):
+                                with self._lock:
+                                    self._files[file_hash] = {**entry, "refcount": 0}
+                                    self._chunk_count += len(entry["chunk_ids"])
+                                    self._acquire(session_key, file_hash)
+                                    acquired.append(file_hash)
+                                    self.stats["files_indexed"] += 1
+                                    self._indexing.pop(file_hash).set()
+                                changes["added"].append(entry["name"])
+                        finally:
+                            # Wake sessions waiting on files this call did not finish; they index them instead
+                            with self._lock:
+                                for file_hash, _ in to_index:
+                                    if file_hash in self._indexing:
+                                        self._indexing.pop(file_hash).set()
+
+                    for event in waits:
+                        while not event.wait(0.2):
+                            if cancel_event is not None and cancel_event.is_set():
+                                raise IngestionCancelled()
+            except BaseException:
+                with self._lock:
+                    for file_hash in acquired:
+                        self._release(session_key, file_hash)
+                    self._evict()
+                raise
+
+            with self._lock:
+                for file_hash in list(self._sessions.get(session_key, ())):
+                    if file_hash not in current_files:
+                        changes["removed"].append(self._files[file_hash]["name"])
+                        self._release(session_key, file_hash)
+                self._evict()
+            Tracer.count("corpus_files_shared", len(changes["shared"]))
+
+        vectorstore, retriever, indexed_files = self.session_view(session_key)
+        return vectorstore, retriever, indexed_files, changes
+
+    def restore_session(self, session_key, file_hashes):
+        """
+        Point a session back at an earlier file set, e.g. after a sync whose result was discarded
+        Args:
+            session_key: Session identifier
+            file_hashes: Hashes of the documents the session referenced before (documents evicted
+                since then cannot be restored and are skipped)
+        """
+        with self._lock:
+            for file_hash in file_hashes:
+                if file_hash in self._files or self._adopt(file_hash):
+                    self._acquire(session_key, file_hash)
+            for file_hash in list(self._sessions.get(session_key, ())):
+                if file_hash not in file_hashes:
+                    self._release(session_key, file_hash)
+            self._evict()
+
+    def release_session(self, session_key):
+        """
+        Drop every reference a session holds (its documents become evictable once unused)
+        Args:
+            session_key: Session identifier
+        """
+        with self._lock:
+            for file_hash in list(self._sessions.get(session_key, ())):
+                self._release(session_key, file_hash)
+            self._sessions.pop(session_key, None)
+            self._evict()
+
+    def memory_stats(self):
+        """
+        Size of the shared index
+        Returns:
+            Dictionary with document, session and chunk counts, chunks saved by sharing and
+            the vector memory in bytes (estimated from the embedding size for Chroma; on-disk
+            stores also report their disk usage)
+        """
+        with self._lock:
+            referenced = [entry for entry in self._files.values() if entry["refcount"]]
+            # Chunks a per-session index would have stored again for every extra session
+            chunks_saved = sum(
+                (entry["refcount"] - 1) * len(entry["chunk_ids"]) for entry in referenced
+            )
+            sessions = sum(1 for held in self._sessions.values() if held)
+            file_count = len(self._files)
+            chunk_count = self._chunk_count
+            vectorstore = self.vectorstore
+
+        if vectorstore is None or not chunk_count:
+            vector_bytes = 0
+        elif hasattr(vectorstore, "memory_bytes"):
+            vector_bytes = vectorstore.memory_bytes()
+        else:
+            sample = vectorstore.get(limit=1, include=["embeddings"])["embeddings"]
+            vector_bytes = chunk_count * len(sample[0]) * 4 if len(sample) else 0
+        disk = {"disk_bytes": vectorstore.disk_bytes()} if hasattr(vectorstore, "disk_bytes") else {}
+        return {
+            "files": file_count,
+            "referenced_files": len(referenced),
+            "unreferenced_files": file_count - len(referenced),
+            "sessions": sessions,
+            "chunks": chunk_count,
+            "chunks_saved_by_sharing": chunks_saved,
+            "vector_bytes": int(vector_bytes),
+            **disk,
+            **self.stats,
+        }
@@ -1,69 +1,441 @@
-from langchain_community.document_loaders import PyPDFLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
-import os
-import tempfile
-from config.settings import CHUNK_SIZE, CHUNK_OVERLAP, EMBEDDING_MODEL
+import hashlib
+import threading
+import uuid
+import weakref
+from config.settings import (
+    CHUNK_SIZE, CHUNK_OVERLAP, EMBEDDING_MODEL, EMBEDDING_CACHE_ENABLED,
+    STREAMING_INGESTION, INGEST_BATCH_SIZE, RETRIEVAL_MODE, RETRIEVER_K, TRACING_ENABLED,
+    VECTOR_STORE_BACKEND
+)
+from src.embedding_engine import EmbeddingEngine
+from src.embedding_registry import EmbeddingRegistry
+from src.pdf_parser import PDFParser, iter_pdf_pages
+from src.hybrid_retriever import BM25Index, HybridRetriever
+from src.numpy_vector_store import NumpyVectorStore
+from src.sharded_index import ShardedVectorStore
+from src.tracing import Tracer, TracedEmbeddings
+
+# Chunks copied per Chroma write when duplicating an index
+_COPY_BATCH_SIZE = 4096
+
+
+# Raised inside an ingestion run when its cancel event is set
+class IngestionCancelled(Exception):
+    pass
+
+
+def _check_cancelled(cancel_event):
+    """Stop an ingestion run between batches once cancellation has been requested"""
+    if cancel_event is not None and cancel_event.is_set():
+        raise IngestionCancelled()
+
 
 # Handles PDF processing, text splitting, embedding, and vector store creation
 class DocumentProcessor:
-    def __init__(self):
-        """Initialize the document processor with the embedding model and text splitter"""
-        # Load the embedding model from HuggingFace
-        self.embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+    # Lexical index kept alongside each vector store; dropped when the store is garbage collected
+    _lexical_indexes = weakref.WeakKeyDictionary()
+    # One in-memory Chroma client per process; concurrent client creation is not thread-safe
+    _chroma_client = None
+    _chroma_lock = threading.Lock()
+    
+    def __init__(self, embeddings=None):
+        """
+        Initialize the document processor with the embedding model and text splitter
+        Args:
+            embeddings: Embedding model to use instead of the shared registry model
+        """
+        # Reuse the process-wide embedding model (behind the batching engine and the on-disk cache)
+        # instead of loading a new copy
+        if embeddings is not None:
+            self.embedding_engine = EmbeddingEngine(embeddings)
+            self.embeddings = self.embedding_engine
+        else:
+            self.embedding_engine = EmbeddingRegistry.get_engine(EMBEDDING_MODEL)
+            if EMBEDDING_CACHE_ENABLED:
+                self.embeddings = EmbeddingRegistry.get_cached(EMBEDDING_MODEL)
+            else:
+                self.embeddings = self.embedding_engine
         # Set up the text splitter for chunking documents
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=CHUNK_SIZE, 
             chunk_overlap=CHUNK_OVERLAP
         )
-        self.temp_files = []  # Track temporary files for cleanup
+        # PDFs are parsed from memory, in parallel across processes
+        self.pdf_parser = PDFParser()
+        self.batch_size = INGEST_BATCH_SIZE  # Chunks per embedding/write batch when streaming
     
-    def process_uploaded_files(self, uploaded_files):
+    @staticmethod
+    def compute_file_hash(uploaded_file):
         """
-        Process uploaded PDF files: save, load, split, embed, and store in a vector DB.
+        Compute a content fingerprint for an uploaded file
+        Args:
+            uploaded_file: Uploaded PDF file from Streamlit
+        Returns:
+            SHA-256 hex digest of the file contents
+        """
+        return hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+    
+    def fingerprint_files(self, uploaded_files):
+        """
+        Map content fingerprints to uploaded files (identical uploads collapse to one entry)
         Args:
             uploaded_files: List of uploaded PDF files from Streamlit
         Returns:
-            Chroma vector store and retriever
+            Dictionary of file hash -> uploaded file
         """
-        documents = []  # Will hold all loaded documents
+        return {self.compute_file_hash(f): f for f in uploaded_files}
+    
+    @staticmethod
+    def corpus_fingerprint(indexed_files):
+        """
+        Fingerprint an indexed document set (file contents plus the settings that shape its chunks)
+        Args:
+            indexed_files: Dictionary of file hash -> index entry
+        Returns:
+            SHA-256 hex digest identifying the corpus
+        """
+        digest = hashlib.sha256(f"{EMBEDDING_MODEL}|{CHUNK_SIZE}|{CHUNK_OVERLAP}".encode("utf-8"))
+        for file_hash in sorted(indexed_files):
+            digest.update(file_hash.encode("utf-8"))
+        return digest.hexdigest()
+    
+    def load_file(self, uploaded_file):
+        """
+        Parse an uploaded PDF from memory into LangChain Documents
+        Args:
+            uploaded_file: Uploaded PDF file from Streamlit
+        Returns:
+            List of Documents, one per page
+        """
+        return self.pdf_parser.parse(uploaded_file.name, uploaded_file.getvalue())
+    
+    def create_vectorstore(self, path=None):
+        """
+        Create an empty vector store with its own collection
+        Args:
+            path: Directory for a private sharded index instead of the shared library at
+                SHARDED_INDEX_PATH (only used when VECTOR_STORE_BACKEND is "sharded")
+        Returns:
+            Chroma vector store, a NumpyVectorStore when VECTOR_STORE_BACKEND is "numpy", or the
+            process-wide on-disk ShardedVectorStore (not empty if documents were indexed before)
+            when it is "sharded"
+        """
+        # Embedding calls are timed separately from the vector store write around them
+        embedding_function = TracedEmbeddings(self.embeddings) if TRACING_ENABLED else self.embeddings
+        if VECTOR_STORE_BACKEND == "numpy":
+            return NumpyVectorStore(embedding_function)
+        if VECTOR_STORE_BACKEND == "sharded":
+            if path is not None:
+                return ShardedVectorStore(embedding_function, path)
+            return ShardedVectorStore.open_shared(embedding_function)
         
-        for uploaded_file in uploaded_files:
-            # Create a unique temporary file for each upload
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf')
-            temp_file_path = temp_file.name
-            self.temp_files.append(temp_file_path)
-            
-            # Save the uploaded file to the temp location
-            with open(temp_file_path, "wb") as file:
-                file.write(uploaded_file.getvalue())
-            
-            # Load PDF and extract text as LangChain Documents
-            loader = PyPDFLoader(temp_file_path)
-            docs = loader.load()
-            documents.extend(docs)
+        # Imported on first use: chromadb is slow to import and not needed until documents arrive
+        from langchain_chroma import Chroma
+        import chromadb
         
-        # Split all documents into manageable text chunks
-        splits = self.text_splitter.split_documents(documents)
+        with self._chroma_lock:
+            if DocumentProcessor._chroma_client is None:
+                DocumentProcessor._chroma_client = chromadb.EphemeralClient()
         
-        # Create a Chroma vector store from the text chunks using embeddings
-        vectorstore = Chroma.from_documents(
-            documents=splits, 
-            embedding=self.embeddings
+        # A unique collection name keeps each index isolated inside the shared Chroma client
+        return Chroma(
+            collection_name=f"rag-{uuid.uuid4().hex}",
+            embedding_function=embedding_function,
+            client=self._chroma_client
         )
+    
+    def copy_index(self, vectorstore):
+        """
+        Copy a vector store and its lexical index without re-embedding anything, so the
+        copy can be updated while the original keeps answering questions.
+        The cost grows with the whole corpus, not with the files being changed: a NumPy store
+        copies its arrays, and a Chroma collection is forked where the server supports it and
+        otherwise re-inserted page by page. Large corpora should use the corpus registry
+        (CORPUS_SHARING_ENABLED), which updates one shared index in place and copies nothing.
+        Args:
+            vectorstore: Vector store to copy
+        Returns:
+            New vector store holding the same chunks, IDs and embeddings
+        """
+        if isinstance(vectorstore, ShardedVectorStore):
+            # The on-disk index is shared by every session and only updated through the corpus registry
+            raise ValueError("A sharded index cannot be copied")
+        with Tracer.span("copy_index"):
+            if isinstance(vectorstore, NumpyVectorStore):
+                copy = vectorstore.copy()
+            else:
+                copy = self._copy_chroma(vectorstore)
+            if RETRIEVAL_MODE == "hybrid":
+                self._lexical_indexes[copy] = self.get_lexical_index(vectorstore).copy()
+        return copy
+    
+    def _copy_chroma(self, vectorstore):
+        """Copy a Chroma collection: a server-side fork if available, otherwise page by page"""
+        from langchain_chroma import Chroma
         
-        # Create a retriever interface for semantic search
-        retriever = vectorstore.as_retriever()
+        name = f"rag-{uuid.uuid4().hex}"
+        try:
+            vectorstore._collection.fork(name)
+        except NotImplementedError:
+            # The in-process client cannot fork; copy in pages so the corpus is never held twice
+            copy = self.create_vectorstore()
+            start = 0
+            while True:
+                page = vectorstore._collection.get(
+                    include=["embeddings", "documents", "metadatas"], limit=_COPY_BATCH_SIZE, offset=start
+                )
+                if not page["ids"]:
+                    return copy
+                # Chroma's wrapper has no public way to add precomputed embeddings
+                copy._collection.upsert(
+                    ids=page["ids"],
+                    embeddings=page["embeddings"],
+                    documents=page["documents"],
+                    metadatas=page["metadatas"]
+                )
+                start += len(page["ids"])
+        return Chroma(
+            collection_name=name,
+            embedding_function=vectorstore.embeddings,
+            client=self._chroma_client
+        )
+    
+    def drop_index(self, vectorstore):
+        """
+        Free a vector store that is no longer used (its collection, arrays or private index)
+        Args:
+            vectorstore: Vector store to drop
+        """
+        # The persistent store is the shared document library; it is never dropped with a session
+        if getattr(vectorstore, "persistent", False) and getattr(vectorstore, "shared", True):
+            return
+        vectorstore.delete_collection()
+    
+    def get_lexical_index(self, vectorstore):
+        """
+        Get the BM25 index that mirrors a vector store
+        Args:
+            vectorstore: Vector store the index belongs to
+        Returns:
+            BM25Index for the store (a sharded store keeps its own full-text index on disk)
+        """
+        if isinstance(vectorstore, ShardedVectorStore):
+            return vectorstore.lexical_index
+        if vectorstore not in self._lexical_indexes:
+            self._lexical_indexes[vectorstore] = BM25Index()
+        return self._lexical_indexes[vectorstore]
+    
+    def _add_chunks(self, vectorstore, chunks, chunk_ids):
+        """Write chunks to the vector store and its lexical index"""
+        # Span self time is the vector store insertion; the nested "embed" span is the embedding pass
+        with Tracer.span("vector_store_write", chunks=len(chunks)):
+            vectorstore.add_documents(chunks, ids=chunk_ids)
+        if RETRIEVAL_MODE == "hybrid":
+            with Tracer.span("lexical_index_write", chunks=len(chunks)):
+                self.get_lexical_index(vectorstore).add(chunk_ids, chunks)
+        Tracer.count("chunks_indexed", len(chunks))
+    
+    def _delete_chunks(self, vectorstore, chunk_ids):
+        """Delete chunks from the vector store and its lexical index"""
+        with Tracer.span("delete_chunks", chunks=len(chunk_ids)):
+            vectorstore.delete(ids=chunk_ids)
+            if RETRIEVAL_MODE == "hybrid":
+                self.get_lexical_index(vectorstore).remove(chunk_ids)
+    
+    def get_retriever(self, vectorstore, filter=None):
+        """
+        Create the retriever for a vector store
+        Args:
+            vectorstore: Vector store to search
+            filter: Optional metadata filter restricting results (e.g. to a session's files)
+        Returns:
+            Hybrid BM25 + dense retriever, or a dense-only retriever when RETRIEVAL_MODE is "dense"
+        """
+        search_kwargs = {"filter": filter} if filter else {}
+        if RETRIEVAL_MODE == "hybrid":
+            return HybridRetriever(
+                vectorstore=vectorstore,
+                lexical_index=self.get_lexical_index(vectorstore),
+                search_kwargs=search_kwargs
+            )
+        return vectorstore.as_retriever(search_kwargs={"k": RETRIEVER_K, **search_kwargs})
+    
+    @staticmethod
+    def _tag_splits(splits, file_hash, file_name):
+        """Record which uploaded file each chunk came from"""
+        for split in splits:
+            split.metadata["file_hash"] = file_hash
+            split.metadata["file_name"] = file_name
+        return splits
+    
+    def stream_file(self, vectorstore, uploaded_file, file_hash, progress_callback=None,
+                    cancel_event=None, chunk_ids=None):
+        """
+        Stream one PDF into a vector store: pages are parsed one at a time, split,
+        and written in fixed-size embedding batches as they are produced
+        Args:
+            vectorstore: Vector store to add the chunks to
+            uploaded_file: Uploaded PDF file from Streamlit
+            file_hash: Content fingerprint of the file
+            progress_callback: Optional callable(file_name, pages_done, total_pages, chunks_done)
+            cancel_event: Optional threading.Event; IngestionCancelled is raised after the page it is set on
+            chunk_ids: Optional list the chunk IDs are appended to as they are assigned (lets the
+                caller clean up a partially written file)
+        Returns:
+            List of chunk IDs written for the file
+        """
+        chunk_ids = [] if chunk_ids is None else chunk_ids
+        batch, batch_ids = [], []
+        pages_done = 0
         
-        return vectorstore, retriever
+        pages = Tracer.iter_spans("parse", iter_pdf_pages(uploaded_file.name, uploaded_file.getvalue()))
+        for page in pages:
+            with Tracer.span("split"):
+                splits = self._tag_splits(
+                    self.text_splitter.split_documents([page]), file_hash, uploaded_file.name
+                )
+            for split in splits:
+                # Deterministic chunk IDs let us delete a file's chunks later
+                chunk_id = f"{file_hash}-{len(chunk_ids)}"
+                chunk_ids.append(chunk_id)
+                batch.append(split)
+                batch_ids.append(chunk_id)
+                
+                # Embed and write a full batch, then drop it
+                if len(batch) >= self.batch_size:
+                    self._add_chunks(vectorstore, batch, batch_ids)
+                    batch, batch_ids = [], []
+            
+            pages_done += 1
+            Tracer.count("pages_parsed")
+            if progress_callback:
+                total_pages = page.metadata.get("total_pages", pages_done)
+                progress_callback(uploaded_file.name, pages_done, total_pages, len(chunk_ids))
+            _check_cancelled(cancel_event)
+        
+        # Write the final partial batch
+        if batch:
+            self._add_chunks(vectorstore, batch, batch_ids)
+        
+        return chunk_ids
     
-    def cleanup_temp_files(self):
-        """Delete all temporary files created during PDF upload/processing"""
-        for temp_file in self.temp_files:
-            if os.path.exists(temp_file):
+    def iter_index_files(self, vectorstore, new_files, streaming=STREAMING_INGESTION,
+                         progress_callback=None, cancel_event=None):
+        """
+        Index files into a vector store, yielding each file's entry as soon as it is written.
+        If indexing stops part-way through a file, that file's chunks are deleted again.
+        Args:
+            vectorstore: Vector store to add the chunks to
+            new_files: List of (file hash, uploaded file) pairs
+            streaming: Ingest page by page in bounded-memory batches instead of parsing whole files in parallel
+            progress_callback: Optional callable(file_name, pages_done, total_pages, chunks_done)
+            cancel_event: Optional threading.Event checked between files and pages
+        Yields:
+            Tuples of (file hash, {"name", "chunk_ids"})
+        """
+        if streaming:
+            # Page-by-page so memory is bounded by the batch size, not the file size
+            for file_hash, uploaded_file in new_files:
+                _check_cancelled(cancel_event)
+                chunk_ids = []
                 try:
-                    os.remove(temp_file)
-                except Exception as e:
-                    print(f"Warning: Could not remove temporary file {temp_file}: {e}")
-        self.temp_files = []  # Clear the list 
\ No newline at end of file
+                    self.stream_file(
+                        vectorstore, uploaded_file, file_hash, progress_callback, cancel_event, chunk_ids
+                    )
+                except BaseException:
+                    self._delete_chunks(vectorstore, chunk_ids)
+                    raise
+                yield file_hash, {"name": uploaded_file.name, "chunk_ids": chunk_ids}
+            return
+        
+        # Parse all new files in parallel, then split and embed each one
+        with Tracer.span("parse", files=len(new_files)):
+            parsed_files = self.pdf_parser.parse_many(
+                [(f.name, f.getvalue()) for _, f in new_files]
+            )
+        for (file_hash, uploaded_file), pages in zip(new_files, parsed_files):
+            _check_cancelled(cancel_event)
+            Tracer.count("pages_parsed", len(pages))
+            with Tracer.span("split", pages=len(pages)):
+                splits = self._tag_splits(
+                    self.text_splitter.split_documents(pages), file_hash, uploaded_file.name
+                )
+            
+            # Deterministic chunk IDs let us delete a file's chunks later
+            chunk_ids = [f"{file_hash}-{i}" for i in range(len(splits))]
+            if splits:
+                try:
+                    self._add_chunks(vectorstore, splits, chunk_ids)
+                except BaseException:
+                    self._delete_chunks(vectorstore, chunk_ids)
+                    raise
+            
+            if progress_callback:
+                progress_callback(uploaded_file.name, len(pages), len(pages), len(chunk_ids))
+            yield file_hash, {"name": uploaded_file.name, "chunk_ids": chunk_ids}
+    
+    def update_index(self, uploaded_files, vectorstore=None, indexed_files=None,
+                     streaming=STREAMING_INGESTION, progress_callback=None, cancel_event=None):
+        """
+        Incrementally sync a vector store with the uploaded files.
+        New files are embedded and added, removed files have their chunks deleted,
+        and unchanged files are left alone.
+        Args:
+            uploaded_files: List of uploaded PDF files from Streamlit
+            vectorstore: Existing vector store to update (a new one is created if None)
+            indexed_files: Dictionary of file hash -> {"name", "chunk_ids"} for the existing store
+            streaming: Ingest page by page in bounded-memory batches instead of parsing whole files in parallel
+            progress_callback: Optional callable(file_name, pages_done, total_pages, chunks_done)
+            cancel_event: Optional threading.Event checked between files and pages; when set,
+                IngestionCancelled is raised and the store is left partially updated
+        Returns:
+            Tuple of (vectorstore, retriever, indexed_files, changes) where changes
+            lists the names of added and removed files
+        """
+        # Timed per stage (fingerprint, parse, split, embed, vector store write) when tracing is on
+        with Tracer.trace("ingest", files=len(uploaded_files)):
+            indexed_files = dict(indexed_files or {})
+            if vectorstore is None:
+                vectorstore = self.create_vectorstore()
+                indexed_files = {}
+            
+            with Tracer.span("fingerprint"):
+                current_files = self.fingerprint_files(uploaded_files)
+            changes = {"added": [], "removed": []}
+            
+            # Delete chunks of files that are no longer uploaded
+            for file_hash in [h for h in indexed_files if h not in current_files]:
+                entry = indexed_files.pop(file_hash)
+                if entry["chunk_ids"]:
+                    self._delete_chunks(vectorstore, entry["chunk_ids"])
+                changes["removed"].append(entry["name"])
+            
+            # Index only the files that are not indexed yet
+            new_files = [(h, f) for h, f in current_files.items() if h not in indexed_files]
+            for file_hash, entry in self.iter_index_files(
+                vectorstore, new_files, streaming, progress_callback, cancel_event
+            ):
+                indexed_files[file_hash] = entry
+                changes["added"].append(entry["name"])
+            
+            # Create a retriever interface for semantic (and lexical) search
+            retriever = self.get_retriever(vectorstore)
+            Tracer.count("files_added", len(changes["added"]))
+            Tracer.count("files_removed", len(changes["removed"]))
+        
+        return vectorstore, retriever, indexed_files, changes
+    
+    def process_uploaded_files(self, uploaded_files, vectorstore=None):
+        """
+        Process uploaded PDF files: parse, split, embed, and store in a vector DB.
+        Args:
+            uploaded_files: List of uploaded PDF files from Streamlit
+            vectorstore: Empty vector store to index into (defaults to create_vectorstore())
+        Returns:
+            Vector store and retriever
+        """
+        # A full build is an incremental update against an empty index
+        vectorstore, retriever, _, _ = self.update_index(uploaded_files, vectorstore)
+        
+        return vectorstore, retriever
\ No newline at end of file
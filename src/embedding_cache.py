@@ -0,0 +1,190 @@
+from langchain_core.embeddings import Embeddings
+from array import array
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from config.settings import EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_ENTRIES
+from src.tracing import Tracer
+
+# SQLite limits the number of bound parameters per statement
+_SQL_BATCH_SIZE = 500
+# Eviction trims the cache to this share of max_entries, so it runs once per many inserts, not every batch
+_EVICT_TO_FRACTION = 0.9
+
+
+# Persistent embedding cache keyed by (model name, chunk text hash) that wraps any Embeddings
+class CachedEmbeddings(Embeddings):
+    def __init__(self, embeddings, model_name, db_path=EMBEDDING_CACHE_PATH,
+                 max_entries=EMBEDDING_CACHE_MAX_ENTRIES):
+        """
+        Initialize the cache in front of an embedding model
+        Args:
+            embeddings: Underlying embedding model used on cache misses
+            model_name: Name of the embedding model (part of the cache key)
+            db_path: Path of the SQLite cache file
+            max_entries: Maximum number of cached vectors before least recently used ones are evicted
+        """
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.hits = 0  # Texts served from the cache
+        self.misses = 0  # Texts sent to the underlying model
+        self.evictions = 0  # Vectors removed to respect max_entries
+        self._lock = threading.Lock()  # One connection shared by all threads
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        # WAL lets several app processes read the cache while one writes
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, text_hash TEXT NOT NULL, vector BLOB NOT NULL, "
+            "last_used REAL NOT NULL, PRIMARY KEY (model, text_hash))"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)"
+        )
+        self._conn.commit()
+        # Running upper bound of the row count (replaced rows and other processes' writes are
+        # reconciled by an exact count only once it crosses max_entries)
+        self._entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    @staticmethod
+    def hash_text(text):
+        """Hash chunk text for use as a cache key"""
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _lookup(self, text_hashes):
+        """
+        Fetch cached vectors and refresh their last-used time
+        Args:
+            text_hashes: Unique text hashes to look up
+        Returns:
+            Dictionary of text hash -> vector for the hashes found in the cache
+        """
+        found = {}
+        now = time.time()
+        with self._lock:
+            for i in range(0, len(text_hashes), _SQL_BATCH_SIZE):
+                batch = text_hashes[i:i + _SQL_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings "
+                    f"WHERE model = ? AND text_hash IN ({placeholders})",
+                    [self.model_name, *batch]
+                ).fetchall()
+                for text_hash, blob in rows:
+                    found[text_hash] = array("f", blob).tolist()
+                self._conn.execute(
+                    f"UPDATE embeddings SET last_used = ? "
+                    f"WHERE model = ? AND text_hash IN ({placeholders})",
+                    [now, self.model_name, *batch]
+                )
+            self._conn.commit()
+        return found
+
+    def _store(self, vectors_by_hash):
+        """
+        Write new vectors to the cache and evict the least recently used ones if needed
+        Args:
+            vectors_by_hash: Dictionary of text hash -> vector
+        """
+        now = time.time()
+        rows = [
+            (self.model_name, text_hash, array("f", vector).tobytes(), now)
+            for text_hash, vector in vectors_by_hash.items()
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_used) "
+                "VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._entries += len(rows)
+            if self._entries > self.max_entries:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Delete least recently used vectors down to _EVICT_TO_FRACTION of max_entries (caller holds the lock)"""
+        count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = 0
+        if count > self.max_entries:
+            excess = count - int(self.max_entries * _EVICT_TO_FRACTION)
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE rowid IN "
+                "(SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+                (excess,)
+            )
+            self.evictions += excess
+        self._entries = count - excess
+
+    def embed_documents(self, texts):
+        """
+        Embed texts, serving previously seen chunks from the cache
+        Args:
+            texts: List of chunk texts
+        Returns:
+            List of embedding vectors in the same order as texts
+        """
+        text_hashes = [self.hash_text(text) for text in texts]
+        unique_hashes = list(dict.fromkeys(text_hashes))
+        cached = self._lookup(unique_hashes)
+
+        # Embed each missing text once, even if it appears several times
+        missing = {h: text for h, text in zip(text_hashes, texts) if h not in cached}
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            new_vectors = dict(zip(missing.keys(), vectors))
+            self._store(new_vectors)
+            cached.update(new_vectors)
+
+        with self._lock:
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+        Tracer.count("embedding_cache_hits", len(texts) - len(missing))
+        Tracer.count("embedding_cache_misses", len(missing))
+
+        return [cached[h] for h in text_hashes]
+
+    def embed_query(self, text):
+        """
+        Embed a query without the cache: questions are rarely repeated verbatim (repeated
+        questions are served by the answer cache before retrieval), and a SQLite lookup plus a last-used
+        write would sit on every question's latency path for little benefit
+        Args:
+            text: Query text
+        Returns:
+            Embedding vector
+        """
+        return self.embeddings.embed_query(text)
+
+    def get_stats(self):
+        """
+        Get cache counters
+        Returns:
+            Dictionary with hits, misses, hit rate, evictions and the number of stored vectors
+        """
+        with self._lock:
+            entries = self._conn.execute(
+                "SELECT COUNT(*) FROM embeddings WHERE model = ?", (self.model_name,)
+            ).fetchone()[0]
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "evictions": self.evictions,
+                "entries": entries,
+            }
+
+    def clear(self):
+        """Remove every cached vector for this model"""
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings WHERE model = ?", (self.model_name,))
+            self._conn.commit()
@@ -0,0 +1,203 @@
+from langchain_core.embeddings import Embeddings
+import os
+import threading
+import time
+import numpy as np
+from config.settings import (
+    EMBED_MAX_BATCH_SIZE, EMBED_BATCH_TOKENS, EMBED_MAX_SEQ_TOKENS, EMBED_THREADS, EMBED_NORMALIZE,
+    INGEST_WORKERS
+)
+from src.context_packer import estimate_text_tokens
+from src.tracing import Tracer
+
+
+def default_threads():
+    """
+    Intra-op threads per embedding call when EMBED_THREADS is not set
+    Returns:
+        The cores split between the INGEST_WORKERS jobs that can embed at the same time
+    """
+    # Each calling thread gets its own team of intra-op threads, so cores x jobs would oversubscribe
+    return max((os.cpu_count() or 1) // INGEST_WORKERS, 1)
+
+
+def model_max_seq_tokens(embeddings):
+    """
+    Input length at which an embedding model truncates
+    Args:
+        embeddings: Embedding model (HuggingFaceEmbeddings wraps a SentenceTransformer)
+    Returns:
+        The model's max_seq_length, or None if it does not have one
+    """
+    model = getattr(embeddings, "_client", None)
+    length = getattr(model, "max_seq_length", None)
+    return int(length) if length else None
+
+
+def configure_threads(threads=EMBED_THREADS):
+    """
+    Set the intra-op thread count of the embedding backend
+    Args:
+        threads: Threads used by each matrix operation (None for default_threads())
+    Returns:
+        True if the setting was applied (False when torch is not installed)
+    """
+    threads = threads or default_threads()
+    try:
+        import torch
+    except ImportError:
+        # Models without torch (or the offline fakes) manage their own threads
+        return False
+    if torch.get_num_threads() != threads:
+        torch.set_num_threads(threads)
+    return True
+
+
+# Embedding stage: length-sorted, token-budgeted batches, vectorized normalization and throughput stats
+class EmbeddingEngine(Embeddings):
+    _threads_configured = False  # Intra-op threads are a process-wide setting; apply them once
+    _threads_lock = threading.Lock()
+
+    def __init__(self, embeddings, max_batch_size=EMBED_MAX_BATCH_SIZE, batch_tokens=EMBED_BATCH_TOKENS,
+                 max_seq_tokens=EMBED_MAX_SEQ_TOKENS, threads=EMBED_THREADS, normalize=EMBED_NORMALIZE):
+        """
+        Wrap an embedding model
+        Args:
+            embeddings: Underlying embedding model
+            max_batch_size: Most chunks sent to the model in one call
+            batch_tokens: Padded tokens allowed per batch (batch size x longest chunk in it)
+            max_seq_tokens: Length at which the model truncates input (None reads it from the
+                model; without one, texts are never treated as truncated)
+            threads: Intra-op threads for the model backend (None for default_threads())
+            normalize: L2-normalize every vector
+        """
+        self.embeddings = embeddings
+        self.max_batch_size = max_batch_size
+        self.batch_tokens = batch_tokens
+        self.max_seq_tokens = max_seq_tokens or model_max_seq_tokens(embeddings)
+        self.threads = threads or default_threads()
+        self.normalize = normalize
+        self._lock = threading.Lock()
+        self._stats = {"chunks": 0, "batches": 0, "seconds": 0.0, "tokens": 0, "padded_tokens": 0}
+
+    def _configure_threads(self):
+        """Apply the thread setting before the first embedding call"""
+        with self._threads_lock:
+            if not EmbeddingEngine._threads_configured:
+                configure_threads(self.threads)
+                EmbeddingEngine._threads_configured = True
+
+    def token_lengths(self, texts):
+        """Estimated tokens the model sees for each text (after truncation)"""
+        lengths = [max(estimate_text_tokens(text), 1) for text in texts]
+        if self.max_seq_tokens is None:
+            return lengths
+        return [min(length, self.max_seq_tokens) for length in lengths]
+
+    def plan_batches(self, texts, lengths=None):
+        """
+        Group texts into batches of similar length so little of each batch is padding
+        Args:
+            texts: Texts to embed
+            lengths: Precomputed token_lengths(texts)
+        Returns:
+            List of batches, each a list of indexes into texts
+        """
+        lengths = lengths or self.token_lengths(texts)
+        # Longest first, so the most memory-hungry batch runs first and fails early if it must
+        order = sorted(range(len(texts)), key=lengths.__getitem__, reverse=True)
+        batches, batch = [], []
+        for index in order:
+            # Every text in a batch is padded to its first (longest) text
+            longest = lengths[batch[0]] if batch else lengths[index]
+            if batch and (len(batch) >= self.max_batch_size or (len(batch) + 1) * longest > self.batch_tokens):
+                batches.append(batch)
+                batch = []
+            batch.append(index)
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _normalized(self, vectors):
+        """L2-normalize the rows of a matrix in one vectorized pass"""
+        if self.normalize:
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12
+        return vectors
+
+    def embed_documents(self, texts):
+        """
+        Embed texts in length-sorted batches
+        Args:
+            texts: Texts to embed
+        Returns:
+            List of vectors in the same order as texts
+        """
+        if not texts:
+            return []
+        self._configure_threads()
+        start = time.perf_counter()
+        lengths = self.token_lengths(texts)
+        batches = self.plan_batches(texts, lengths)
+        vectors = None
+        padded_tokens = tokens = 0
+        for batch in batches:
+            batch_vectors = np.asarray(
+                self.embeddings.embed_documents([texts[i] for i in batch]), dtype=np.float32
+            )
+            if vectors is None:
+                vectors = np.empty((len(texts), batch_vectors.shape[1]), dtype=np.float32)
+            # Scatter back into the caller's order
+            vectors[batch] = batch_vectors
+            tokens += sum(lengths[i] for i in batch)
+            padded_tokens += len(batch) * lengths[batch[0]]
+        vectors = self._normalized(vectors)
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self._stats["chunks"] += len(texts)
+            self._stats["batches"] += len(batches)
+            self._stats["seconds"] += elapsed
+            self._stats["tokens"] += tokens
+            self._stats["padded_tokens"] += padded_tokens
+        Tracer.count("embed_chunks", len(texts))
+        Tracer.count("embed_batches", len(batches))
+        return vectors.tolist()
+
+    def embed_query(self, text):
+        """
+        Embed a query (normalized like the documents)
+        Args:
+            text: Query text
+        Returns:
+            Embedding vector
+        """
+        self._configure_threads()
+        vector = np.asarray([self.embeddings.embed_query(text)], dtype=np.float32)
+        return self._normalized(vector)[0].tolist()
+
+    def get_stats(self):
+        """
+        Get throughput figures
+        Returns:
+            Dictionary with chunk and batch counts, chunks/sec, average batch size,
+            the share of padded tokens that carried text, and the settings in use
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        return {
+            "chunks": stats["chunks"],
+            "batches": stats["batches"],
+            "seconds": round(stats["seconds"], 3),
+            "chunks_per_sec": round(stats["chunks"] / stats["seconds"], 1) if stats["seconds"] else None,
+            "avg_batch_size": round(stats["chunks"] / stats["batches"], 1) if stats["batches"] else None,
+            "padding_efficiency": round(stats["tokens"] / stats["padded_tokens"], 3) if stats["padded_tokens"] else None,
+            "max_batch_size": self.max_batch_size,
+            "batch_tokens": self.batch_tokens,
+            "max_seq_tokens": self.max_seq_tokens,
+            "threads": self.threads,
+        }
+
+    def reset_stats(self):
+        """Zero the throughput counters"""
+        with self._lock:
+            self._stats = {"chunks": 0, "batches": 0, "seconds": 0.0, "tokens": 0, "padded_tokens": 0}
@@ -0,0 +1,196 @@
+import logging
+import os
+import resource
+import threading
+import time
+from config.settings import EMBEDDING_MODEL, EMBED_MAX_BATCH_SIZE, EMBED_NORMALIZE
+from src.embedding_cache import CachedEmbeddings
+from src.embedding_engine import EmbeddingEngine
+from src.tracing import Tracer
+
+logger = logging.getLogger("rag.embeddings")
+
+
+def current_rss_mb():
+    """
+    Get the resident memory of the current process
+    Returns:
+        Resident set size in megabytes
+    """
+    try:
+        # /proc gives the current RSS on Linux
+        with open("/proc/self/statm") as statm:
+            resident_pages = int(statm.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        # Fall back to the peak RSS (KB on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        divisor = 1024 * 1024 if os.uname().sysname == "Darwin" else 1024
+        return peak / divisor
+
+
+# Process-wide registry that loads each embedding model once and shares it across sessions
+class EmbeddingRegistry:
+    _models = {}  # model_name -> loaded embeddings
+    _engines = {}  # model_name -> batching engine wrapping the loaded embeddings
+    _cached = {}  # model_name -> persistent cache in front of the engine
+    _stats = {}  # model_name -> load statistics
+    _model_locks = {}  # model_name -> lock guarding the load
+    _lock = threading.Lock()  # Guards the dictionaries above
+    _warmup_thread = None  # Background loader started by warm_up()
+
+    @classmethod
+    def _get_model_lock(cls, model_name):
+        """Get (or create) the lock that serializes loading of a model"""
+        with cls._lock:
+            if model_name not in cls._model_locks:
+                cls._model_locks[model_name] = threading.Lock()
+            return cls._model_locks[model_name]
+
+    @classmethod
+    def get(cls, model_name=EMBEDDING_MODEL):
+        """
+        Get the shared embedding model, loading it on first use
+        Args:
+            model_name: HuggingFace embedding model name
+        Returns:
+            Shared HuggingFaceEmbeddings instance
+        """
+        # Fast path: the model is already loaded
+        embeddings = cls._models.get(model_name)
+        if embeddings is not None:
+            return embeddings
+
+        # Only one thread loads a given model; others wait for it
+        with cls._get_model_lock(model_name):
+            embeddings = cls._models.get(model_name)
+            if embeddings is not None:
+                return embeddings
+
+            # Imported here so importing the registry does not pull in the model stack
+            from langchain_huggingface import HuggingFaceEmbeddings
+
+            rss_before = current_rss_mb()
+            start = time.perf_counter()
+            # The engine already hands over right-sized batches; don't let the model split them again
+            embeddings = HuggingFaceEmbeddings(
+                model_name=model_name, encode_kwargs={"batch_size": EMBED_MAX_BATCH_SIZE}
+            )
+            # Run one embedding so lazy initialization happens now, not on the first upload
+            embeddings.embed_query("warm up")
+            load_time = time.perf_counter() - start
+            rss_after = current_rss_mb()
+
+            with cls._lock:
+                cls._models[model_name] = embeddings
+                cls._stats[model_name] = {
+                    "load_time_s": round(load_time, 3),
+                    "rss_delta_mb": round(rss_after - rss_before, 1),
+                    "rss_after_load_mb": round(rss_after, 1),
+                }
+            logger.info(
+                "Loaded embedding model %s in %.2fs (+%.1f MB RSS, %.1f MB total)",
+                model_name, load_time, rss_after - rss_before, rss_after
+            )
+            return embeddings
+
+    @classmethod
+    def get_engine(cls, model_name=EMBEDDING_MODEL):
+        """
+        Get the shared embedding model behind the batching embedding engine
+        Args:
+            model_name: HuggingFace embedding model name
+        Returns:
+            Shared EmbeddingEngine instance
+        """
+        engine = cls._engines.get(model_name)
+        if engine is not None:
+            return engine
+
+        embeddings = cls.get(model_name)
+        with cls._lock:
+            if model_name not in cls._engines:
+                cls._engines[model_name] = EmbeddingEngine(embeddings)
+            return cls._engines[model_name]
+
+    @classmethod
+    def get_cached(cls, model_name=EMBEDDING_MODEL):
+        """
+        Get the shared embedding engine behind the persistent on-disk embedding cache
+        Args:
+            model_name: HuggingFace embedding model name
+        Returns:
+            Shared CachedEmbeddings instance
+        """
+        cached = cls._cached.get(model_name)
+        if cached is not None:
+            return cached
+
+        engine = cls.get_engine(model_name)
+        # Normalized and raw vectors of the same model must not be served for each other
+        cache_key = f"{model_name}|normalized" if EMBED_NORMALIZE else model_name
+        with cls._lock:
+            if model_name not in cls._cached:
+                cls._cached[model_name] = CachedEmbeddings(engine, cache_key)
+            return cls._cached[model_name]
+
+    @classmethod
+    def warm_up(cls, model_names=None, background=True):
+        """
+        Load embedding models ahead of the first upload
+        Args:
+            model_names: Models to load (defaults to the configured embedding model)
+            background: Load in a daemon thread so the UI is not blocked
+        Returns:
+            The loader thread when running in the background, otherwise None
+        """
+        model_names = model_names or [EMBEDDING_MODEL]
+        pending = [name for name in model_names if name not in cls._models]
+        if not pending:
+            return None
+
+        def load_all():
+            for name in pending:
+                try:
+                    cls.get(name)
+                except Exception as e:
+                    logger.warning("Could not warm up embedding model %s: %s", name, e)
+
+        if not background:
+            load_all()
+            return None
+
+        with cls._lock:
+            # Streamlit reruns call this repeatedly; keep a single loader thread
+            if cls._warmup_thread is None or not cls._warmup_thread.is_alive():
+                cls._warmup_thread = threading.Thread(
+                    target=load_all, name="embedding-warmup", daemon=True
+                )
+                cls._warmup_thread.start()
+            return cls._warmup_thread
+
+    @classmethod
+    def is_loaded(cls, model_name=EMBEDDING_MODEL):
+        """Check whether a model has finished loading"""
+        return model_name in cls._models
+
+    @classmethod
+    def get_stats(cls):
+        """
+        Get load statistics for every loaded model
+        Returns:
+            Dictionary of model name -> load time, memory, cache and throughput figures, plus current RSS
+        """
+        with cls._lock:
+            stats = {name: dict(values) for name, values in cls._stats.items()}
+            cached = dict(cls._cached)
+            engines = dict(cls._engines)
+        for name, cache in cached.items():
+            stats.setdefault(name, {})["cache"] = cache.get_stats()
+        for name, engine in engines.items():
+            stats.setdefault(name, {})["engine"] = engine.get_stats()
+        return {"models": stats, "current_rss_mb": round(current_rss_mb(), 1)}
+
+
+# Load time, memory, cache and throughput figures appear in the debug panel and the metrics export
+Tracer.register_stats("embeddings", EmbeddingRegistry.get_stats)
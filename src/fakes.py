@@ -0,0 +1,146 @@
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+import asyncio
+import hashlib
+import math
+import re
+import threading
+import time
+
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+_call_count_lock = threading.Lock()
+
+
+# Deterministic, dependency-free embeddings for offline runs (hashed bag of words)
+class FakeEmbeddings(Embeddings):
+    def __init__(self, size=384, query_delay=0.0):
+        """
+        Initialize the fake embedding model
+        Args:
+            size: Vector dimension
+            query_delay: Seconds embed_query waits, to mimic a slower or remote embedding model
+        """
+        self.size = size
+        self.query_delay = query_delay
+
+    def _embed(self, text):
+        """Hash each word into a bucket and L2-normalize, so texts sharing words are similar"""
+        vector = [0.0] * self.size
+        for word in _WORD_PATTERN.findall(text.lower()):
+            digest = hashlib.md5(word.encode("utf-8")).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.size
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(value * value for value in vector))
+        return [value / norm for value in vector] if norm else vector
+
+    def embed_documents(self, texts):
+        """Embed a list of texts"""
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        """Embed a query"""
+        if self.query_delay:
+            time.sleep(self.query_delay)
+        return self._embed(text)
+
+
+# Local stand-in for the Groq chat model with an injectable per-call delay
+class StubChatModel(BaseChatModel):
+    delay: float = 0.0  # Seconds to wait before answering, to mimic an upstream round trip
+    token_delay: float = 0.0  # Seconds between streamed tokens
+    rewrite_suffix: str = ""  # Appended to rewritten questions, to mimic rewrites that change the question
+    call_count: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub-chat-model"
+
+    def _reply(self, messages):
+        """
+        Build a deterministic reply from the prompt
+        Args:
+            messages: Prompt messages
+        Returns:
+            The question itself (plus rewrite_suffix) for rewrite prompts, otherwise a canned answer echoing it
+        """
+        with _call_count_lock:
+            self.call_count += 1
+        question = messages[-1].content if messages else ""
+        system = messages[0].content if messages and messages[0].type == "system" else ""
+        if "standalone question" in system:
+            return question + self.rewrite_suffix
+        return f"Stub answer to: {question}"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.delay)
+        message = AIMessage(content=self._reply(messages))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self.delay)
+        message = AIMessage(content=self._reply(messages))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.delay)
+        for token in re.split(r"(\s+)", self._reply(messages)):
+            if token:
+                time.sleep(self.token_delay)
+                chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+                if run_manager:
+                    run_manager.on_llm_new_token(token, chunk=chunk)
+                yield chunk
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.delay)
+        for token in re.split(r"(\s+)", self._reply(messages)):
+            if token:
+                await asyncio.sleep(self.token_delay)
+                chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+                if run_manager:
+                    await run_manager.on_llm_new_token(token, chunk=chunk)
+                yield chunk
+
+
+def make_synthetic_pdf(pages):
+    """
+    Build a minimal text PDF in memory (no PDF-writing dependency needed)
+    Args:
+        pages: List of page texts
+    Returns:
+        PDF file bytes readable by pypdf
+    """
+    page_count = len(pages)
+    font_id = 3 + 2 * page_count
+    kids = " ".join(f"{3 + 2 * i} 0 R" for i in range(page_count))
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{kids}] /Count {page_count} >>",
+    ]
+    for i, text in enumerate(pages):
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {4 + 2 * i} 0 R "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> >>"
+        )
+        # One text line per 90 characters; parentheses and backslashes would need escaping
+        clean = re.sub(r"[()\\]", " ", text)
+        lines = [clean[j:j + 90] for j in range(0, len(clean), 90)] or [""]
+        body = "BT /F1 9 Tf 36 756 Td 11 TL " + " ".join(f"({line}) '" for line in lines) + " ET"
+        objects.append(f"<< /Length {len(body)} >>\nstream\n{body}\nendstream")
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, content in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n{content}\nendobj\n".encode("latin-1", "replace")
+    xref_offset = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    for offset in offsets:
+        output += f"{offset:010d} 00000 n \n".encode("latin-1")
+    output += (
+        f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n"
+    ).encode("latin-1")
+    return bytes(output)
@@ -0,0 +1,252 @@
+from langchain_core.messages import SystemMessage
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from collections import OrderedDict
+import hashlib
+import threading
+from config.settings import (
+    HISTORY_TOKEN_BUDGET, HISTORY_KEEP_TURNS, HISTORY_SUMMARY_MAX_SESSIONS, SUMMARIZE_HISTORY_PROMPT
+)
+from src.tracing import Tracer
+
+SUMMARY_PREFIX = "Summary of the earlier conversation: "
+
+
+def estimate_tokens(messages):
+    """
+    Cheaply estimate the prompt tokens used by chat messages (~4 characters per token)
+    Args:
+        messages: List of chat messages
+    Returns:
+        Estimated token count
+    """
+    # A few tokens of per-message overhead for role markers
+    return sum(len(message.content) // 4 + 4 for message in messages)
+
+
+# Keeps chat history within a token budget: recent turns verbatim, older turns in a rolling summary
+class HistoryCompressor:
+    # Summaries are process-wide so they survive Streamlit reruns
+    # (history owner, session_id) -> {"summary", "summarized_count", "prefix_digest", "anchor_id"},
+    # least recently used first
+    _states = OrderedDict()
+    _lock = threading.Lock()
+
+    def __init__(self, llm, token_budget=HISTORY_TOKEN_BUDGET, keep_turns=HISTORY_KEEP_TURNS,
+                 max_sessions=HISTORY_SUMMARY_MAX_SESSIONS):
+        """
+        Initialize the compressor
+        Args:
+            llm: Chat model used to update the rolling summary
+            token_budget: Target token size of the history injected into prompts
+            keep_turns: Number of most recent question/answer turns always kept verbatim
+            max_sessions: Rolling summaries kept in memory; the least recently used are dropped
+        """
+        self.token_budget = token_budget
+        self.keep_messages = keep_turns * 2
+        self.max_sessions = max_sessions
+        summarize_prompt = ChatPromptTemplate.from_messages([
+            ("system", SUMMARIZE_HISTORY_PROMPT),
+            ("human", "Current summary:\n{summary}\n\nNew conversation lines:\n{new_lines}"),
+        ])
+        self.summarize_chain = (
+            summarize_prompt | llm | StrOutputParser()
+        ).with_config(run_name="summarize_history")
+
+    @staticmethod
+    def _digest(messages):
+        """Hash messages so a changed or cleared history can be detected"""
+        digest = hashlib.sha256()
+        for message in messages:
+            digest.update(f"{message.type}\x00{message.content}\x1e".encode("utf-8"))
+        return digest.hexdigest()
+
+    @staticmethod
+    def _state_key(session_id, history):
+        """
+        Key of a conversation's summary
+        Args:
+            session_id: Session identifier
+            history: Chat message history object the messages come from (None if unknown)
+        Returns:
+            Tuple of (history owner, session_id)
+        """
+        # Durable histories of one store are the same conversation in every tab; in-memory
+        # histories (one per browser tab) are separate conversations even under the same session ID
+        owner = getattr(history, "store", history)
+        return (id(owner) if owner is not None else None, session_id)
+
+    def _get_state(self, key, chat_history, history=None):
+        """
+        Get a conversation's summary state, resetting it if the summarized messages are gone
+        Args:
+            key: Key from _state_key()
+            chat_history: Messages of the conversation
+            history: Chat message history object the messages come from
+        Returns:
+            State dictionary whose 'summarized_count' is relative to chat_history
+        """
+        with self._lock:
+            state = self._states.get(key)
+            if state:
+                self._states.move_to_end(key)
+        if state:
+            anchor_id = state["anchor_id"]
+            if anchor_id is None:
+                # Messages without IDs: the summarized prefix must still be at the start
+                count = state["summarized_count"]
+                if count <= len(chat_history) and self._digest(chat_history[:count]) == state["prefix_digest"]:
+                    return state
+            else:
+                # Windowed stores drop the oldest messages, so find the last summarized one by ID
+                for index in range(len(chat_history) - 1, -1, -1):
+                    if chat_history[index].id == anchor_id:
+                        return {**state, "summarized_count": index + 1}
+                window = getattr(history, "window", None)
+                if window is not None and len(chat_history) >= window:
+                    # It slid out of a full window: every loaded message is newer than the summary
+                    return {**state, "summarized_count": 0}
+        return {"summary": "", "summarized_count": 0, "prefix_digest": self._digest([]), "anchor_id": None}
+
+    @staticmethod
+    def _prompt_messages(summary, messages):
+        """Messages injected into prompts: the rolling summary (if any) then the unsummarized turns"""
+        head = [SystemMessage(content=SUMMARY_PREFIX + summary)] if summary else []
+        return head + list(messages)
+
+    def _plan(self, chat_history, session_id, history):
+        """
+        Load a conversation's summary and pick the older turns to fold into it
+        Args:
+            chat_history: Full list of chat messages for the session
+            session_id: Session identifier
+            history: Chat message history object the messages come from
+        Returns:
+            Tuple of (state key, summary, summarized count, messages to fold, summarize chain
+            inputs or None when the history already fits the budget)
+        """
+        key = self._state_key(session_id, history)
+        state = self._get_state(key, chat_history, history)
+        summary = state["summary"]
+        count = state["summarized_count"]
+
+        # Fold older unsummarized turns into the summary only when the budget is exceeded,
+        # so one summary call covers several turns instead of one call per turn
+        unsummarized = chat_history[count:]
+        prompt_tokens = estimate_tokens(self._prompt_messages(summary, unsummarized))
+        if prompt_tokens <= self.token_budget or len(unsummarized) <= self.keep_messages:
+            return key, summary, count, 0, None
+        to_fold = unsummarized[:len(unsummarized) - self.keep_messages]
+        new_lines = "\n".join(f"{message.type}: {message.content}" for message in to_fold)
+        return key, summary, count, len(to_fold), {"summary": summary or "(none)", "new_lines": new_lines}
+
+    def _finish(self, key, chat_history, summary, count, folded, new_summary):
+        """
+        Record a folded summary and build the budgeted history
+        Args:
+            key: Key from _state_key()
+            chat_history: Full list of chat messages for the session
+            summary: Summary before folding
+            count: Messages covered by that summary
+            folded: Number of messages folded into new_summary (0 if none)
+            new_summary: Output of the summarize chain (None if it was not called)
+        Returns:
+            Tuple of (messages to inject into prompts, tokens saved, summary LLM calls made)
+        """
+        llm_calls = 0
+        if new_summary is not None:
+            summary = new_summary.strip()
+            count += folded
+            llm_calls = 1
+            with self._lock:
+                self._states[key] = {
+                    "summary": summary,
+                    "summarized_count": count,
+                    "prefix_digest": self._digest(chat_history[:count]),
+                    "anchor_id": chat_history[count - 1].id,
+                }
+                self._states.move_to_end(key)
+                while len(self._states) > self.max_sessions:
+                    self._states.popitem(last=False)
+
+        messages = self._prompt_messages(summary, chat_history[count:])
+        tokens_saved = max(estimate_tokens(chat_history) - estimate_tokens(messages), 0)
+        Tracer.count("history_tokens_saved", tokens_saved)
+        return messages, tokens_saved, llm_calls
+
+    def compress(self, chat_history, session_id, history=None):
+        """
+        Fit a chat history into the token budget
+        Args:
+            chat_history: Full list of chat messages for the session
+            session_id: Session identifier (the rolling summary is kept per session)
+            history: Chat message history object the messages come from, so conversations of
+                different stores or tabs under the same session ID keep separate summaries
+        Returns:
+            Tuple of (messages to inject into prompts, tokens saved, summary LLM calls made)
+        """
+        key, summary, count, folded, summarize_inputs = self._plan(chat_history, session_id, history)
+        new_summary = self.summarize_chain.invoke(summarize_inputs) if summarize_inputs else None
+        return self._finish(key, chat_history, summary, count, folded, new_summary)
+
+    async def acompress(self, chat_history, session_id, history=None):
+        """
+        Async version of compress(): the summary call does not block the event loop
+        Args:
+            chat_history: Full list of chat messages for the session
+            session_id: Session identifier (the rolling summary is kept per session)
+            history: Chat message history object the messages come from
+        Returns:
+            Tuple of (messages to inject into prompts, tokens saved, summary LLM calls made)
+        """
+        key, summary, count, folded, summarize_inputs = self._plan(chat_history, session_id, history)
+        new_summary = await self.summarize_chain.ainvoke(summarize_inputs) if summarize_inputs else None
+        return self._finish(key, chat_history, summary, count, folded, new_summary)
+
+    @staticmethod
+    def _compressed_inputs(inputs, compressed):
+        """Replace 'chat_history' with a compress() result"""
+        messages, tokens_saved, llm_calls = compressed
+        return {
+            **inputs,
+            "chat_history": messages,
+            "history_tokens_saved": tokens_saved,
+            "summary_llm_calls": llm_calls,
+        }
+
+    def compress_inputs(self, inputs, config):
+        """
+        Chain step that replaces 'chat_history' with its budgeted form
+        Args:
+            inputs: Dict with 'input' and 'chat_history'
+            config: Runnable config carrying the session_id (and the message history object that
+                RunnableWithMessageHistory adds)
+        Returns:
+            Inputs with the compressed history plus 'history_tokens_saved' and 'summary_llm_calls'
+        """
+        configurable = config.get("configurable", {})
+        return self._compressed_inputs(inputs, self.compress(
+            inputs.get("chat_history") or [],
+            configurable.get("session_id", "default"),
+            configurable.get("message_history")
+        ))
+
+    async def acompress_inputs(self, inputs, config):
+        """Async version of compress_inputs() for async chains"""
+        configurable = config.get("configurable", {})
+        return self._compressed_inputs(inputs, await self.acompress(
+            inputs.get("chat_history") or [],
+            configurable.get("session_id", "default"),
+            configurable.get("message_history")
+        ))
+
+    @classmethod
+    def reset(cls, session_id):
+        """
+        Forget a session's rolling summaries (of every history store)
+        Args:
+            session_id: Session identifier
+        """
+        with cls._lock:
+            for key in [key for key in cls._states if key[1] == session_id]:
+                del cls._states[key]
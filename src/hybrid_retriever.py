@@ -0,0 +1,223 @@
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+from collections import Counter, defaultdict
+from typing import Any, Dict, List
+import math
+import re
+import threading
+from config.settings import RETRIEVER_K, HYBRID_FETCH_K, RRF_K
+from src.numpy_vector_store import matches_filter
+from src.tracing import Tracer
+
+# Identifier-friendly tokens: keeps part numbers, clause IDs and error codes such as "ERR-404" or "4.2.1"
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-_./:#][a-z0-9]+)*")
+_SEPARATOR_PATTERN = re.compile(r"[-_./:#]")
+
+
+def tokenize(text):
+    """
+    Split text into lowercase lexical terms for the inverted index
+    Args:
+        text: Text to tokenize
+    Returns:
+        List of terms; compound identifiers are kept whole and also split into their parts
+    """
+    terms = []
+    for token in _TOKEN_PATTERN.findall(text.lower()):
+        terms.append(token)
+        if _SEPARATOR_PATTERN.search(token):
+            terms.extend(part for part in _SEPARATOR_PATTERN.split(token) if part)
+    return terms
+
+
+def fetch_documents(vectorstore, ids):
+    """
+    Load chunks from a vector store
+    Args:
+        vectorstore: Vector store holding the chunks
+        ids: Chunk IDs
+    Returns:
+        Dictionary of chunk ID -> Document (IDs the store no longer has are left out)
+    """
+    data = vectorstore.get(ids=list(ids), include=["documents", "metadatas"])
+    return {
+        chunk_id: Document(id=chunk_id, page_content=text, metadata=metadata or {})
+        for chunk_id, text, metadata in zip(data["ids"], data["documents"], data["metadatas"])
+    }
+
+
+# Compact, incrementally updatable BM25 inverted index over chunk IDs (texts stay in the vector store)
+class BM25Index:
+    def __init__(self, k1=1.5, b=0.75):
+        """
+        Initialize an empty index
+        Args:
+            k1: BM25 term-frequency saturation
+            b: BM25 document-length normalization
+        """
+        self.k1 = k1
+        self.b = b
+        self._postings = defaultdict(dict)  # term -> {doc_id: term frequency}
+        self._doc_terms = {}  # doc_id -> distinct terms (needed to remove the doc later)
+        self._doc_lengths = {}  # doc_id -> number of terms
+        self._total_length = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._doc_lengths)
+
+    def add(self, ids, documents):
+        """
+        Add (or replace) documents in the index
+        Args:
+            ids: Chunk IDs, shared with the vector store
+            documents: Documents to index
+        """
+        with self._lock:
+            for doc_id, document in zip(ids, documents):
+                if doc_id in self._doc_lengths:
+                    self._remove_one(doc_id)
+                counts = Counter(tokenize(document.page_content))
+                for term, count in counts.items():
+                    self._postings[term][doc_id] = count
+                length = sum(counts.values())
+                self._doc_terms[doc_id] = tuple(counts)
+                self._doc_lengths[doc_id] = length
+                self._total_length += length
+
+    def _remove_one(self, doc_id):
+        """Remove a single document (caller holds the lock)"""
+        for term in self._doc_terms.pop(doc_id, ()):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_length -= self._doc_lengths.pop(doc_id, 0)
+
+    def remove(self, ids):
+        """
+        Remove documents from the index
+        Args:
+            ids: Chunk IDs to remove
+        """
+        with self._lock:
+            for doc_id in ids:
+                self._remove_one(doc_id)
+
+    def copy(self):
+        """
+        Copy the index (postings are copied)
+        Returns:
+            Independent BM25Index with the same contents
+        """
+        with self._lock:
+            index = BM25Index(self.k1, self.b)
+            index._postings = defaultdict(dict, {term: dict(p) for term, p in self._postings.items()})
+            index._doc_terms = dict(self._doc_terms)
+            index._doc_lengths = dict(self._doc_lengths)
+            index._total_length = self._total_length
+            return index
+
+    def rank(self, query):
+        """
+        Score every chunk containing a query term with BM25
+        Args:
+            query: Query text
+        Returns:
+            List of (chunk ID, score) tuples, best first
+        """
+        with self._lock:
+            doc_count = len(self._doc_lengths)
+            if not doc_count:
+                return []
+            avg_length = self._total_length / doc_count
+            scores = defaultdict(float)
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[doc_id] / avg_length)
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+    def search(self, query, k=HYBRID_FETCH_K, filter=None, vectorstore=None):
+        """
+        Rank documents against a query with BM25
+        Args:
+            query: Query text
+            k: Number of results
+            filter: Optional metadata filter (equality or {"$in": [...]} per key)
+            vectorstore: Vector store the chunk texts and metadata are loaded from
+        Returns:
+            List of (Document, score) tuples, best first
+        """
+        ranked = self.rank(query)
+        results = []
+        # Only the best-ranked chunks are loaded; with a filter, more are loaded until k match
+        page_size = max(k, 1) if not filter else max(4 * k, 64)
+        for start in range(0, len(ranked), page_size):
+            page = ranked[start:start + page_size]
+            documents = fetch_documents(vectorstore, [doc_id for doc_id, _ in page])
+            for doc_id, score in page:
+                document = documents.get(doc_id)
+                if document is None or (filter and not matches_filter(document.metadata, filter)):
+                    continue
+                results.append((document, score))
+                if len(results) >= k:
+                    return results
+        return results
+
+
+def fuse_rankings(rankings, k, rrf_k=RRF_K):
+    """
+    Merge ranked document lists with reciprocal rank fusion (each list contributes 1 / (rrf_k + rank))
+    Args:
+        rankings: Lists of Documents, best first (earlier lists win ties)
+        k: Number of documents to return
+        rrf_k: Fusion damping constant
+    Returns:
+        Top-k documents by fused rank
+    """
+    fused_scores = defaultdict(float)
+    documents = {}
+    for ranked in rankings:
+        for rank, document in enumerate(ranked):
+            key = document.id or document.page_content
+            fused_scores[key] += 1.0 / (rrf_k + rank + 1)
+            documents.setdefault(key, document)
+    return [documents[key] for key in sorted(fused_scores, key=fused_scores.get, reverse=True)[:k]]
+
+
+# Retriever that fuses dense (vector store) and lexical (BM25) results with reciprocal rank fusion
+class HybridRetriever(BaseRetriever):
+    vectorstore: VectorStore
+    lexical_index: Any  # BM25Index, or any index with the same search() (e.g. ShardedLexicalIndex)
+    k: int = RETRIEVER_K
+    fetch_k: int = HYBRID_FETCH_K
+    rrf_k: int = RRF_K
+    search_kwargs: Dict[str, Any] = {}
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        """
+        Retrieve documents for a query
+        Args:
+            query: Query text
+        Returns:
+            Top-k documents by fused rank
+        """
+        # Stage latencies go to the request's trace; the retriever is shared, so it keeps no state
+        with Tracer.span("dense_search"):
+            dense = self.vectorstore.similarity_search(query, k=self.fetch_k, **self.search_kwargs)
+        with Tracer.span("lexical_search"):
+            lexical = self.lexical_index.search(
+                query, k=self.fetch_k, filter=self.search_kwargs.get("filter"), vectorstore=self.vectorstore
+            )
+
+        with Tracer.span("rank_fusion"):
+            return fuse_rankings(
+                [dense, [document for document, _ in lexical]], k=self.k, rrf_k=self.rrf_k
+            )
@@ -0,0 +1,205 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+import uuid
+from config.settings import INGEST_WORKERS
+from src.document_processor import DocumentProcessor, IngestionCancelled
+from src.tracing import Tracer
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+
+# State, per-file progress and result of one background ingestion run
+class IngestionJob:
+    def __init__(self, file_hashes, new_file_names):
+        """
+        Initialize a queued job
+        Args:
+            file_hashes: Content fingerprints of every upload the job indexes
+            new_file_names: Names of the uploads that still need to be embedded
+        """
+        self.id = uuid.uuid4().hex
+        self.file_hashes = frozenset(file_hashes)
+        self.status = QUEUED
+        self.error = None
+        self.result = None  # (vectorstore, retriever, indexed_files, changes) once done
+        self.created_at = time.time()
+        self.finished_at = None
+        # file name -> {"pages_done", "total_pages", "chunks_done"}
+        self.progress = {name: {"pages_done": 0, "total_pages": 0, "chunks_done": 0}
+                         for name in new_file_names}
+        self.cancel_event = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_STATES
+
+    def cancel(self):
+        """Ask the job to stop at its next page or file boundary"""
+        self.cancel_event.set()
+
+    def on_progress(self, file_name, pages_done, total_pages, chunks_done):
+        """Progress callback passed to DocumentProcessor.update_index"""
+        with self._lock:
+            self.progress[file_name] = {
+                "pages_done": pages_done, "total_pages": total_pages, "chunks_done": chunks_done
+            }
+
+    def _set_status(self, status, result=None, error=None):
+        """Move to a new state; the result becomes visible together with the 'done' status"""
+        with self._lock:
+            self.status = status
+            self.result = result
+            self.error = error
+            if status in FINISHED_STATES:
+                self.finished_at = time.time()
+
+    def snapshot(self):
+        """
+        Consistent view of the job for display
+        Returns:
+            Dictionary with status, error, overall fraction done, chunk count and per-file progress
+        """
+        with self._lock:
+            files = {name: dict(entry) for name, entry in self.progress.items()}
+            status, error = self.status, self.error
+        # Each new file weighs the same; a file whose page count is not known yet counts as not started
+        fractions = [
+            min(entry["pages_done"] / entry["total_pages"], 1.0) if entry["total_pages"] else 0.0
+            for entry in files.values()
+        ]
+        fraction = sum(fractions) / len(fractions) if fractions else 0.0
+        return {
+            "id": self.id,
+            "status": status,
+            "error": error,
+            "fraction": 1.0 if status == DONE else fraction,
+            "chunks_done": sum(entry["chunks_done"] for entry in files.values()),
+            "files": files,
+            "cancelling": self.cancel_event.is_set() and status not in FINISHED_STATES,
+        }
+
+
+# Runs ingestion on a shared thread pool and hands the finished index back exactly once
+class IngestionWorker:
+    _executor = None  # Thread pool shared by every session in this process
+    _executor_lock = threading.Lock()
+
+    def __init__(self, document_processor, max_workers=INGEST_WORKERS, corpus_registry=None,
+                 session_key=None):
+        """
+        Initialize the worker
+        Args:
+            document_processor: DocumentProcessor used to build indexes
+            max_workers: Size of the shared thread pool (only used when it is first created)
+            corpus_registry: Optional CorpusRegistry; jobs then sync the session's documents in the
+                shared index instead of building a private copy
+            session_key: Session identifier used with the corpus registry
+        """
+        self.document_processor = document_processor
+        self.max_workers = max_workers
+        self.corpus_registry = corpus_registry
+        self.session_key = session_key
+        self.job = None  # Latest job; kept after it finishes until its result is published
+        self._run_lock = threading.Lock()
+
+    @classmethod
+    def _get_executor(cls, max_workers):
+        """Create the process-wide thread pool on first use"""
+        with cls._executor_lock:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(
+                    max_workers=max_workers, thread_name_prefix="ingest"
+                )
+            return cls._executor
+
+    def submit(self, uploaded_files, vectorstore=None, indexed_files=None):
+        """
+        Start indexing uploads in the background, cancelling any job still running
+        Args:
+            uploaded_files: Uploaded PDF files to index
+            vectorstore: Current (published) vector store; it is copied, never modified
+            indexed_files: Dictionary of file hash -> {"name", "chunk_ids"} for the current store
+        Returns:
+            The new IngestionJob
+        """
+        if self.job is not None and not self.job.finished:
+            self.job.cancel()
+        indexed_files = dict(indexed_files or {})
+        hashes = [DocumentProcessor.compute_file_hash(f) for f in uploaded_files]
+        new_names = [f.name for h, f in zip(hashes, uploaded_files) if h not in indexed_files]
+        job = IngestionJob(hashes, new_names)
+        self.job = job
+        self._get_executor(self.max_workers).submit(
+            self._run_job, job, list(uploaded_files), vectorstore, indexed_files
+        )
+        return job
+
+    def _run_job(self, job, uploaded_files, vectorstore, indexed_files):
+        """Build the new index without touching the published one, then mark the job done"""
+        # A superseded job is still winding down when its replacement starts; run them in order
+        with self._run_lock:
+            if job.cancel_event.is_set():
+                job._set_status(CANCELLED)
+                return
+            job._set_status(RUNNING)
+            staging = None
+            synced = False  # The registry already points the session at the new file set
+            try:
+                with Tracer.trace("ingest_job", files=len(uploaded_files)):
+                    if self.corpus_registry is not None:
+                        # Other sessions' filters never include this session's new files, so the
+                        # shared index is updated in place; the new file set goes live on publish
+                        result = self.corpus_registry.sync_session(
+                            self.session_key, uploaded_files,
+                            progress_callback=job.on_progress, cancel_event=job.cancel_event
+                        )
+                        synced = True
+                    else:
+                        # Update a private copy so the published index keeps answering questions
+                        if vectorstore is None:
+                            staging = self.document_processor.create_vectorstore()
+                        else:
+                            staging = self.document_processor.copy_index(vectorstore)
+                        result = self.document_processor.update_index(
+                            uploaded_files, staging, indexed_files,
+                            progress_callback=job.on_progress, cancel_event=job.cancel_event
+                        )
+                # A job superseded right at the end must not publish over its replacement
+                if job.cancel_event.is_set():
+                    raise IngestionCancelled()
+                job._set_status(DONE, result=result)
+            except IngestionCancelled:
+                if staging is not None:
+                    self.document_processor.drop_index(staging)
+                if synced:
+                    # Cancelled after the sync finished: give the published file set its references back
+                    self.corpus_registry.restore_session(self.session_key, set(indexed_files))
+                job._set_status(CANCELLED)
+            except Exception as e:
+                if staging is not None:
+                    self.document_processor.drop_index(staging)
+                job._set_status(FAILED, error=str(e))
+
+    def take_result(self):
+        """
+        Hand over the finished index of the latest job (only once)
+        Returns:
+            Tuple of (vectorstore, retriever, indexed_files, changes), or None if no job has finished
+        """
+        job = self.job
+        if job is None or job.status != DONE:
+            return None
+        self.job = None
+        return job.result
+
+    def cancel(self):
+        """Cancel the running job, if any"""
+        if self.job is not None and not self.job.finished:
+            self.job.cancel()
@@ -0,0 +1,323 @@
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+import threading
+import uuid
+import numpy as np
+from config.settings import VECTOR_STORE_DTYPE
+
+# Rows scored per block, so float16/int8 stores are widened to float32 a slice at a time
+_SCORE_BLOCK_ROWS = 1024
+DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+
+
+def quantize(vectors, dtype):
+    """
+    Convert unit-length float32 rows to a storage dtype
+    Args:
+        vectors: (rows, dim) float32 array
+        dtype: "float32", "float16" or "int8"
+    Returns:
+        Tuple of (stored rows, per-row float32 dequantization scales)
+    """
+    if dtype == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        quantized = np.rint(vectors / scales[:, None]).astype(np.int8)
+        return quantized, scales.astype(np.float32)
+    return vectors.astype(DTYPES[dtype]), np.ones(len(vectors), dtype=np.float32)
+
+
+def matches_filter(metadata, filter):
+    """
+    Check metadata against a Chroma-style filter
+    Args:
+        metadata: Chunk metadata
+        filter: Dictionary of key -> value (equality) or key -> {"$in": [values]}
+    Returns:
+        True if every condition holds
+    """
+    for key, condition in filter.items():
+        value = metadata.get(key)
+        if isinstance(condition, dict):
+            if "$in" in condition and value not in condition["$in"]:
+                return False
+        elif value != condition:
+            return False
+    return True
+
+
+# Lightweight in-process vector store: contiguous NumPy arrays, optional quantization, batched top-k
+class NumpyVectorStore(VectorStore):
+    def __init__(self, embedding, dtype=VECTOR_STORE_DTYPE, initial_capacity=256):
+        """
+        Initialize an empty store
+        Args:
+            embedding: Embedding model used for texts and queries
+            dtype: Storage precision: "float32", "float16" or "int8" (per-row scaled); the
+                smaller types save memory but are widened to float32 block by block on every query
+            initial_capacity: Rows allocated up front (grows by doubling)
+        """
+        if dtype not in DTYPES:
+            raise ValueError(f"Unsupported vector store dtype: {dtype}")
+        self.embedding = embedding
+        self.dtype = dtype
+        self._vectors = None  # (capacity, dim) array of unit-length vectors, allocated on first add
+        self._scales = np.zeros(0, dtype=np.float32)  # Per-row dequantization factors (int8)
+        self._capacity = initial_capacity
+        self._size = 0
+        self._ids = []  # row -> chunk ID
+        self._texts = []  # row -> chunk text
+        self._metadatas = []  # row -> metadata
+        self._rows = {}  # chunk ID -> row
+        self._masks = {}  # filter key -> row mask, cleared whenever rows change
+        self._lock = threading.RLock()
+
+    @property
+    def embeddings(self):
+        return self.embedding
+
+    def __len__(self):
+        return self._size
+
+    def _ensure_capacity(self, dim, needed):
+        """Allocate or grow the contiguous arrays to hold `needed` rows"""
+        if self._vectors is None:
+            self._capacity = max(self._capacity, needed)
+            self._vectors = np.zeros((self._capacity, dim), dtype=DTYPES[self.dtype])
+            self._scales = np.zeros(self._capacity, dtype=np.float32)
+            return
+        if needed <= self._capacity:
+            return
+        capacity = self._capacity
+        while capacity < needed:
+            capacity *= 2
+        vectors = np.zeros((capacity, dim), dtype=DTYPES[self.dtype])
+        vectors[:self._size] = self._vectors[:self._size]
+        scales = np.zeros(capacity, dtype=np.float32)
+        scales[:self._size] = self._scales[:self._size]
+        self._vectors, self._scales, self._capacity = vectors, scales, capacity
+
+    def add_embeddings(self, texts, embeddings, metadatas=None, ids=None):
+        """
+        Add precomputed embeddings
+        Args:
+            texts: Chunk texts
+            embeddings: Embedding vectors, one per text
+            metadatas: Optional metadata dictionaries
+            ids: Optional chunk IDs (existing IDs are replaced)
+        Returns:
+            List of chunk IDs
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+        ids = list(ids) if ids else [uuid.uuid4().hex for _ in texts]
+        metadatas = list(metadatas) if metadatas else [{} for _ in texts]
+        # A copy: normalizing in place must not modify the caller's array
+        vectors = np.array(embeddings, dtype=np.float32)
+        # Normalize once at insert time so search is a plain dot product
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12
+        quantized, scales = quantize(vectors, self.dtype)
+
+        with self._lock:
+            self.delete([chunk_id for chunk_id in ids if chunk_id in self._rows])
+            self._ensure_capacity(vectors.shape[1], self._size + len(texts))
+            start, end = self._size, self._size + len(texts)
+            self._vectors[start:end] = quantized
+            self._scales[start:end] = scales
+            for offset, chunk_id in enumerate(ids):
+                self._rows[chunk_id] = start + offset
+            self._ids.extend(ids)
+            self._texts.extend(texts)
+            self._metadatas.extend(metadatas)
+            self._size = end
+            self._masks.clear()
+        return ids
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        """
+        Embed and add texts
+        Args:
+            texts: Chunk texts
+            metadatas: Optional metadata dictionaries
+            ids: Optional chunk IDs
+        Returns:
+            List of chunk IDs
+        """
+        texts = list(texts)
+        return self.add_embeddings(texts, self.embedding.embed_documents(texts), metadatas, ids)
+
+    def delete(self, ids=None, **kwargs):
+        """
+        Delete chunks by ID (the last row is moved into each freed slot to stay contiguous)
+        Args:
+            ids: Chunk IDs to delete
+        Returns:
+            True
+        """
+        with self._lock:
+            for chunk_id in ids or []:
+                row = self._rows.pop(chunk_id, None)
+                if row is None:
+                    continue
+                last = self._size - 1
+                if row != last:
+                    self._vectors[row] = self._vectors[last]
+                    self._scales[row] = self._scales[last]
+                    self._ids[row] = self._ids[last]
+                    self._texts[row] = self._texts[last]
+                    self._metadatas[row] = self._metadatas[last]
+                    self._rows[self._ids[row]] = row
+                self._ids.pop()
+                self._texts.pop()
+                self._metadatas.pop()
+                self._size = last
+                self._masks.clear()
+        return True
+
+    def _filter_mask(self, filter):
+        """Boolean row mask for a metadata filter (None when unfiltered), cached until rows change"""
+        if not filter:
+            return None
+        # Sessions sharing one store repeat the same filter on every query
+        key = repr(sorted((k, sorted(v["$in"]) if isinstance(v, dict) and "$in" in v else v)
+                          for k, v in filter.items()))
+        mask = self._masks.get(key)
+        if mask is None:
+            mask = np.fromiter(
+                (matches_filter(metadata, filter) for metadata in self._metadatas),
+                dtype=bool, count=self._size
+            )
+            self._masks[key] = mask
+        return mask
+
+    def search_by_vectors(self, query_vectors, k=4, filter=None):
+        """
+        Batched top-k search
+        Args:
+            query_vectors: (n_queries, dim) array-like of query embeddings
+            k: Results per query
+            filter: Optional metadata filter (equality or {"$in": [...]} per key)
+        Returns:
+            List (per query) of (Document, cosine similarity) tuples, best first
+        """
+        queries = np.atleast_2d(np.asarray(query_vectors, dtype=np.float32))
+        queries = queries / (np.linalg.norm(queries, axis=1, keepdims=True) + 1e-12)
+        with self._lock:
+            if not self._size:
+                return [[] for _ in queries]
+            # (n_queries, size) similarity matrix, scored block by block
+            scores = np.empty((len(queries), self._size), dtype=np.float32)
+            for start in range(0, self._size, _SCORE_BLOCK_ROWS):
+                end = min(start + _SCORE_BLOCK_ROWS, self._size)
+                # A no-op for float32; float16/int8 blocks are copied, which dominates their query time
+                block = self._vectors[start:end].astype(np.float32, copy=False)
+                scores[:, start:end] = (queries @ block.T) * self._scales[start:end]
+            mask = self._filter_mask(filter)
+            if mask is not None:
+                scores[:, ~mask] = -np.inf
+            available = self._size if mask is None else int(mask.sum())
+            k = min(k, available)
+            if k <= 0:
+                return [[] for _ in queries]
+
+            # argpartition finds the top k in linear time; only those k are sorted
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            results = []
+            for query_index, rows in enumerate(top):
+                rows = rows[np.argsort(-scores[query_index, rows])]
+                results.append([
+                    (Document(id=self._ids[row], page_content=self._texts[row],
+                              metadata=self._metadatas[row]),
+                     float(scores[query_index, row]))
+                    for row in rows
+                ])
+            return results
+
+    def similarity_search_with_score(self, query, k=4, filter=None, **kwargs):
+        """Search with a text query, returning (Document, cosine similarity) tuples"""
+        return self.search_by_vectors([self.embedding.embed_query(query)], k, filter)[0]
+
+    def similarity_search_by_vector(self, embedding, k=4, filter=None, **kwargs):
+        """Search with a query embedding"""
+        return [document for document, _ in self.search_by_vectors([embedding], k, filter)[0]]
+
+    def similarity_search(self, query, k=4, filter=None, **kwargs):
+        """Search with a text query"""
+        return [document for document, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def _select_relevance_score_fn(self):
+        # Stored vectors are unit length, so cosine similarity maps directly to [0, 1]
+        return lambda score: (score + 1.0) / 2.0
+
+    def get(self, ids=None, include=None, **kwargs):
+        """
+        Fetch stored chunks (same shape as Chroma's get, for code that counts or inspects chunks)
+        Args:
+            ids: Chunk IDs to fetch (all by default)
+            include: Ignored; IDs, texts and metadatas are always returned
+        Returns:
+            Dictionary with 'ids', 'documents' and 'metadatas' lists
+        """
+        with self._lock:
+            rows = range(self._size) if ids is None else [self._rows[i] for i in ids if i in self._rows]
+            return {
+                "ids": [self._ids[row] for row in rows],
+                "documents": [self._texts[row] for row in rows],
+                "metadatas": [self._metadatas[row] for row in rows],
+            }
+
+    def delete_collection(self):
+        """Drop every chunk and free the arrays (same name as Chroma's method)"""
+        with self._lock:
+            self._vectors = None
+            self._scales = np.zeros(0, dtype=np.float32)
+            self._capacity = 0
+            self._size = 0
+            self._ids, self._texts, self._metadatas, self._rows = [], [], [], {}
+            self._masks.clear()
+
+    def copy(self):
+        """
+        Copy the store (arrays and row lists are copied, texts and metadata are shared)
+        Returns:
+            Independent NumpyVectorStore with the same chunks
+        """
+        with self._lock:
+            store = NumpyVectorStore(self.embedding, self.dtype, max(self._capacity, 1))
+            if self._vectors is not None:
+                store._vectors = self._vectors.copy()
+                store._scales = self._scales.copy()
+            store._size = self._size
+            store._ids = list(self._ids)
+            store._texts = list(self._texts)
+            store._metadatas = list(self._metadatas)
+            store._rows = dict(self._rows)
+            return store
+
+    def memory_bytes(self):
+        """
+        Approximate memory held by the vectors (allocated capacity, not counting texts)
+        Returns:
+            Size in bytes
+        """
+        with self._lock:
+            vectors = self._vectors.nbytes if self._vectors is not None else 0
+            return vectors + self._scales.nbytes
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, ids=None, **kwargs):
+        """
+        Build a store from texts
+        Args:
+            texts: Chunk texts
+            embedding: Embedding model
+            metadatas: Optional metadata dictionaries
+            ids: Optional chunk IDs
+            kwargs: Passed to the constructor (e.g. dtype)
+        Returns:
+            NumpyVectorStore
+        """
+        store = cls(embedding, **kwargs)
+        store.add_texts(texts, metadatas, ids)
+        return store
@@ -0,0 +1,97 @@
+from langchain_community.document_loaders.parsers import PyPDFParser
+from langchain_core.documents.base import Blob
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+import multiprocessing
+import threading
+from config.settings import PDF_PARSE_WORKERS
+
+
+def iter_pdf_pages(name, data):
+    """
+    Lazily parse PDF bytes page by page without touching the disk
+    Args:
+        name: File name, stored as the 'source' metadata of every page
+        data: Raw PDF bytes
+    Returns:
+        Iterator of Documents, one per page, with the same metadata PyPDFLoader produces
+    """
+    blob = Blob.from_data(data, path=name, mime_type="application/pdf")
+    return PyPDFParser().lazy_parse(blob)
+
+
+def parse_pdf(name, data):
+    """
+    Parse PDF bytes into a list of page Documents (module-level so worker processes can run it)
+    Args:
+        name: File name, stored as the 'source' metadata of every page
+        data: Raw PDF bytes
+    Returns:
+        List of Documents in page order
+    """
+    return list(iter_pdf_pages(name, data))
+
+
+# Parses PDFs from in-memory buffers, fanning out across a shared process pool
+class PDFParser:
+    _executor = None  # Process pool of PDF_PARSE_WORKERS processes shared by every parser in this process
+    _lock = threading.Lock()
+
+    def __init__(self, max_workers=PDF_PARSE_WORKERS):
+        """
+        Initialize the parser
+        Args:
+            max_workers: PDFs this parser parses at once (1 or less parses in the calling process);
+                capped by the size of the shared pool, PDF_PARSE_WORKERS
+        """
+        self.max_workers = max_workers
+
+    @classmethod
+    def _get_executor(cls):
+        """Create the process-wide pool on first use; it is never resized or shut down while serving"""
+        with cls._lock:
+            if cls._executor is None:
+                # Spawned workers do not inherit the model/server threads of this process
+                cls._executor = ProcessPoolExecutor(
+                    max_workers=PDF_PARSE_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            return cls._executor
+
+    def parse(self, name, data):
+        """
+        Parse a single PDF in the calling process
+        Args:
+            name: File name
+            data: Raw PDF bytes
+        Returns:
+            List of page Documents
+        """
+        return parse_pdf(name, data)
+
+    def parse_many(self, files):
+        """
+        Parse several PDFs in parallel
+        Args:
+            files: List of (name, bytes) tuples
+        Returns:
+            List with one list of page Documents per input file, in input order
+        """
+        if not files:
+            return []
+
+        workers = min(self.max_workers, PDF_PARSE_WORKERS, len(files))
+        if workers <= 1:
+            return [parse_pdf(name, data) for name, data in files]
+
+        executor = self._get_executor()
+        results = []
+        pending = deque()
+        # At most `workers` files in flight, so one call cannot take over the pool; results are
+        # collected in submission order, so page and file order are preserved
+        for name, data in files:
+            if len(pending) == workers:
+                results.append(pending.popleft().result())
+            pending.append(executor.submit(parse_pdf, name, data))
+        results.extend(future.result() for future in pending)
+        return results
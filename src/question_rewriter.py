@@ -0,0 +1,185 @@
+from langchain_core.output_parsers import StrOutputParser
+from collections import OrderedDict
+import hashlib
+import re
+import threading
+from config.settings import REWRITE_CACHE_SIZE, REWRITE_MIN_WORDS
+from src.tracing import Tracer
+
+# Words that usually point back into the conversation and make a question depend on history
+REFERRING_WORDS = {
+    "it", "its", "this", "that", "these", "those", "they", "them", "their", "theirs",
+    "he", "him", "his", "she", "her", "hers", "there", "above", "previous", "earlier",
+    "former", "latter", "same", "also", "again", "else", "another",
+}
+
+_WORD_PATTERN = re.compile(r"[a-z0-9']+")
+
+
+# Turns follow-up questions into standalone ones, calling the LLM only when it is needed
+class QuestionRewriter:
+    # Memo and counters are process-wide so they survive Streamlit reruns and are shared by sessions
+    _cache = OrderedDict()  # (history digest, question) -> standalone question
+    _lock = threading.Lock()
+    stats = {"requests": 0, "skipped": 0, "cache_hits": 0, "llm_calls": 0}
+
+    def __init__(self, llm, prompt, cache_size=REWRITE_CACHE_SIZE, min_words=REWRITE_MIN_WORDS):
+        """
+        Initialize the rewriter
+        Args:
+            llm: Chat model used to reformulate questions
+            prompt: Prompt with a chat_history placeholder and an {input} variable
+            cache_size: Maximum number of memoized rewrites
+            min_words: Questions shorter than this are always treated as follow-ups
+        """
+        self.rewrite_chain = (prompt | llm | StrOutputParser()).with_config(run_name="rewrite_question")
+        self.cache_size = cache_size
+        self.min_words = min_words
+
+    @staticmethod
+    def history_digest(chat_history):
+        """
+        Hash a chat history so it can be used in a cache key
+        Args:
+            chat_history: List of chat messages
+        Returns:
+            SHA-256 hex digest of the message types and contents
+        """
+        digest = hashlib.sha256()
+        for message in chat_history:
+            digest.update(f"{message.type}\x00{message.content}\x1e".encode("utf-8"))
+        return digest.hexdigest()
+
+    def needs_rewrite(self, question, chat_history):
+        """
+        Cheap heuristic deciding whether a question depends on the chat history
+        Args:
+            question: Latest user question
+            chat_history: List of previous chat messages
+        Returns:
+            True if the question should be reformulated by the LLM
+        """
+        if not chat_history:
+            return False
+        words = _WORD_PATTERN.findall(question.lower())
+        # Very short questions ("why?", "and the second one?") are almost always follow-ups
+        if len(words) < self.min_words:
+            return True
+        return any(word in REFERRING_WORDS for word in words)
+
+    def is_resolved(self, question, chat_history):
+        """
+        Check whether the standalone question is known without an LLM call
+        Args:
+            question: Latest user question
+            chat_history: List of previous chat messages
+        Returns:
+            True if no rewrite is needed or the rewrite is memoized
+        """
+        if not self.needs_rewrite(question, chat_history):
+            return True
+        key = (self.history_digest(chat_history), question)
+        with self._lock:
+            return key in self._cache
+
+    def _check_cache(self, question, chat_history):
+        """
+        Resolve a question without the LLM if possible
+        Args:
+            question: Latest user question
+            chat_history: List of previous chat messages
+        Returns:
+            Tuple of (standalone question or None if the LLM is needed, cache key)
+        """
+        with self._lock:
+            self.stats["requests"] += 1
+
+        if not self.needs_rewrite(question, chat_history):
+            with self._lock:
+                self.stats["skipped"] += 1
+            Tracer.count("rewrites_skipped")
+            return question, None
+
+        key = (self.history_digest(chat_history), question)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.stats["cache_hits"] += 1
+                Tracer.count("rewrite_cache_hits")
+                return self._cache[key], key
+        return None, key
+
+    def _remember(self, key, standalone):
+        """Memoize an LLM rewrite, evicting the least recently used one if the memo is full"""
+        with self._lock:
+            self.stats["llm_calls"] += 1
+            self._cache[key] = standalone
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def rewrite(self, question, chat_history):
+        """
+        Get the standalone form of a question
+        Args:
+            question: Latest user question
+            chat_history: List of previous chat messages
+        Returns:
+            Tuple of (standalone question, number of LLM calls made)
+        """
+        standalone, key = self._check_cache(question, chat_history)
+        if standalone is not None:
+            return standalone, 0
+
+        standalone = self.rewrite_chain.invoke(
+            {"input": question, "chat_history": chat_history}
+        ).strip() or question
+        self._remember(key, standalone)
+        return standalone, 1
+
+    async def arewrite(self, question, chat_history):
+        """
+        Async version of rewrite()
+        Args:
+            question: Latest user question
+            chat_history: List of previous chat messages
+        Returns:
+            Tuple of (standalone question, number of LLM calls made)
+        """
+        standalone, key = self._check_cache(question, chat_history)
+        if standalone is not None:
+            return standalone, 0
+
+        standalone = (await self.rewrite_chain.ainvoke(
+            {"input": question, "chat_history": chat_history}
+        )).strip() or question
+        self._remember(key, standalone)
+        return standalone, 1
+
+    def rewrite_inputs(self, inputs):
+        """
+        Chain step that adds the standalone question to the chain inputs
+        Args:
+            inputs: Dict with 'input' and 'chat_history'
+        Returns:
+            Inputs plus 'standalone_question' and 'rewrite_llm_calls'
+        """
+        standalone, llm_calls = self.rewrite(inputs["input"], inputs.get("chat_history") or [])
+        return {**inputs, "standalone_question": standalone, "rewrite_llm_calls": llm_calls}
+
+    async def arewrite_inputs(self, inputs):
+        """Async version of rewrite_inputs()"""
+        standalone, llm_calls = await self.arewrite(inputs["input"], inputs.get("chat_history") or [])
+        return {**inputs, "standalone_question": standalone, "rewrite_llm_calls": llm_calls}
+
+    @classmethod
+    def get_stats(cls):
+        """
+        Get the process-wide rewrite counters
+        Returns:
+            Dictionary with requests, skipped rewrites, cache hits, LLM calls and memo size
+        """
+        with cls._lock:
+            return {**cls.stats, "cached_rewrites": len(cls._cache)}
+
+
+Tracer.register_stats("question_rewriter", QuestionRewriter.get_stats)
@@ -1,29 +1,46 @@
-from langchain.chains import create_history_aware_retriever, create_retrieval_chain
 from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_groq import ChatGroq
+from langchain_core.runnables import RunnableBranch, RunnableLambda, RunnablePassthrough
 from langchain_core.runnables.history import RunnableWithMessageHistory
-from config.settings import CONTEXTUALIZE_Q_SYSTEM_PROMPT, QA_SYSTEM_PROMPT, LLM_MODEL
+from collections import OrderedDict
+from operator import itemgetter
+import hashlib
+import threading
+from config.settings import (
+    CONTEXTUALIZE_Q_SYSTEM_PROMPT, QA_SYSTEM_PROMPT, LLM_MODEL, LLM_CLIENT_CACHE_SIZE, EMBEDDING_MODEL,
+    ANSWER_CACHE_ENABLED, HISTORY_MODE, CONTEXT_PACKING_ENABLED, SPECULATIVE_RETRIEVAL
+)
+from src.question_rewriter import QuestionRewriter
+from src.answer_cache import SemanticAnswerCache
+from src.history_compressor import HistoryCompressor
+from src.context_packer import ContextPacker
+from src.speculative_retrieval import SpeculativeRetrieval
+from src.embedding_registry import EmbeddingRegistry
+from src.tracing import Tracer, TracingCallbackHandler
 
 # Handles the RAG pipeline, including LLM setup, retrieval, and conversational logic
 class RAGChain:
-    def __init__(self, api_key):
+    # Groq clients are shared per (API key digest, model) so reruns and sessions reuse one client;
+    # at most LLM_CLIENT_CACHE_SIZE are kept, least recently used first
+    _llm_clients = OrderedDict()
+    _llm_lock = threading.Lock()
+    
+    def __init__(self, api_key, embeddings=None, llm=None, speculative_retrieval=SPECULATIVE_RETRIEVAL):
         """
         Initialize RAG chain with Groq LLM
         Args:
             api_key: Groq API key for authenticating LLM requests
+            embeddings: Embedding model for answer cache lookups (defaults to the shared model)
+            llm: Chat model to use instead of creating a Groq client (e.g. a shared or local model)
+            speculative_retrieval: Retrieve for the raw question while a follow-up is being rewritten
         """
         # Set up the Groq LLM with the specified model
-        self.llm = ChatGroq(groq_api_key=api_key, model_name=LLM_MODEL)
+        self.llm = llm or self.get_llm(api_key)
         self.rag_chain = None  # Will hold the retrieval chain
         self.conversational_rag_chain = None  # Will hold the history-aware chain
-    
-    def create_rag_chain(self, retriever):
-        """
-        Create the RAG chain with a history-aware retriever and QA chain
-        Args:
-            retriever: Document retriever for semantic search
-        """
+        self._chain_retriever = None  # Retriever the current chain graph was built for
+        self._history_source = None  # (history getter, retrieval chain) the conversational chain wraps
+        
         # Prompt for reformulating user questions with chat history
         contextualize_q_prompt = ChatPromptTemplate.from_messages([
             ("system", CONTEXTUALIZE_Q_SYSTEM_PROMPT),
@@ -31,12 +48,8 @@ class RAGChain:
             ("human", "{input}"),
         ])
         
-        # Create a retriever that is aware of chat history
-        history_aware_retriever = create_history_aware_retriever(
-            self.llm, 
-            retriever, 
-            contextualize_q_prompt
-        )
+        # Only follow-up questions are sent to the LLM for rewriting, and rewrites are memoized
+        self.question_rewriter = QuestionRewriter(self.llm, contextualize_q_prompt)
         
         # Prompt for the main QA task
         qa_prompt = ChatPromptTemplate.from_messages([
@@ -45,13 +58,143 @@ class RAGChain:
             ("human", "{input}"),
         ])
         
-        # Chain for combining retrieved documents and generating answers
-        question_answer_chain = create_stuff_documents_chain(self.llm, qa_prompt)
+        # Chain for combining retrieved documents and generating answers (independent of the retriever)
+        self.question_answer_chain = create_stuff_documents_chain(
+            self.llm, qa_prompt
+        ).with_config(run_name="generate_answer")
+        
+        # Strips chunk overlap and fits retrieved text into a token budget before the QA prompt
+        self.context_packer = (
+            ContextPacker(get_embeddings=self._get_embeddings) if CONTEXT_PACKING_ENABLED else None
+        )
+        
+        # Keeps injected history within a token budget when HISTORY_MODE is "summary"
+        self.history_compressor = HistoryCompressor(self.llm) if HISTORY_MODE == "summary" else None
+        self.embeddings = embeddings  # Loaded lazily from the registry if not provided
+        self.answer_cache = SemanticAnswerCache.get_shared() if ANSWER_CACHE_ENABLED else None
+        self.corpus_fingerprint = None  # Identifies the indexed document set for the answer cache
+        self.speculative_retrieval = speculative_retrieval
+    
+    def create_rag_chain(self, retriever, corpus_fingerprint=None):
+        """
+        Create the RAG chain with a history-aware retriever and QA chain
+        Args:
+            retriever: Document retriever for semantic search
+            corpus_fingerprint: Fingerprint of the indexed documents (enables the answer cache)
+        """
+        # Nothing changed since the last build (e.g. a Streamlit rerun): keep the existing graph
+        if (self.rag_chain is not None and retriever is self._chain_retriever
+                and corpus_fingerprint == self.corpus_fingerprint):
+            Tracer.count("chain_reuses")
+            return
+        Tracer.count("chain_builds")
+        self._chain_retriever = retriever
+        
+        if self.speculative_retrieval:
+            # Retrieval for the raw question runs during the rewrite LLM call, and is reused
+            # (or fused with a second retrieval) once the standalone question is known
+            speculation = SpeculativeRetrieval(retriever, self.question_rewriter)
+            rewrite = RunnableLambda(speculation.rewrite_inputs, afunc=speculation.arewrite_inputs)
+            retrieve = RunnableLambda(speculation.retrieve_inputs, afunc=speculation.aretrieve_inputs)
+        else:
+            rewrite = RunnableLambda(
+                self.question_rewriter.rewrite_inputs,
+                afunc=self.question_rewriter.arewrite_inputs
+            )
+            retrieve = RunnablePassthrough.assign(context=itemgetter("standalone_question") | retriever)
         
-        # The main retrieval-augmented generation chain
-        self.rag_chain = create_retrieval_chain(
-            history_aware_retriever, 
-            question_answer_chain
+        # Retrieve, [pack the context,] answer, then count the LLM calls actually made
+        if self.context_packer is not None:
+            retrieve = retrieve | RunnableLambda(self.context_packer.pack_inputs)
+        generate_answer = (
+            retrieve
+            | RunnablePassthrough.assign(answer=self.question_answer_chain)
+            | RunnablePassthrough.assign(
+                llm_calls=lambda x: x["rewrite_llm_calls"] + x.get("summary_llm_calls", 0) + 1,
+                answer_cache_hit=lambda x: False
+            )
+        )
+        
+        self.corpus_fingerprint = corpus_fingerprint
+        if self.answer_cache is not None and corpus_fingerprint:
+            # Repeated questions over the same corpus are answered from the cache
+            lookup_answer = RunnableLambda(self._lookup_answer).with_config(run_name="answer_cache_lookup")
+            generate_answer = lookup_answer | RunnableBranch(
+                (lambda x: x["cached_answer"] is not None, RunnableLambda(self._use_cached_answer)),
+                generate_answer
+            )
+        
+        # The main retrieval-augmented generation chain:
+        # [compress history] -> rewrite (if needed) -> [answer cache] -> retrieve -> [pack] -> answer
+        rag_chain = rewrite | generate_answer
+        if self.history_compressor is not None:
+            rag_chain = RunnableLambda(
+                self.history_compressor.compress_inputs, afunc=self.history_compressor.acompress_inputs
+            ) | rag_chain
+        self.rag_chain = rag_chain.with_config(run_name="retrieval_chain")
+    
+    @classmethod
+    def get_llm(cls, api_key):
+        """
+        Get the shared Groq client for an API key, creating it on first use
+        Args:
+            api_key: Groq API key
+        Returns:
+            ChatGroq instance
+        """
+        # Keyed by a digest, though each cached client still holds its key; the cache is bounded so
+        # clients (and keys) of users who have gone away do not pile up
+        key = (hashlib.sha256((api_key or "").encode("utf-8")).hexdigest(), LLM_MODEL)
+        with cls._llm_lock:
+            if key in cls._llm_clients:
+                cls._llm_clients.move_to_end(key)
+                return cls._llm_clients[key]
+            # Imported on first use; the Groq SDK is not needed to import this module
+            from langchain_groq import ChatGroq
+            client = cls._llm_clients[key] = ChatGroq(groq_api_key=api_key, model_name=LLM_MODEL)
+            while len(cls._llm_clients) > LLM_CLIENT_CACHE_SIZE:
+                # Sessions still using an evicted client keep it; it is just no longer shared
+                cls._llm_clients.popitem(last=False)
+            return client
+    
+    def _get_embeddings(self):
+        """Get the embedding model used for answer cache lookups"""
+        if self.embeddings is None:
+            self.embeddings = EmbeddingRegistry.get(EMBEDDING_MODEL)
+        return self.embeddings
+    
+    def _lookup_answer(self, inputs):
+        """Chain step: embed the standalone question and look it up in the answer cache"""
+        question_vector = self._get_embeddings().embed_query(inputs["standalone_question"])
+        cached_answer = self.answer_cache.lookup(self.corpus_fingerprint, question_vector)
+        Tracer.count("answer_cache_hits" if cached_answer is not None else "answer_cache_misses")
+        return {**inputs, "question_vector": question_vector, "cached_answer": cached_answer}
+    
+    def _use_cached_answer(self, inputs):
+        """Chain step: answer from the cache without retrieval or generation"""
+        cached_answer = inputs["cached_answer"]
+        # Speculative results are not needed; keep them out of the response
+        inputs = {key: value for key, value in inputs.items() if key != "speculative_context"}
+        return {
+            **inputs,
+            "context": cached_answer["context"],
+            "answer": cached_answer["answer"],
+            "llm_calls": inputs["rewrite_llm_calls"] + inputs.get("summary_llm_calls", 0),
+            "answer_cache_hit": True,
+        }
+    
+    def _store_answer(self, response):
+        """Cache a freshly generated answer for later semantically equivalent questions"""
+        if self.answer_cache is None or response.get("answer_cache_hit"):
+            return
+        if "question_vector" not in response:
+            return
+        self.answer_cache.store(
+            self.corpus_fingerprint,
+            response["standalone_question"],
+            response["question_vector"],
+            response["answer"],
+            response["context"]
         )
     
     def create_conversational_chain(self, get_session_history_func):
@@ -60,6 +203,13 @@ class RAGChain:
         Args:
             get_session_history_func: Function to get session history for a session ID
         """
+        # Already wrapping this chain with this history getter: nothing to rebuild
+        if self._history_source is not None:
+            history_func, wrapped_chain = self._history_source
+            if wrapped_chain is self.rag_chain and history_func == get_session_history_func:
+                return
+        self._history_source = (get_session_history_func, self.rag_chain)
+        
         # Wrap the RAG chain with message history for context-aware conversations
         self.conversational_rag_chain = RunnableWithMessageHistory(
             self.rag_chain,
@@ -69,6 +219,14 @@ class RAGChain:
             output_messages_key="answer"
         )
     
+    @staticmethod
+    def _run_config(session_id, trace):
+        """Chain config for a session, reporting chain, retriever and LLM runs to the trace"""
+        config = {"configurable": {"session_id": session_id}}
+        if trace is not None:
+            config["callbacks"] = [TracingCallbackHandler(trace)]
+        return config
+    
     def get_response(self, user_input, session_id):
         """
         Get a response from the conversational RAG chain
@@ -76,15 +234,72 @@ class RAGChain:
             user_input: User's question
             session_id: Session identifier for chat history
         Returns:
-            Response from the chain (dict with 'answer' key)
+            Response from the chain (dict with 'answer', 'context', 'standalone_question',
+            'llm_calls' and 'answer_cache_hit' keys, plus 'history_tokens_saved' in summary mode,
+            a 'context_packing' report of prompt context size before/after packing and, with
+            speculative retrieval, 'speculative_retrieval' ("reused", "merged" or None))
         """
         if not self.conversational_rag_chain:
             raise ValueError("Conversational RAG chain not initialized")
         
         # Invoke the chain with user input and session context
-        response = self.conversational_rag_chain.invoke(
-            {"input": user_input},
-            config={"configurable": {"session_id": session_id}}
-        )
+        with Tracer.trace("answer", session_id=session_id) as trace:
+            response = self.conversational_rag_chain.invoke(
+                {"input": user_input},
+                config=self._run_config(session_id, trace)
+            )
+            self._store_answer(response)
+        
+        return response
+    
+    async def aget_response(self, user_input, session_id):
+        """
+        Async version of get_response(), for concurrent serving
+        Args:
+            user_input: User's question
+            session_id: Session identifier for chat history
+        Returns:
+            Response from the chain (same keys as get_response)
+        """
+        if not self.conversational_rag_chain:
+            raise ValueError("Conversational RAG chain not initialized")
+        
+        with Tracer.trace("answer", session_id=session_id) as trace:
+            response = await self.conversational_rag_chain.ainvoke(
+                {"input": user_input},
+                config=self._run_config(session_id, trace)
+            )
+            self._store_answer(response)
+        
+        return response
+    
+    def stream_response(self, user_input, session_id):
+        """
+        Stream a response from the conversational RAG chain as it is generated
+        Args:
+            user_input: User's question
+            session_id: Session identifier for chat history
+        Returns:
+            Iterator of dicts: {"context": [Documents]} once retrieval finishes,
+            then {"answer": token} for each generated token, then {"llm_calls": count}
+        """
+        if not self.conversational_rag_chain:
+            raise ValueError("Conversational RAG chain not initialized")
         
-        return response 
\ No newline at end of file
+        with Tracer.trace("answer", session_id=session_id, streaming=True) as trace:
+            # History is written by RunnableWithMessageHistory once the stream is exhausted
+            stream = self.conversational_rag_chain.stream(
+                {"input": user_input},
+                config=self._run_config(session_id, trace)
+            )
+            response = {}  # Reassembled so the finished answer can be cached
+            for chunk in stream:
+                for key, value in chunk.items():
+                    response[key] = response.get(key, "") + value if key == "answer" else value
+                if "context" in chunk:
+                    yield {"context": chunk["context"]}
+                if chunk.get("answer"):
+                    yield {"answer": chunk["answer"]}
+                if "llm_calls" in chunk:
+                    yield {"llm_calls": chunk["llm_calls"]}
+            self._store_answer(response)
\ No newline at end of file
@@ -0,0 +1,318 @@
+"""
+Headless asyncio serving layer for the RAG pipeline.
+
+Exposes ingest and ask operations on top of DocumentProcessor, RAGChain and
+SessionManager without Streamlit. Run an offline load test with:
+    python -m src.serving --sessions 16 --questions 4 --llm-delay 0.2
+"""
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from pydantic import PrivateAttr
+from collections import defaultdict
+import argparse
+import asyncio
+import json
+import threading
+import time
+import httpx
+from config.settings import LLM_MODEL, LLM_MAX_CONCURRENCY, CORPUS_SHARING_ENABLED, VECTOR_STORE_BACKEND
+from src.corpus_registry import CorpusRegistry
+from src.document_processor import DocumentProcessor
+from src.history_compressor import HistoryCompressor
+from src.rag_chain import RAGChain
+from src.session_manager import SessionManager
+from src.tracing import Tracer
+
+
+# Uploaded-file stand-in for bytes that did not come through Streamlit
+class InMemoryFile:
+    def __init__(self, name, data):
+        """
+        Wrap raw file bytes
+        Args:
+            name: File name
+            data: File contents
+        """
+        self.name = name
+        self.size = len(data)
+        self._data = data
+
+    def getvalue(self):
+        """Return the file contents (same interface as Streamlit's UploadedFile)"""
+        return self._data
+
+
+# Chat model wrapper that caps how many calls reach the wrapped model at once
+class ConcurrencyLimitedChatModel(BaseChatModel):
+    llm: BaseChatModel
+    max_concurrency: int = LLM_MAX_CONCURRENCY
+    _async_limit: asyncio.Semaphore = PrivateAttr(default=None)
+    _thread_limit: threading.BoundedSemaphore = PrivateAttr(default=None)
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._async_limit = asyncio.Semaphore(self.max_concurrency)
+        self._thread_limit = threading.BoundedSemaphore(self.max_concurrency)
+
+    @property
+    def _llm_type(self) -> str:
+        return self.llm._llm_type
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        with self._thread_limit:
+            return self.llm._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        async with self._async_limit:
+            return await self.llm._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        with self._thread_limit:
+            yield from self.llm._stream(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        async with self._async_limit:
+            async for chunk in self.llm._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                yield chunk
+
+
+# Async service exposing ingest/ask with bounded LLM concurrency and a shared LLM connection pool
+class RAGService:
+    def __init__(self, api_key=None, llm=None, embeddings=None,
+                 max_concurrency=LLM_MAX_CONCURRENCY, answer_cache=True,
+                 share_corpus=CORPUS_SHARING_ENABLED):
+        """
+        Initialize the service
+        Args:
+            api_key: Groq API key (not needed when llm is given)
+            llm: Chat model to use instead of Groq (e.g. a local stub for offline runs)
+            embeddings: Embedding model to use instead of the shared registry model
+            max_concurrency: Maximum number of LLM calls in flight at once
+            answer_cache: Whether to use the semantic answer cache
+            share_corpus: Index identical documents once for all sessions instead of once per session
+        """
+        self.api_key = api_key
+        self._http_client = None
+        if llm is None:
+            # One keep-alive connection pool shared by every session's LLM calls
+            self._http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=max_concurrency,
+                    max_keepalive_connections=max_concurrency
+                )
+            )
+            from langchain_groq import ChatGroq
+            llm = ChatGroq(
+                groq_api_key=api_key,
+                model_name=LLM_MODEL,
+                http_async_client=self._http_client
+            )
+        # Only model calls wait for a slot; retrieval, cache lookups and history work run freely
+        self.llm = ConcurrencyLimitedChatModel(llm=llm, max_concurrency=max_concurrency)
+        self.embeddings = embeddings
+        self.answer_cache = answer_cache
+        self.document_processor = DocumentProcessor(embeddings=embeddings)
+        # Own registry rather than the process-wide one, since this service may use its own embeddings
+        # (the on-disk sharded index is one store for everyone, so it always goes through a registry)
+        share_corpus = share_corpus or VECTOR_STORE_BACKEND == "sharded"
+        self.corpus_registry = CorpusRegistry(self.document_processor) if share_corpus else None
+        self.session_manager = SessionManager(store={})
+        self._sessions = {}  # session_id -> {"vectorstore", "indexed_files", "rag_chain"}
+        self._session_locks = defaultdict(asyncio.Lock)
+        self.metrics = {"ingests": 0, "asks": 0, "llm_calls": 0, "answer_cache_hits": 0}
+
+    async def ingest(self, session_id, files):
+        """
+        Index documents for a session (incrementally, like the Streamlit app)
+        Args:
+            session_id: Session identifier
+            files: List of (name, bytes) tuples or objects with name/getvalue()
+        Returns:
+            Dictionary with the added and removed file names and the indexed file count
+        """
+        uploads = [InMemoryFile(*f) if isinstance(f, tuple) else f for f in files]
+        async with self._session_locks[session_id]:
+            state = self._sessions.get(session_id, {})
+            # Parsing and embedding are CPU-bound; keep them off the event loop
+            if self.corpus_registry:
+                vectorstore, retriever, indexed_files, changes = await asyncio.to_thread(
+                    self.corpus_registry.sync_session, session_id, uploads
+                )
+            else:
+                vectorstore, retriever, indexed_files, changes = await asyncio.to_thread(
+                    self.document_processor.update_index,
+                    uploads,
+                    state.get("vectorstore"),
+                    state.get("indexed_files")
+                )
+
+            rag_chain = state.get("rag_chain") or RAGChain(
+                self.api_key, embeddings=self.embeddings, llm=self.llm
+            )
+            if not self.answer_cache:
+                rag_chain.answer_cache = None
+            rag_chain.create_rag_chain(
+                retriever, DocumentProcessor.corpus_fingerprint(indexed_files)
+            )
+            rag_chain.create_conversational_chain(self.session_manager.get_session_history)
+
+            self._sessions[session_id] = {
+                "vectorstore": vectorstore,
+                "indexed_files": indexed_files,
+                "rag_chain": rag_chain,
+            }
+        self.metrics["ingests"] += 1
+        return {**changes, "files": len(indexed_files)}
+
+    async def ask(self, session_id, question):
+        """
+        Answer a question against a session's documents
+        Args:
+            session_id: Session identifier
+            question: User's question
+        Returns:
+            Dictionary with the answer, LLM call count, cache hit flag and source metadata
+        """
+        state = self._sessions.get(session_id)
+        if not state:
+            raise ValueError(f"No documents ingested for session {session_id}")
+
+        response = await state["rag_chain"].aget_response(question, session_id)
+
+        self.metrics["asks"] += 1
+        self.metrics["llm_calls"] += response.get("llm_calls", 0)
+        self.metrics["answer_cache_hits"] += int(bool(response.get("answer_cache_hit")))
+        return {
+            "answer": response["answer"],
+            "llm_calls": response.get("llm_calls"),
+            "answer_cache_hit": response.get("answer_cache_hit", False),
+            "sources": [document.metadata for document in response.get("context", [])],
+        }
+
+    def clear_session(self, session_id):
+        """
+        Forget a session's documents and chat history
+        Args:
+            session_id: Session identifier
+        """
+        state = self._sessions.pop(session_id, None)
+        if self.corpus_registry:
+            # Shared documents stay indexed while other sessions use them
+            self.corpus_registry.release_session(session_id)
+        elif state:
+            # Free the session's collection in the shared Chroma client (or its arrays)
+            self.document_processor.drop_index(state["vectorstore"])
+        self._session_locks.pop(session_id, None)
+        self.session_manager.clear_session(session_id)
+        HistoryCompressor.reset(session_id)
+
+    def corpus_stats(self):
+        """
+        Size of the shared document index
+        Returns:
+            Dictionary of document, chunk and memory figures, or None when corpus sharing is off
+        """
+        return self.corpus_registry.memory_stats() if self.corpus_registry else None
+
+    def metrics_text(self):
+        """
+        Per-stage latency, token, chunk and cache-hit metrics for a scrape endpoint
+        Returns:
+            Metrics in the Prometheus text exposition format
+        """
+        return Tracer.prometheus_text()
+
+    async def aclose(self):
+        """Close the shared HTTP connection pool"""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+
+
+async def run_load_test(sessions=8, questions=4, llm_delay=0.2, max_concurrency=LLM_MAX_CONCURRENCY,
+                        pages=20, share_corpus=CORPUS_SHARING_ENABLED):
+    """
+    Measure throughput at N concurrent sessions against a local stub LLM and fake embeddings
+    Args:
+        sessions: Number of concurrent sessions
+        questions: Questions asked per session (sequentially within a session)
+        llm_delay: Simulated LLM round-trip time in seconds
+        max_concurrency: LLM concurrency limit
+        pages: Pages in each session's synthetic PDF
+        share_corpus: Index the (identical) PDF once for all sessions
+    Returns:
+        Dictionary of throughput and latency figures
+    """
+    # Imported here so the serving module does not depend on the offline doubles
+    from src.fakes import FakeEmbeddings, StubChatModel, make_synthetic_pdf
+
+    llm = StubChatModel(delay=llm_delay)
+    service = RAGService(
+        llm=llm, embeddings=FakeEmbeddings(), max_concurrency=max_concurrency, answer_cache=False,
+        share_corpus=share_corpus
+    )
+    pdf = make_synthetic_pdf([
+        f"Section {page}. Part number PN-{1000 + page} is covered by clause {page}.1 of the policy. " * 20
+        for page in range(pages)
+    ])
+
+    start = time.perf_counter()
+    await asyncio.gather(*(service.ingest(f"s{i}", [("policy.pdf", pdf)]) for i in range(sessions)))
+    ingest_seconds = time.perf_counter() - start
+
+    latencies = []
+
+    async def run_session(session_index):
+        for question_index in range(questions):
+            asked = time.perf_counter()
+            await service.ask(
+                f"s{session_index}",
+                f"What does clause {question_index}.1 say about part PN-{1000 + question_index}?"
+            )
+            latencies.append(time.perf_counter() - asked)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run_session(i) for i in range(sessions)))
+    ask_seconds = time.perf_counter() - start
+    await service.aclose()
+
+    latencies.sort()
+    total = len(latencies)
+    return {
+        "sessions": sessions,
+        "questions_per_session": questions,
+        "llm_delay_s": llm_delay,
+        "max_concurrency": max_concurrency,
+        "ingest_seconds": round(ingest_seconds, 3),
+        "ask_seconds": round(ask_seconds, 3),
+        "questions_per_second": round(total / ask_seconds, 2) if ask_seconds else None,
+        "p50_latency_s": round(latencies[total // 2], 3) if total else None,
+        "p95_latency_s": round(latencies[min(total - 1, int(total * 0.95))], 3) if total else None,
+        "llm_calls": llm.call_count,
+        "corpus": service.corpus_stats(),
+    }
+
+
+def main():
+    """Command-line entry point for the offline load test"""
+    parser = argparse.ArgumentParser(description="Offline throughput test for the RAG serving layer")
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--questions", type=int, default=4)
+    parser.add_argument("--llm-delay", type=float, default=0.2)
+    parser.add_argument("--concurrency", type=int, default=LLM_MAX_CONCURRENCY)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--no-corpus-sharing", action="store_true",
+                        help="Index the PDF separately for every session")
+    args = parser.parse_args()
+    result = asyncio.run(run_load_test(
+        sessions=args.sessions,
+        questions=args.questions,
+        llm_delay=args.llm_delay,
+        max_concurrency=args.concurrency,
+        pages=args.pages,
+        share_corpus=not args.no_corpus_sharing
+    ))
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,41 @@
 from langchain_community.chat_message_histories import ChatMessageHistory
 from langchain_core.chat_history import BaseChatMessageHistory
-import streamlit as st
+from config.settings import SESSION_STORE_BACKEND
+from src.session_store import SQLiteSessionStore, StoredSessions
 
-# Manages chat session histories using Streamlit's session state
+
+def _session_state():
+    """Streamlit session state (streamlit is only imported when the in-tab store is used)"""
+    import streamlit as st
+    return st.session_state
+
+
+# Manages chat session histories using Streamlit's session state or a durable backend
 class SessionManager:
-    def __init__(self):
-        """Initialize session manager and ensure session state is set up"""
-        self._initialize_session_state()
+    def __init__(self, store=None, backend=SESSION_STORE_BACKEND):
+        """
+        Initialize session manager and ensure session state is set up
+        Args:
+            store: Dictionary to keep histories in (defaults to Streamlit session state,
+                   pass a dict to use the manager outside Streamlit)
+            backend: "memory" for in-process dictionaries, "sqlite" for the durable SQLite store
+        """
+        self._store = store
+        self.backend = SQLiteSessionStore.get_shared() if backend == "sqlite" else None
+        if store is None and self.backend is None:
+            self._initialize_session_state()
     
     def _initialize_session_state(self):
         """Ensure Streamlit session state has a store for chat histories"""
-        if 'store' not in st.session_state:
-            st.session_state.store = {}
+        if 'store' not in _session_state():
+            _session_state().store = {}
+    
+    @property
+    def store(self):
+        """Dictionary of session ID -> chat history"""
+        if self._store is not None:
+            return self._store
+        return _session_state().store
     
     def get_session_history(self, session_id: str) -> BaseChatMessageHistory:
         """
@@ -21,18 +45,25 @@ class SessionManager:
         Returns:
             ChatMessageHistory object for the session
         """
-        if session_id not in st.session_state.store:
+        if self.backend is not None:
+            # Durable history shared by every tab using this session ID
+            return self.backend.get_history(session_id)
+        if session_id not in self.store:
             # Create a new chat history if it doesn't exist
-            st.session_state.store[session_id] = ChatMessageHistory()
-        return st.session_state.store[session_id]
+            self.store[session_id] = ChatMessageHistory()
+        return self.store[session_id]
     
     def get_all_sessions(self):
         """
         Get all active chat sessions and their histories
         Returns:
-            Dictionary of all session histories
+            Mapping of session ID -> chat history
         """
-        return st.session_state.store
+        if self.backend is not None:
+            # Only session IDs are listed; a history is fetched through the store's cache when
+            # accessed, so listing thousands of sessions neither loads nor evicts histories
+            return StoredSessions(self.backend)
+        return self.store
     
     def clear_session(self, session_id: str):
         """
@@ -40,11 +71,18 @@ class SessionManager:
         Args:
             session_id: Session identifier to clear
         """
-        if session_id in st.session_state.store:
-            del st.session_state.store[session_id]
+        if self.backend is not None:
+            self.backend.clear(session_id)
+        elif session_id in self.store:
+            del self.store[session_id]
     
     def clear_all_sessions(self):
         """
         Clear all session histories from session state
         """
-        st.session_state.store = {} 
\ No newline at end of file
+        if self.backend is not None:
+            self.backend.clear_all()
+        elif self._store is not None:
+            self._store.clear()
+        else:
+            _session_state().store = {} 
\ No newline at end of file
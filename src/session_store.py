@@ -0,0 +1,264 @@
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import messages_from_dict, message_to_dict
+from collections import OrderedDict
+from collections.abc import Mapping
+from contextlib import contextmanager
+import abc
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from config.settings import (
+    SESSION_DB_PATH, SESSION_DB_POOL_SIZE, SESSION_HISTORY_WINDOW,
+    SESSION_IDLE_SECONDS, SESSION_CACHE_MAX_SESSIONS
+)
+
+
+# Base interface for durable chat history backends
+class SessionStore(abc.ABC):
+    @abc.abstractmethod
+    def append(self, session_id, messages):
+        """Append messages to a session"""
+
+    @abc.abstractmethod
+    def load_recent(self, session_id, limit, before_id=None):
+        """Load up to `limit` most recent messages (optionally older than a message ID), oldest first"""
+
+    @abc.abstractmethod
+    def clear(self, session_id):
+        """Delete a session's messages"""
+
+    @abc.abstractmethod
+    def clear_all(self):
+        """Delete every session"""
+
+    @abc.abstractmethod
+    def list_sessions(self):
+        """List the IDs of sessions that have messages"""
+
+
+# Chat history backed by a SessionStore that only keeps a window of recent messages in memory
+class StoredChatMessageHistory(BaseChatMessageHistory):
+    def __init__(self, session_id, store, window=SESSION_HISTORY_WINDOW):
+        """
+        Initialize the history
+        Args:
+            session_id: Session identifier
+            store: SessionStore holding the messages
+            window: Number of most recent messages loaded into memory
+        """
+        self.session_id = session_id
+        self.store = store
+        self.window = window
+        self._messages = None  # Loaded on first access
+
+    @property
+    def messages(self):
+        """Most recent messages of the session, oldest first"""
+        if self._messages is None:
+            self._messages = self.store.load_recent(self.session_id, self.window)
+        return self._messages
+
+    def add_messages(self, messages):
+        """Append messages to the store (append-only, setting their IDs) and to the in-memory window"""
+        self.store.append(self.session_id, messages)
+        if self._messages is not None:
+            self._messages = (self._messages + list(messages))[-self.window:]
+
+    def clear(self):
+        """Delete the session's messages"""
+        self.store.clear(self.session_id)
+        self._messages = []
+
+
+# Read-only view of a store's sessions whose histories are loaded on demand through its cache
+class StoredSessions(Mapping):
+    def __init__(self, store):
+        """
+        Initialize the view
+        Args:
+            store: SQLiteSessionStore holding the sessions
+        """
+        self.store = store
+        self._session_ids = dict.fromkeys(store.list_sessions())  # Ordered, with O(1) membership
+
+    def __getitem__(self, session_id):
+        """Get a session's history from the store's cache (loading it on first access)"""
+        if session_id not in self._session_ids:
+            raise KeyError(session_id)
+        return self.store.get_history(session_id)
+
+    def __iter__(self):
+        return iter(self._session_ids)
+
+    def __len__(self):
+        return len(self._session_ids)
+
+
+# SQLite session store with pooled connections, append-only writes and idle-session eviction
+class SQLiteSessionStore(SessionStore):
+    _shared = {}  # db_path -> store shared by every session in this process
+    _shared_lock = threading.Lock()
+
+    def __init__(self, db_path=SESSION_DB_PATH, pool_size=SESSION_DB_POOL_SIZE,
+                 idle_seconds=SESSION_IDLE_SECONDS, max_cached_sessions=SESSION_CACHE_MAX_SESSIONS):
+        """
+        Initialize the store
+        Args:
+            db_path: Path of the SQLite database file
+            pool_size: Number of pooled connections
+            idle_seconds: Histories not used for this long are dropped from memory
+            max_cached_sessions: Maximum number of histories kept in memory
+        """
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.idle_seconds = idle_seconds
+        self.max_cached_sessions = max_cached_sessions
+        self._pool = queue.Queue(maxsize=pool_size)
+        for _ in range(pool_size):
+            connection = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._pool.put(connection)
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL, "
+                "message TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS idx_messages_session ON messages (session_id, id)"
+            )
+        self._histories = OrderedDict()  # session_id -> (history, last access time)
+        self._histories_lock = threading.Lock()
+
+    @classmethod
+    def get_shared(cls, db_path=SESSION_DB_PATH):
+        """
+        Get the process-wide store for a database file
+        Args:
+            db_path: Path of the SQLite database file
+        Returns:
+            Shared SQLiteSessionStore instance
+        """
+        with cls._shared_lock:
+            if db_path not in cls._shared:
+                cls._shared[db_path] = cls(db_path)
+            return cls._shared[db_path]
+
+    @contextmanager
+    def _connection(self):
+        """Borrow a pooled connection and commit (or roll back) when done"""
+        connection = self._pool.get()
+        try:
+            yield connection
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            self._pool.put(connection)
+
+    def append(self, session_id, messages):
+        """
+        Append messages to a session; each message's id is set to its row ID
+        Args:
+            session_id: Session identifier
+            messages: Chat messages to store
+        """
+        now = time.time()
+        rows = [(session_id, json.dumps(message_to_dict(message)), now) for message in messages]
+        with self._connection() as connection:
+            for message, row in zip(messages, rows):
+                cursor = connection.execute(
+                    "INSERT INTO messages (session_id, message, created_at) VALUES (?, ?, ?)", row
+                )
+                # Row IDs identify a message even after it slides out of the loaded window
+                message.id = str(cursor.lastrowid)
+
+    def load_recent(self, session_id, limit, before_id=None):
+        """
+        Load a page of a session's most recent messages
+        Args:
+            session_id: Session identifier
+            limit: Maximum number of messages
+            before_id: Only return messages older than this message ID (for paging back)
+        Returns:
+            List of chat messages, oldest first, with their row IDs as message ids
+        """
+        with self._connection() as connection:
+            if before_id is None:
+                rows = connection.execute(
+                    "SELECT id, message FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+                    (session_id, limit)
+                ).fetchall()
+            else:
+                rows = connection.execute(
+                    "SELECT id, message FROM messages WHERE session_id = ? AND id < ? "
+                    "ORDER BY id DESC LIMIT ?",
+                    (session_id, before_id, limit)
+                ).fetchall()
+        rows = list(reversed(rows))
+        messages = messages_from_dict([json.loads(row[1]) for row in rows])
+        for message, row in zip(messages, rows):
+            message.id = str(row[0])
+        return messages
+
+    def clear(self, session_id):
+        """
+        Delete a session's messages
+        Args:
+            session_id: Session identifier
+        """
+        with self._connection() as connection:
+            connection.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+        with self._histories_lock:
+            self._histories.pop(session_id, None)
+
+    def clear_all(self):
+        """Delete every session"""
+        with self._connection() as connection:
+            connection.execute("DELETE FROM messages")
+        with self._histories_lock:
+            self._histories.clear()
+
+    def list_sessions(self):
+        """
+        List the sessions that have messages
+        Returns:
+            List of session IDs
+        """
+        with self._connection() as connection:
+            rows = connection.execute("SELECT DISTINCT session_id FROM messages").fetchall()
+        return [row[0] for row in rows]
+
+    def get_history(self, session_id):
+        """
+        Get the in-memory history for a session, evicting idle ones
+        Args:
+            session_id: Session identifier
+        Returns:
+            StoredChatMessageHistory shared by every tab using this session ID
+        """
+        now = time.time()
+        with self._histories_lock:
+            entry = self._histories.pop(session_id, None)
+            history = entry[0] if entry else StoredChatMessageHistory(session_id, self)
+            self._histories[session_id] = (history, now)
+
+            # Oldest-accessed entries are at the front; drop idle ones and any over the cap
+            while self._histories:
+                oldest_id, (_, last_access) = next(iter(self._histories.items()))
+                idle = now - last_access > self.idle_seconds
+                if not idle and len(self._histories) <= self.max_cached_sessions:
+                    break
+                del self._histories[oldest_id]
+        return history
+
+    def cached_session_count(self):
+        """Number of histories currently held in memory"""
+        with self._histories_lock:
+            return len(self._histories)
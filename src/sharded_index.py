@@ -0,0 +1,674 @@
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import json
+import mmap
+import os
+import shutil
+import sqlite3
+import threading
+import uuid
+import numpy as np
+from config.settings import (
+    SHARDED_INDEX_PATH, SHARD_SIZE, SHARD_SEARCH_WORKERS, VECTOR_STORE_DTYPE, HYBRID_FETCH_K
+)
+from src.hybrid_retriever import tokenize
+from src.numpy_vector_store import DTYPES, matches_filter, quantize
+
+# Rows scored per block while scanning a shard, so only one block is widened to float32 at a time
+_SCAN_BLOCK_ROWS = 4096
+# Values bound per SQL statement (SQLite caps the number of parameters)
+_SQL_BATCH_SIZE = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS shards (shard INTEGER PRIMARY KEY, rows INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS chunks (
+    slot INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    file_hash TEXT,
+    text TEXT NOT NULL,
+    metadata TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS chunks_file_hash ON chunks (file_hash);
+CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(text, content='chunks', content_rowid='slot');
+"""
+
+
+def _batches(values):
+    """Split a list into runs short enough to bind in one SQL statement"""
+    for start in range(0, len(values), _SQL_BATCH_SIZE):
+        yield values[start:start + _SQL_BATCH_SIZE]
+
+
+def _drop_pages(*arrays):
+    """Release the resident pages of read-only memory maps (the data stays in the OS page cache)"""
+    if not hasattr(mmap, "MADV_DONTNEED"):
+        return
+    for array in arrays:
+        mapping = getattr(array, "_mmap", None)
+        if mapping is not None:
+            mapping.madvise(mmap.MADV_DONTNEED)
+
+
+def _file_hashes(filter):
+    """File hashes a filter restricts results to, or None if it filters on anything else"""
+    if not filter or set(filter) != {"file_hash"}:
+        return None
+    condition = filter["file_hash"]
+    if isinstance(condition, dict):
+        return list(condition.get("$in", [])) if set(condition) == {"$in"} else None
+    return [condition]
+
+
+# Persistent vector index: vectors in fixed-size memory-mapped shard files, text and metadata in SQLite
+class ShardedVectorStore(VectorStore):
+    persistent = True  # Chunks live on disk, so they cost no RAM and are never evicted to save memory
+    _shared = {}  # index path -> store shared by every session in this process
+    _shared_lock = threading.Lock()
+    _executor = None  # Thread pool scanning shards, shared by every store
+    _executor_lock = threading.Lock()
+
+    def __init__(self, embedding, path=SHARDED_INDEX_PATH, shard_size=SHARD_SIZE, dtype=VECTOR_STORE_DTYPE,
+                 search_workers=SHARD_SEARCH_WORKERS):
+        """
+        Open (or create) an index directory
+        Args:
+            embedding: Embedding model used for texts and queries
+            path: Directory holding the shard files and the chunk database
+            shard_size: Chunks per shard file (an existing index keeps the size it was created with)
+            dtype: Storage precision: "float32", "float16" or "int8" (per-row scaled)
+            search_workers: Threads scanning shards in parallel (only used when the pool is first created)
+        """
+        if dtype not in DTYPES:
+            raise ValueError(f"Unsupported vector store dtype: {dtype}")
+        os.makedirs(path, exist_ok=True)
+        self.embedding = embedding
+        self.path = path
+        self.search_workers = search_workers
+        self._db = sqlite3.connect(os.path.join(path, "chunks.sqlite"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._db_lock = threading.Lock()
+        self._write_lock = threading.RLock()  # Serializes appends and deletes
+
+        settings = dict(self._db.execute("SELECT key, value FROM settings"))
+        self.shard_size = int(settings.get("shard_size", shard_size))
+        self.dtype = settings.get("dtype", dtype)
+        self.dim = int(settings["dim"]) if "dim" in settings else None
+        self._rows = [rows for (rows,) in self._db.execute("SELECT rows FROM shards ORDER BY shard")]
+        self._maps = {}  # shard -> (vectors, scales, tombstones) read-only memory maps
+        self.lexical_index = ShardedLexicalIndex(self)
+        self.shared = False  # Set by open_shared(); the shared store is the user's library
+
+    @classmethod
+    def open_shared(cls, embedding, path=SHARDED_INDEX_PATH):
+        """
+        Get the process-wide store for an index directory
+        Args:
+            embedding: Embedding model used if the store has to be opened
+            path: Index directory
+        Returns:
+            Shared ShardedVectorStore instance
+        """
+        with cls._shared_lock:
+            key = os.path.abspath(path)
+            if key not in cls._shared:
+                store = cls(embedding, path)
+                store.shared = True
+                cls._shared[key] = store
+            return cls._shared[key]
+
+    @classmethod
+    def _get_executor(cls, max_workers):
+        """Create the shard-scan thread pool on first use"""
+        with cls._executor_lock:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="shard-scan")
+            return cls._executor
+
+    @property
+    def embeddings(self):
+        return self.embedding
+
+    def __len__(self):
+        with self._db_lock:
+            return self._db.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def _shard_path(self, shard, suffix):
+        return os.path.join(self.path, f"shard-{shard:05d}.{suffix}")
+
+    def _open_shard(self, shard, mode):
+        """Memory-map a shard's vectors, dequantization scales and tombstones"""
+        return (
+            np.memmap(self._shard_path(shard, "vec"), dtype=DTYPES[self.dtype], mode=mode,
+                      shape=(self.shard_size, self.dim)),
+            np.memmap(self._shard_path(shard, "scale"), dtype=np.float32, mode=mode, shape=(self.shard_size,)),
+            np.memmap(self._shard_path(shard, "del"), dtype=np.uint8, mode=mode, shape=(self.shard_size,)),
+        )
+
+    def _read_maps(self, shard):
+        """Read-only maps of a shard, opened once (they see later appends through the page cache)"""
+        maps = self._maps.get(shard)
+        if maps is None:
+            maps = self._maps.setdefault(shard, self._open_shard(shard, "r"))
+        return maps
+
+    def add_embeddings(self, texts, embeddings, metadatas=None, ids=None):
+        """
+        Append precomputed embeddings to the last shard, starting new shards as each one fills
+        Args:
+            texts: Chunk texts
+            embeddings: Embedding vectors, one per text
+            metadatas: Optional metadata dictionaries
+            ids: Optional chunk IDs (existing IDs are replaced)
+        Returns:
+            List of chunk IDs
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+        ids = list(ids) if ids else [uuid.uuid4().hex for _ in texts]
+        metadatas = list(metadatas) if metadatas else [{} for _ in texts]
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        # Normalize once at insert time so search is a plain dot product
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12
+        quantized, scales = quantize(vectors, self.dtype)
+
+        with self._write_lock:
+            self.delete(ids)
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                with self._db_lock, self._db:
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO settings VALUES (?, ?)",
+                        [("dim", str(self.dim)), ("dtype", self.dtype), ("shard_size", str(self.shard_size))]
+                    )
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding size {vectors.shape[1]} does not match the index ({self.dim})")
+
+            rows = list(self._rows)
+            records = []
+            offset = 0
+            while offset < len(texts):
+                if not rows or rows[-1] >= self.shard_size:
+                    # Creates full-size sparse files: disk blocks are only allocated as rows are written
+                    self._open_shard(len(rows), "w+")
+                    rows.append(0)
+                shard, start = len(rows) - 1, rows[-1]
+                count = min(len(texts) - offset, self.shard_size - start)
+                shard_vectors, shard_scales, _ = self._open_shard(shard, "r+")
+                shard_vectors[start:start + count] = quantized[offset:offset + count]
+                shard_scales[start:start + count] = scales[offset:offset + count]
+                shard_vectors.flush()
+                shard_scales.flush()
+                del shard_vectors, shard_scales
+                for i in range(offset, offset + count):
+                    records.append((
+                        shard * self.shard_size + start + i - offset, ids[i],
+                        metadatas[i].get("file_hash"), texts[i], json.dumps(metadatas[i])
+                    ))
+                rows[shard] = start + count
+                offset += count
+
+            with self._db_lock, self._db:
+                self._db.executemany("INSERT INTO chunks VALUES (?, ?, ?, ?, ?)", records)
+                self._db.executemany(
+                    "INSERT INTO chunks_fts (rowid, text) VALUES (?, ?)",
+                    [(record[0], record[3]) for record in records]
+                )
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO shards VALUES (?, ?)", list(enumerate(rows))
+                )
+            # Searches only see the new rows once their text is committed
+            self._rows = rows
+        return ids
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        """
+        Embed and add texts
+        Args:
+            texts: Chunk texts
+            metadatas: Optional metadata dictionaries
+            ids: Optional chunk IDs
+        Returns:
+            List of chunk IDs
+        """
+        texts = list(texts)
+        return self.add_embeddings(texts, self.embedding.embed_documents(texts), metadatas, ids)
+
+    def delete(self, ids=None, **kwargs):
+        """
+        Delete chunks by ID (their rows are tombstoned; shard files are append-only)
+        Args:
+            ids: Chunk IDs to delete
+        Returns:
+            True
+        """
+        ids = list(ids or [])
+        if not ids:
+            return True
+        with self._db_lock:
+            found = []
+            for batch in _batches(ids):
+                found.extend(self._db.execute(
+                    f"SELECT slot, text FROM chunks WHERE id IN ({','.join('?' * len(batch))})", batch
+                ))
+        if not found:
+            return True
+
+        with self._write_lock:
+            # Tombstone first, so a concurrent search never returns a row whose text is gone
+            by_shard = {}
+            for slot, _ in found:
+                by_shard.setdefault(slot // self.shard_size, []).append(slot % self.shard_size)
+            for shard, shard_rows in by_shard.items():
+                _, _, tombstones = self._open_shard(shard, "r+")
+                tombstones[shard_rows] = 1
+                tombstones.flush()
+                del tombstones
+            with self._db_lock, self._db:
+                self._db.executemany(
+                    "INSERT INTO chunks_fts (chunks_fts, rowid, text) VALUES ('delete', ?, ?)", found
+                )
+                self._db.executemany("DELETE FROM chunks WHERE slot = ?", [(slot,) for slot, _ in found])
+        return True
+
+    def _allowed_rows(self, filter):
+        """Rows a metadata filter allows, grouped by shard (None when unfiltered)"""
+        if not filter:
+            return None
+        hashes = _file_hashes(filter)
+        slots = []
+        with self._db_lock:
+            if hashes is not None:
+                # Session filters use the indexed file_hash column
+                for batch in _batches(hashes):
+                    slots.extend(slot for (slot,) in self._db.execute(
+                        f"SELECT slot FROM chunks WHERE file_hash IN ({','.join('?' * len(batch))})", batch
+                    ))
+            else:
+                slots.extend(
+                    slot for slot, metadata in self._db.execute("SELECT slot, metadata FROM chunks")
+                    if matches_filter(json.loads(metadata), filter)
+                )
+        allowed = {}
+        for slot in sorted(slots):
+            allowed.setdefault(slot // self.shard_size, []).append(slot % self.shard_size)
+        return {shard: np.asarray(rows) for shard, rows in allowed.items()}
+
+    def _scan_shard(self, shard, size, queries, k, candidate_rows=None):
+        """
+        Top-k rows of one shard
+        Args:
+            shard: Shard number
+            size: Rows written to the shard when the search started
+            queries: (n_queries, dim) unit-length float32 queries
+            k: Results per query
+            candidate_rows: Optional sorted rows to score instead of the whole shard
+        Returns:
+            Tuple of (scores, slots) arrays, each (n_queries, at most k)
+        """
+        vectors, scales, tombstones = self._read_maps(shard)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        if candidate_rows is not None:
+            candidate_rows = candidate_rows[candidate_rows < size]
+            blocks = [candidate_rows[start:start + _SCAN_BLOCK_ROWS]
+                      for start in range(0, len(candidate_rows), _SCAN_BLOCK_ROWS)]
+        else:
+            blocks = [np.arange(start, min(start + _SCAN_BLOCK_ROWS, size))
+                      for start in range(0, size, _SCAN_BLOCK_ROWS)]
+        try:
+            for rows in blocks:
+                if candidate_rows is None:
+                    # Contiguous rows are read with a slice rather than a gather
+                    block = slice(int(rows[0]), int(rows[-1]) + 1)
+                else:
+                    block = rows
+                scores = (queries @ vectors[block].astype(np.float32).T) * scales[block]
+                scores[:, tombstones[block] != 0] = -np.inf
+                scores = np.concatenate([best_scores, scores], axis=1)
+                block_rows = np.concatenate([best_rows, np.broadcast_to(rows, (len(queries), len(rows)))], axis=1)
+                if scores.shape[1] > k:
+                    # Keep the running top k, so memory does not grow with the shard
+                    keep = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                    scores = np.take_along_axis(scores, keep, axis=1)
+                    block_rows = np.take_along_axis(block_rows, keep, axis=1)
+                best_scores, best_rows = scores, block_rows
+        finally:
+            # The scanned pages would otherwise stay mapped and resident memory would grow with the corpus
+            _drop_pages(vectors, scales, tombstones)
+        return best_scores, best_rows + shard * self.shard_size
+
+    def search_by_vectors(self, query_vectors, k=4, filter=None):
+        """
+        Batched top-k search, scanning shards in parallel and merging their results
+        Args:
+            query_vectors: (n_queries, dim) array-like of query embeddings
+            k: Results per query
+            filter: Optional metadata filter (equality or {"$in": [...]} per key)
+        Returns:
+            List (per query) of (Document, cosine similarity) tuples, best first
+        """
+        queries = np.atleast_2d(np.asarray(query_vectors, dtype=np.float32))
+        queries = queries / (np.linalg.norm(queries, axis=1, keepdims=True) + 1e-12)
+        sizes = list(self._rows)
+        allowed = self._allowed_rows(filter)
+        shards = [shard for shard, size in enumerate(sizes)
+                  if size and (allowed is None or shard in allowed)]
+        if not shards or k <= 0:
+            return [[] for _ in queries]
+        if queries.shape[1] != self.dim:
+            raise ValueError(f"Query embedding size {queries.shape[1]} does not match the index ({self.dim})")
+
+        executor = self._get_executor(self.search_workers)
+        partials = list(executor.map(
+            lambda shard: self._scan_shard(
+                shard, sizes[shard], queries, k, None if allowed is None else allowed[shard]
+            ),
+            shards
+        ))
+        scores = np.concatenate([partial[0] for partial in partials], axis=1)
+        slots = np.concatenate([partial[1] for partial in partials], axis=1)
+        k = min(k, scores.shape[1])
+        if k <= 0:
+            return [[] for _ in queries]
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+
+        ranked = []
+        for query_index, columns in enumerate(top):
+            columns = columns[np.argsort(-scores[query_index, columns])]
+            ranked.append([(int(slots[query_index, c]), float(scores[query_index, c]))
+                           for c in columns if np.isfinite(scores[query_index, c])])
+        documents = self._fetch({slot for hits in ranked for slot, _ in hits})
+        return [[(documents[slot], score) for slot, score in hits if slot in documents] for hits in ranked]
+
+    def _fetch(self, slots):
+        """Documents for a set of slots (rows deleted meanwhile are missing)"""
+        documents = {}
+        with self._db_lock:
+            for batch in _batches(list(slots)):
+                for slot, chunk_id, text, metadata in self._db.execute(
+                    f"SELECT slot, id, text, metadata FROM chunks WHERE slot IN ({','.join('?' * len(batch))})",
+                    batch
+                ):
+                    documents[slot] = Document(id=chunk_id, page_content=text, metadata=json.loads(metadata))
+        return documents
+
+    def lexical_search(self, query, k=HYBRID_FETCH_K, filter=None):
+        """
+        Rank chunks against a query with SQLite's full-text BM25
+        Args:
+            query: Query text
+            k: Number of results
+            filter: Optional metadata filter (equality or {"$in": [...]} per key)
+        Returns:
+            List of (Document, score) tuples, best first
+        """
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        # Quoted terms are matched literally; compound identifiers become phrases
+        match = " OR ".join('"' + term.replace('"', '""') + '"' for term in sorted(terms))
+        hashes = _file_hashes(filter)
+        if hashes is not None and not hashes:
+            return []
+        # Rank on (slot, score) alone; carrying chunk text through the sort is what makes it slow
+        sql = "SELECT chunks_fts.rowid, bm25(chunks_fts) FROM chunks_fts"
+        params = [match]
+        if hashes is not None:
+            sql += " JOIN chunks c ON c.slot = chunks_fts.rowid"
+        sql += " WHERE chunks_fts MATCH ?"
+        if hashes is not None:
+            sql += f" AND c.file_hash IN ({','.join('?' * len(hashes))})"
+            params.extend(hashes)
+        sql += " ORDER BY 2"
+        if not filter or hashes is not None:
+            sql += " LIMIT ?"
+            params.append(k)
+        with self._db_lock:
+            ranked = self._db.execute(sql, params).fetchall()
+
+        results = []
+        # Other filters are checked on the fetched metadata, a batch of ranked chunks at a time
+        for start in range(0, len(ranked), _SQL_BATCH_SIZE):
+            batch = ranked[start:start + _SQL_BATCH_SIZE]
+            documents = self._fetch(slot for slot, _ in batch)
+            for slot, score in batch:
+                document = documents.get(slot)
+                if document is None or (filter and hashes is None and not matches_filter(document.metadata, filter)):
+                    continue
+                # SQLite's bm25() is lower-is-better
+                results.append((document, -score))
+                if len(results) >= k:
+                    return results
+        return results
+
+    def similarity_search_with_score(self, query, k=4, filter=None, **kwargs):
+        """Search with a text query, returning (Document, cosine similarity) tuples"""
+        return self.search_by_vectors([self.embedding.embed_query(query)], k, filter)[0]
+
+    def similarity_search_by_vector(self, embedding, k=4, filter=None, **kwargs):
+        """Search with a query embedding"""
+        return [document for document, _ in self.search_by_vectors([embedding], k, filter)[0]]
+
+    def similarity_search(self, query, k=4, filter=None, **kwargs):
+        """Search with a text query"""
+        return [document for document, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def _select_relevance_score_fn(self):
+        # Stored vectors are unit length, so cosine similarity maps directly to [0, 1]
+        return lambda score: (score + 1.0) / 2.0
+
+    def get(self, ids=None, include=None, limit=None, **kwargs):
+        """
+        Fetch stored chunks (same shape as Chroma's get, for code that counts or inspects chunks)
+        Args:
+            ids: Chunk IDs to fetch (all by default)
+            include: Ignored; IDs, texts and metadatas are always returned
+            limit: Optional maximum number of chunks
+        Returns:
+            Dictionary with 'ids', 'documents' and 'metadatas' lists
+        """
+        with self._db_lock:
+            if ids is None:
+                sql = "SELECT id, text, metadata FROM chunks ORDER BY slot"
+                rows = list(self._db.execute(sql + (" LIMIT ?" if limit else ""), [limit] if limit else []))
+            else:
+                rows = []
+                for batch in _batches(list(ids)):
+                    rows.extend(self._db.execute(
+                        f"SELECT id, text, metadata FROM chunks WHERE id IN ({','.join('?' * len(batch))})",
+                        batch
+                    ))
+                rows = rows[:limit] if limit else rows
+        return {
+            "ids": [row[0] for row in rows],
+            "documents": [row[1] for row in rows],
+            "metadatas": [json.loads(row[2]) for row in rows],
+        }
+
+    def file_entry(self, file_hash):
+        """
+        Look up a document indexed earlier (possibly by a previous run)
+        Args:
+            file_hash: Content fingerprint of the document
+        Returns:
+            Dictionary with 'name' and 'chunk_ids', or None if the document is not in the index
+        """
+        with self._db_lock:
+            rows = list(self._db.execute(
+                "SELECT id, json_extract(metadata, '$.file_name') FROM chunks WHERE file_hash = ? ORDER BY slot",
+                (file_hash,)
+            ))
+        if not rows:
+            return None
+        return {"name": rows[0][1], "chunk_ids": [row[0] for row in rows]}
+
+    def memory_bytes(self):
+        """
+        Vector memory held by the store (same name as NumpyVectorStore's method)
+        Returns:
+            0; vectors are memory-mapped and their pages are released after every scan
+        """
+        return 0
+
+    def disk_bytes(self):
+        """
+        Disk space used by the index (allocated blocks, so sparse shard files count what is written)
+        Returns:
+            Size in bytes
+        """
+        total = 0
+        for name in os.listdir(self.path):
+            total += os.stat(os.path.join(self.path, name)).st_blocks * 512
+        return total
+
+    def stats(self):
+        """
+        Describe the index
+        Returns:
+            Dictionary with shard count, chunk count, live rows, disk usage and layout settings
+        """
+        return {
+            "shards": len(self._rows),
+            "rows": sum(self._rows),
+            "chunks": len(self),
+            "disk_bytes": self.disk_bytes(),
+            "shard_size": self.shard_size,
+            "dtype": self.dtype,
+            "dim": self.dim,
+        }
+
+    def close(self):
+        """Close the chunk database and drop the memory maps"""
+        with self._db_lock:
+            self._maps.clear()
+            self._db.close()
+
+    def delete_collection(self):
+        """
+        Delete the whole index directory of a private store (same name as Chroma's method)
+        Raises:
+            ValueError: For the process-wide store from open_shared(), which holds the user's library
+        """
+        if self.shared:
+            raise ValueError(f"Refusing to delete the shared document library at {self.path}")
+        with self._write_lock:
+            self.close()
+            shutil.rmtree(self.path, ignore_errors=True)
+            self._rows = []
+            with self._shared_lock:
+                self._shared.pop(os.path.abspath(self.path), None)
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, ids=None, **kwargs):
+        """
+        Build a store from texts
+        Args:
+            texts: Chunk texts
+            embedding: Embedding model
+            metadatas: Optional metadata dictionaries
+            ids: Optional chunk IDs
+            kwargs: Passed to the constructor (e.g. path, dtype)
+        Returns:
+            ShardedVectorStore
+        """
+        store = cls(embedding, **kwargs)
+        store.add_texts(texts, metadatas, ids)
+        return store
+
+
+# Lexical search over a sharded store's SQLite full-text index, with the same interface as BM25Index
+class ShardedLexicalIndex:
+    def __init__(self, store):
+        """
+        Initialize the adapter
+        Args:
+            store: ShardedVectorStore whose chunk text is indexed
+        """
+        self.store = store
+
+    def __len__(self):
+        return len(self.store)
+
+    def add(self, ids, documents):
+        """No-op: the store indexes chunk text itself when chunks are added"""
+
+    def remove(self, ids):
+        """No-op: the store removes chunk text itself when chunks are deleted"""
+
+    def copy(self):
+        """The full-text index lives with the store on disk, so there is nothing to copy"""
+        return self
+
+    def search(self, query, k=HYBRID_FETCH_K, filter=None, vectorstore=None):
+        """
+        Rank chunks against a query
+        Args:
+            query: Query text
+            k: Number of results
+            filter: Optional metadata filter (equality or {"$in": [...]} per key)
+            vectorstore: Ignored; chunks are loaded from the store this index belongs to
+        Returns:
+            List of (Document, score) tuples, best first
+        """
+        return self.store.lexical_search(query, k, filter)
+
+
+class _LocalFile:
+    """A PDF on disk with the name/getvalue interface of a Streamlit upload"""
+
+    def __init__(self, path):
+        self.path = path
+        self.name = os.path.basename(path)
+
+    def getvalue(self):
+        with open(self.path, "rb") as f:
+            return f.read()
+
+
+def main(argv=None):
+    """
+    Bulk-ingest a directory of PDFs into the on-disk index, or describe the index
+    Args:
+        argv: Command line arguments (defaults to sys.argv)
+    """
+    parser = argparse.ArgumentParser(description="Manage the sharded on-disk document index")
+    parser.add_argument("--path", default=SHARDED_INDEX_PATH, help="Index directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    ingest = commands.add_parser("ingest", help="Index every PDF under a directory not indexed yet")
+    ingest.add_argument("directory")
+    commands.add_parser("stats", help="Print shard, chunk and disk figures")
+    args = parser.parse_args(argv)
+
+    if args.command == "stats":
+        # No embedding model is needed just to read the index
+        store = ShardedVectorStore(None, args.path)
+    else:
+        # Imported here: the document processor itself imports this module
+        from src.document_processor import DocumentProcessor
+
+        processor = DocumentProcessor()
+        store = ShardedVectorStore(processor.embeddings, args.path)
+        pending = []
+        for root, _, names in os.walk(args.directory):
+            for name in sorted(names):
+                if name.lower().endswith(".pdf"):
+                    local_file = _LocalFile(os.path.join(root, name))
+                    file_hash = DocumentProcessor.compute_file_hash(local_file)
+                    if store.file_entry(file_hash) is None:
+                        pending.append((file_hash, local_file))
+        print(f"Indexing {len(pending)} new PDF(s)")
+        # Streaming keeps memory bounded however large each file is
+        for _, entry in processor.iter_index_files(store, pending, streaming=True):
+            print(f"  {entry['name']}: {len(entry['chunk_ids'])} chunks")
+    print(json.dumps(store.stats(), indent=2))
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import contextvars
+import logging
+import re
+import threading
+from config.settings import SPECULATIVE_REUSE_SIMILARITY, SPECULATIVE_WORKERS
+from src.hybrid_retriever import fuse_rankings
+from src.tracing import Tracer
+
+logger = logging.getLogger("rag.speculative")
+_WORD_PATTERN = re.compile(r"[a-z0-9']+")
+
+
+def question_similarity(original, rewritten):
+    """
+    Word overlap between a question and its rewrite
+    Args:
+        original: Question as the user asked it
+        rewritten: Standalone question from the rewriter
+    Returns:
+        Jaccard similarity of the two word sets (1.0 for the same words)
+    """
+    original_words = set(_WORD_PATTERN.findall(original.lower()))
+    rewritten_words = set(_WORD_PATTERN.findall(rewritten.lower()))
+    if not original_words and not rewritten_words:
+        return 1.0
+    return len(original_words & rewritten_words) / len(original_words | rewritten_words)
+
+
+# Overlaps retrieval for the raw question with the LLM rewrite of a follow-up question
+class SpeculativeRetrieval:
+    _executor = None  # Thread pool for synchronous chains, shared by every session
+    _executor_lock = threading.Lock()
+    # Outcomes are process-wide, like the rewrite counters
+    stats = {"speculated": 0, "reused": 0, "merged": 0, "failed": 0}
+    _stats_lock = threading.Lock()
+
+    def __init__(self, retriever, question_rewriter, reuse_similarity=SPECULATIVE_REUSE_SIMILARITY,
+                 max_workers=SPECULATIVE_WORKERS):
+        """
+        Initialize the speculative retrieval step
+        Args:
+            retriever: Retriever used for both the raw and the rewritten question
+            question_rewriter: QuestionRewriter producing standalone questions
+            reuse_similarity: Word overlap (Jaccard) at or above which the rewrite is considered
+                unchanged and the speculative results are used as they are
+            max_workers: Size of the shared thread pool (only used when it is first created)
+        """
+        self.retriever = retriever
+        self.question_rewriter = question_rewriter
+        self.reuse_similarity = reuse_similarity
+        self.max_workers = max_workers
+
+    @classmethod
+    def _get_executor(cls, max_workers):
+        """Create the process-wide thread pool on first use"""
+        with cls._executor_lock:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="speculate")
+            return cls._executor
+
+    @classmethod
+    def _record(cls, outcome):
+        with cls._stats_lock:
+            cls.stats[outcome] += 1
+        Tracer.count(f"speculative_{outcome}")
+
+    def rewrite_inputs(self, inputs, config=None):
+        """
+        Chain step replacing QuestionRewriter.rewrite_inputs: when the rewrite needs the LLM,
+        the raw question is retrieved for in a worker thread during the LLM call
+        Args:
+            inputs: Dict with 'input' and 'chat_history'
+            config: Run config, so the speculative retrieval is traced as part of the chain
+        Returns:
+            Inputs plus 'standalone_question', 'rewrite_llm_calls' and, when speculation ran and
+            succeeded, 'speculative_context' (the raw question's documents)
+        """
+        question, chat_history = inputs["input"], inputs.get("chat_history") or []
+        if self.question_rewriter.is_resolved(question, chat_history):
+            # No LLM round trip to hide retrieval behind
+            return self.question_rewriter.rewrite_inputs(inputs)
+
+        self._record("speculated")
+        # Copy the context so tracing spans inside the retriever land in this request's trace
+        context = contextvars.copy_context()
+        future = self._get_executor(self.max_workers).submit(
+            context.run, self.retriever.invoke, question, config
+        )
+        try:
+            inputs = self.question_rewriter.rewrite_inputs(inputs)
+        except BaseException:
+            future.cancel()
+            raise
+        try:
+            speculative = future.result()
+        except Exception:
+            return self._speculation_failed(inputs)
+        return {**inputs, "speculative_context": speculative}
+
+    async def arewrite_inputs(self, inputs, config=None):
+        """Async version of rewrite_inputs()"""
+        question, chat_history = inputs["input"], inputs.get("chat_history") or []
+        if self.question_rewriter.is_resolved(question, chat_history):
+            return await self.question_rewriter.arewrite_inputs(inputs)
+
+        self._record("speculated")
+        task = asyncio.ensure_future(self.retriever.ainvoke(question, config))
+        try:
+            inputs = await self.question_rewriter.arewrite_inputs(inputs)
+        except BaseException:
+            task.cancel()
+            raise
+        try:
+            speculative = await task
+        except Exception:
+            return self._speculation_failed(inputs)
+        return {**inputs, "speculative_context": speculative}
+
+    def _speculation_failed(self, inputs):
+        """Drop a failed speculative retrieval; retrieve_inputs then retrieves for the rewrite as usual"""
+        self._record("failed")
+        logger.warning("Speculative retrieval failed; retrieving for the rewritten question", exc_info=True)
+        return inputs
+
+    def _reusable(self, inputs, speculative):
+        """The speculative documents if the rewrite barely changed the question, otherwise None"""
+        if speculative is None:
+            return None
+        if question_similarity(inputs["input"], inputs["standalone_question"]) < self.reuse_similarity:
+            return None
+        self._record("reused")
+        return speculative
+
+    def retrieve_inputs(self, inputs, config=None):
+        """
+        Chain step that adds the retrieved documents as 'context': the speculative results when
+        the rewrite barely changed the question, otherwise the rewritten question's results
+        (fused with the speculative ones if there are any)
+        Args:
+            inputs: Chain inputs with 'standalone_question'
+            config: Run config, so retrieval is traced as part of the chain
+        Returns:
+            Inputs plus 'context' and 'speculative_retrieval' ("reused", "merged" or None)
+        """
+        inputs = dict(inputs)
+        speculative = inputs.pop("speculative_context", None)
+        reused = self._reusable(inputs, speculative)
+        if reused is not None:
+            return {**inputs, "context": reused, "speculative_retrieval": "reused"}
+        documents = self.retriever.invoke(inputs["standalone_question"], config)
+        return self._merge(inputs, documents, speculative)
+
+    async def aretrieve_inputs(self, inputs, config=None):
+        """Async version of retrieve_inputs()"""
+        inputs = dict(inputs)
+        speculative = inputs.pop("speculative_context", None)
+        reused = self._reusable(inputs, speculative)
+        if reused is not None:
+            return {**inputs, "context": reused, "speculative_retrieval": "reused"}
+        documents = await self.retriever.ainvoke(inputs["standalone_question"], config)
+        return self._merge(inputs, documents, speculative)
+
+    def _merge(self, inputs, documents, speculative):
+        """Fuse the rewritten question's documents with the speculative ones (rewritten ranking first)"""
+        if speculative is None:
+            return {**inputs, "context": documents, "speculative_retrieval": None}
+        self._record("merged")
+        fused = fuse_rankings([documents, speculative], k=max(len(documents), 1))
+        return {**inputs, "context": fused, "speculative_retrieval": "merged"}
+
+    @classmethod
+    def get_stats(cls):
+        """
+        Get speculation counters
+        Returns:
+            Dictionary with speculative retrievals started, reused, merged and failed
+        """
+        with cls._stats_lock:
+            return dict(cls.stats)
@@ -0,0 +1,490 @@
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.embeddings import Embeddings
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from config.settings import (
+    TRACING_ENABLED, TRACE_HISTORY_SIZE, TRACE_LOG_ENABLED, TRACE_PROMETHEUS_PATH
+)
+
+logger = logging.getLogger("rag.tracing")
+
+# Trace and span stack of the current request (per thread / asyncio task)
+_current_trace = ContextVar("current_trace", default=None)
+_span_stack = ContextVar("span_stack", default=())
+
+
+def _reset(variable, token):
+    """Restore a context variable, tolerating generators finalized in another context"""
+    try:
+        variable.reset(token)
+    except ValueError:
+        pass
+
+
+# Chain runs reported as stages by TracingCallbackHandler (run name -> stage name)
+CHAIN_STAGES = {
+    "summarize_history": "summarize_history",
+    "rewrite_question": "rewrite_question",
+    "answer_cache_lookup": "answer_cache_lookup",
+    "generate_answer": "generate_answer",
+}
+
+
+# One traced request: timed stages plus counters such as tokens, chunks and cache hits
+class Trace:
+    def __init__(self, name, **attributes):
+        """
+        Start a trace
+        Args:
+            name: Request type (e.g. "ingest", "answer", "app_run")
+            attributes: Extra fields recorded with the trace
+        """
+        self.name = name
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.attributes = attributes
+        self.started_at = time.time()
+        self.duration_ms = None
+        self.spans = []  # {"stage", "duration_ms", "self_ms", **attributes}
+        self.counters = Counter()
+        self._lock = threading.Lock()  # Callbacks may report from worker threads
+
+    def add_span(self, stage, duration_ms, self_ms=None, **attributes):
+        """
+        Record a finished stage
+        Args:
+            stage: Stage name
+            duration_ms: Wall-clock duration in milliseconds
+            self_ms: Duration excluding nested spans (defaults to duration_ms)
+            attributes: Extra fields such as chunk counts
+        """
+        span = {
+            "stage": stage,
+            "duration_ms": round(duration_ms, 3),
+            "self_ms": round(duration_ms if self_ms is None else self_ms, 3),
+            **attributes,
+        }
+        with self._lock:
+            self.spans.append(span)
+
+    def count(self, name, value=1):
+        """
+        Increment a counter
+        Args:
+            name: Counter name (e.g. "prompt_tokens", "chunks", "answer_cache_hits")
+            value: Amount to add
+        """
+        with self._lock:
+            self.counters[name] += value
+
+    def stage_totals(self):
+        """
+        Aggregate spans by stage
+        Returns:
+            Dictionary of stage -> {"calls", "duration_ms", "self_ms"}
+        """
+        totals = {}
+        with self._lock:
+            for span in self.spans:
+                entry = totals.setdefault(span["stage"], {"calls": 0, "duration_ms": 0.0, "self_ms": 0.0})
+                entry["calls"] += 1
+                entry["duration_ms"] = round(entry["duration_ms"] + span["duration_ms"], 3)
+                entry["self_ms"] = round(entry["self_ms"] + span["self_ms"], 3)
+        return totals
+
+    def to_dict(self):
+        """
+        Serialize the trace
+        Returns:
+            JSON-serializable dictionary
+        """
+        with self._lock:
+            spans = list(self.spans)
+            counters = dict(self.counters)
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "attributes": self.attributes,
+            "stages": self.stage_totals(),
+            "counters": counters,
+            "spans": spans,
+        }
+
+
+def _numeric_leaves(figures, prefix=""):
+    """
+    Flatten a nested statistics dictionary into its numbers
+    Args:
+        figures: Dictionary of figures (nested dictionaries allowed)
+        prefix: Dotted name of the enclosing dictionary
+    Returns:
+        List of (dotted name, number) tuples, in sorted key order
+    """
+    leaves = []
+    for key, value in sorted(figures.items()):
+        name = f"{prefix}.{key}" if prefix else str(key)
+        if isinstance(value, dict):
+            leaves += _numeric_leaves(value, name)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            leaves.append((name, value))
+    return leaves
+
+
+# Process-wide tracer: timing context managers, recent traces and aggregate metrics for export
+class Tracer:
+    _recent = deque(maxlen=TRACE_HISTORY_SIZE)  # Most recent finished traces
+    _stage_totals = {}  # stage -> {"calls", "seconds", "self_seconds"}
+    _counters = Counter()  # Counter totals across all traces
+    _trace_counts = Counter()  # trace name -> finished traces
+    _stats_providers = {}  # component name -> callable returning its statistics dictionary
+    _lock = threading.Lock()
+
+    @classmethod
+    def current(cls):
+        """Get the trace of the current request, if any"""
+        return _current_trace.get()
+
+    @classmethod
+    @contextmanager
+    def trace(cls, name, **attributes):
+        """
+        Trace a request; nested inside an active trace this is just a span of it
+        Args:
+            name: Request type
+            attributes: Extra fields recorded with the trace
+        Yields:
+            The active Trace (None when tracing is disabled)
+        """
+        if not TRACING_ENABLED:
+            yield None
+            return
+        active = _current_trace.get()
+        if active is not None:
+            with cls.span(name, **attributes):
+                yield active
+            return
+
+        trace = Trace(name, **attributes)
+        trace_token = _current_trace.set(trace)
+        stack_token = _span_stack.set(())
+        start = time.perf_counter()
+        try:
+            yield trace
+        finally:
+            trace.duration_ms = round((time.perf_counter() - start) * 1000, 3)
+            _reset(_span_stack, stack_token)
+            _reset(_current_trace, trace_token)
+            cls._finish(trace)
+
+    @classmethod
+    @contextmanager
+    def span(cls, stage, **attributes):
+        """
+        Time a stage of the current trace
+        Args:
+            stage: Stage name
+            attributes: Extra fields such as chunk counts
+        Yields:
+            Dictionary of attributes; keys added inside the block are recorded too
+        """
+        trace = _current_trace.get() if TRACING_ENABLED else None
+        if trace is None:
+            yield attributes
+            return
+
+        # Nested spans add their time to the parent so each span also reports its own (self) time
+        child_ms = [0.0]
+        parent_stack = _span_stack.get()
+        stack_token = _span_stack.set(parent_stack + (child_ms,))
+        start = time.perf_counter()
+        try:
+            yield attributes
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            _reset(_span_stack, stack_token)
+            if parent_stack:
+                parent_stack[-1][0] += duration_ms
+            trace.add_span(stage, duration_ms, duration_ms - child_ms[0], **attributes)
+
+    @classmethod
+    def iter_spans(cls, stage, iterable):
+        """
+        Time each step of an iterator (e.g. pages parsed lazily) as a span
+        Args:
+            stage: Stage name
+            iterable: Iterable to consume
+        Yields:
+            The items of the iterable
+        """
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            trace = _current_trace.get() if TRACING_ENABLED else None
+            if trace is not None:
+                trace.add_span(stage, (time.perf_counter() - start) * 1000)
+            yield item
+
+    @classmethod
+    def count(cls, name, value=1):
+        """
+        Increment a counter on the current trace (no-op outside a trace)
+        Args:
+            name: Counter name
+            value: Amount to add
+        """
+        trace = _current_trace.get() if TRACING_ENABLED else None
+        if trace is not None and value:
+            trace.count(name, value)
+
+    @classmethod
+    def _finish(cls, trace):
+        """Aggregate a finished trace and export it"""
+        with cls._lock:
+            cls._recent.append(trace)
+            cls._trace_counts[trace.name] += 1
+            for stage, totals in trace.stage_totals().items():
+                entry = cls._stage_totals.setdefault(stage, {"calls": 0, "seconds": 0.0, "self_seconds": 0.0})
+                entry["calls"] += totals["calls"]
+                entry["seconds"] += totals["duration_ms"] / 1000
+                entry["self_seconds"] += totals["self_ms"] / 1000
+            cls._counters.update(trace.counters)
+
+        if TRACE_LOG_ENABLED:
+            # One JSON object per line for log shippers
+            logger.info(json.dumps(trace.to_dict(), default=str))
+        if TRACE_PROMETHEUS_PATH:
+            cls.write_prometheus(TRACE_PROMETHEUS_PATH)
+
+    @classmethod
+    def recent(cls, name=None):
+        """
+        Get recently finished traces, newest first
+        Args:
+            name: Only return traces with this name
+        Returns:
+            List of Trace objects
+        """
+        with cls._lock:
+            traces = list(cls._recent)
+        return [trace for trace in reversed(traces) if name is None or trace.name == name]
+
+    @classmethod
+    def get_stats(cls):
+        """
+        Get aggregate metrics across all finished traces
+        Returns:
+            Dictionary with per-stage call counts and seconds, counter totals and trace counts
+        """
+        with cls._lock:
+            return {
+                "stages": {
+                    stage: {key: round(value, 6) for key, value in entry.items()}
+                    for stage, entry in cls._stage_totals.items()
+                },
+                "counters": dict(cls._counters),
+                "traces": dict(cls._trace_counts),
+            }
+
+    @classmethod
+    def register_stats(cls, component, provider):
+        """
+        Register a component's statistics for the debug panel and the metrics export
+        Args:
+            component: Component name, e.g. "embeddings"
+            provider: Callable returning a (possibly nested) dictionary of figures
+        """
+        with cls._lock:
+            cls._stats_providers[component] = provider
+
+    @classmethod
+    def component_stats(cls):
+        """
+        Collect the statistics of every registered component
+        Returns:
+            Dictionary of component name -> statistics
+        """
+        with cls._lock:
+            providers = dict(cls._stats_providers)
+        return {component: provider() for component, provider in sorted(providers.items())}
+
+    @classmethod
+    def prometheus_text(cls):
+        """
+        Render aggregate metrics in the Prometheus text exposition format
+        Returns:
+            Metrics text
+        """
+        stats = cls.get_stats()
+        lines = [
+            "# HELP rag_stage_calls_total Number of times a pipeline stage ran.",
+            "# TYPE rag_stage_calls_total counter",
+        ]
+        lines += [f'rag_stage_calls_total{{stage="{stage}"}} {entry["calls"]}'
+                  for stage, entry in sorted(stats["stages"].items())]
+        lines += [
+            "# HELP rag_stage_seconds_total Wall-clock time spent in a pipeline stage.",
+            "# TYPE rag_stage_seconds_total counter",
+        ]
+        lines += [f'rag_stage_seconds_total{{stage="{stage}"}} {entry["seconds"]:.6f}'
+                  for stage, entry in sorted(stats["stages"].items())]
+        lines += [
+            "# HELP rag_stage_self_seconds_total Time spent in a pipeline stage excluding nested stages.",
+            "# TYPE rag_stage_self_seconds_total counter",
+        ]
+        lines += [f'rag_stage_self_seconds_total{{stage="{stage}"}} {entry["self_seconds"]:.6f}'
+                  for stage, entry in sorted(stats["stages"].items())]
+        lines += [
+            "# HELP rag_events_total Tokens, chunks, pages and cache hits counted by traces.",
+            "# TYPE rag_events_total counter",
+        ]
+        lines += [f'rag_events_total{{name="{name}"}} {value}'
+                  for name, value in sorted(stats["counters"].items())]
+        lines += [
+            "# HELP rag_traces_total Number of finished traces by request type.",
+            "# TYPE rag_traces_total counter",
+        ]
+        lines += [f'rag_traces_total{{name="{name}"}} {value}'
+                  for name, value in sorted(stats["traces"].items())]
+        lines += [
+            "# HELP rag_component_stat Current figures reported by components such as models and caches.",
+            "# TYPE rag_component_stat gauge",
+        ]
+        for component, figures in cls.component_stats().items():
+            lines += [f'rag_component_stat{{component="{component}",name="{name}"}} {value}'
+                      for name, value in _numeric_leaves(figures)]
+        return "\n".join(lines) + "\n"
+
+    @classmethod
+    def write_prometheus(cls, path):
+        """
+        Write the metrics to a file for a node-exporter style textfile collector
+        Args:
+            path: Destination file
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Write then rename so scrapers never read a partial file
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w") as metrics_file:
+            metrics_file.write(cls.prometheus_text())
+        os.replace(temp_path, path)
+
+    @classmethod
+    def reset(cls):
+        """Forget all recorded traces and metrics"""
+        with cls._lock:
+            cls._recent.clear()
+            cls._stage_totals.clear()
+            cls._counters.clear()
+            cls._trace_counts.clear()
+
+
+# LangChain callback handler that turns chain, retriever and LLM runs into spans of a trace
+class TracingCallbackHandler(BaseCallbackHandler):
+    run_inline = True  # Cheap bookkeeping; no need for a thread hop in async chains
+
+    def __init__(self, trace):
+        """
+        Initialize the handler
+        Args:
+            trace: Trace to record into
+        """
+        self.trace = trace
+        self._starts = {}  # run_id -> (stage, start time)
+        self._prompt_estimates = {}  # run_id -> estimated prompt tokens, used when usage is not reported
+
+    def _start(self, run_id, stage):
+        self._starts[run_id] = (stage, time.perf_counter())
+
+    def _end(self, run_id, **attributes):
+        started = self._starts.pop(run_id, None)
+        if started is not None:
+            stage, start = started
+            self.trace.add_span(stage, (time.perf_counter() - start) * 1000, **attributes)
+
+    def on_chain_start(self, serialized, inputs, *, run_id, name=None, **kwargs):
+        stage = CHAIN_STAGES.get(name)
+        if stage:
+            self._start(run_id, stage)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=type(error).__name__)
+
+    def on_retriever_start(self, serialized, query, *, run_id, **kwargs):
+        self._start(run_id, "retrieval")
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        self._end(run_id, chunks=len(documents))
+        self.trace.count("retrieved_chunks", len(documents))
+
+    def on_retriever_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=type(error).__name__)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._start(run_id, "llm")
+        self._prompt_estimates[run_id] = sum(
+            len(str(message.content)) // 4 for batch in messages for message in batch
+        )
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start(run_id, "llm")
+        self._prompt_estimates[run_id] = sum(len(prompt) // 4 for prompt in prompts)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        # Prefer provider-reported usage; fall back to a ~4 characters per token estimate
+        prompt_tokens = completion_tokens = 0
+        prompt_estimate = self._prompt_estimates.pop(run_id, 0)
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    prompt_tokens += usage.get("input_tokens", 0)
+                    completion_tokens += usage.get("output_tokens", 0)
+                else:
+                    prompt_tokens += prompt_estimate
+                    completion_tokens += len(generation.text) // 4
+        self._end(run_id, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        self.trace.count("llm_calls")
+        self.trace.count("prompt_tokens", prompt_tokens)
+        self.trace.count("completion_tokens", completion_tokens)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._prompt_estimates.pop(run_id, None)
+        self._end(run_id, error=type(error).__name__)
+
+
+# Embeddings wrapper that times each embedding call as a span of the current trace
+class TracedEmbeddings(Embeddings):
+    def __init__(self, embeddings):
+        """
+        Wrap an embedding model
+        Args:
+            embeddings: Embedding model to time
+        """
+        self.embeddings = embeddings
+
+    def embed_documents(self, texts):
+        """Embed a list of texts"""
+        with Tracer.span("embed", texts=len(texts)):
+            return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text):
+        """Embed a query"""
+        with Tracer.span("embed_query"):
+            return self.embeddings.embed_query(text)
@@ -1,5 +1,7 @@
 import streamlit as st
 from typing import List, Optional
+from config.settings import TRACE_DEBUG_PANEL, INGEST_POLL_SECONDS
+from src.tracing import Tracer
 
 # Provides all Streamlit UI elements for the app
 class UIComponents:
@@ -42,6 +44,45 @@ class UIComponents:
             accept_multiple_files=True
         )
     
+    @staticmethod
+    def create_progress_callback():
+        """
+        Show a progress bar for document ingestion
+        Returns:
+            Tuple of (progress bar element, callback(file_name, pages_done, total_pages, chunks_done))
+        """
+        progress_bar = st.progress(0.0, text="Processing documents...")
+        
+        def update(file_name, pages_done, total_pages, chunks_done):
+            fraction = min(pages_done / total_pages, 1.0) if total_pages else 1.0
+            progress_bar.progress(
+                fraction,
+                text=f"{file_name}: page {pages_done}/{total_pages} ({chunks_done} chunks)"
+            )
+        
+        return progress_bar, update
+    
+    @staticmethod
+    @st.fragment(run_every=INGEST_POLL_SECONDS)
+    def display_ingestion_progress(job):
+        """
+        Show live progress of a background ingestion job; only this fragment refreshes while
+        the job runs, and the whole page reruns once it finishes so the new index is picked up
+        Args:
+            job: IngestionJob to display
+        """
+        if job.finished:
+            st.rerun()
+        snapshot = job.snapshot()
+        files = ", ".join(
+            f"{name} {entry['pages_done']}/{entry['total_pages'] or '?'} pages"
+            for name, entry in snapshot["files"].items()
+        )
+        label = "Cancelling..." if snapshot["cancelling"] else f"Indexing documents: {files}"
+        st.progress(snapshot["fraction"], text=f"{label} ({snapshot['chunks_done']} chunks)")
+        if not snapshot["cancelling"] and st.button("Cancel indexing", key=f"cancel_{job.id}"):
+            job.cancel()
+    
     @staticmethod
     def get_user_question() -> Optional[str]:
         """
@@ -60,6 +101,72 @@ class UIComponents:
         """
         st.write("Assistant:", response['answer'])
     
+    @staticmethod
+    def display_streaming_response(response_stream) -> dict:
+        """
+        Render the AI response progressively as tokens arrive
+        Args:
+            response_stream: Iterator from RAGChain.stream_response
+        Returns:
+            Response dictionary with the full 'answer', the retrieved 'context' and 'llm_calls'
+        """
+        placeholder = st.empty()
+        answer = ""
+        context = []
+        llm_calls = None
+        for chunk in response_stream:
+            if "context" in chunk:
+                context = chunk["context"]
+            if "answer" in chunk:
+                answer += chunk["answer"]
+                # Cursor marker shows the answer is still being generated
+                placeholder.write(f"Assistant: {answer}▌")
+            if "llm_calls" in chunk:
+                llm_calls = chunk["llm_calls"]
+        placeholder.write(f"Assistant: {answer}")
+        return {"answer": answer, "context": context, "llm_calls": llm_calls}
+    
+    @staticmethod
+    def show_debug_toggle() -> bool:
+        """
+        Sidebar switch for the debug panel
+        Returns:
+            True if the debug panel should be shown
+        """
+        return st.sidebar.checkbox("Show debug panel", value=TRACE_DEBUG_PANEL, key="show_debug_panel")
+    
+    @staticmethod
+    def display_debug_panel(trace, corpus_stats=None):
+        """
+        Display per-stage timings and counters of a trace in the sidebar
+        Args:
+            trace: Trace of the current rerun
+            corpus_stats: Optional size figures of the shared document index
+        """
+        with st.sidebar.expander("🔍 Debug: last run", expanded=True):
+            st.caption(f"Total: {trace.duration_ms:.1f} ms (trace {trace.trace_id})")
+            stages = trace.stage_totals()
+            if stages:
+                st.dataframe(
+                    [{"stage": stage, **totals} for stage, totals in stages.items()],
+                    hide_index=True
+                )
+            if trace.counters:
+                st.json(dict(trace.counters))
+            if corpus_stats:
+                st.caption("Shared document index")
+                st.json(corpus_stats)
+            component_stats = Tracer.component_stats()
+            if component_stats:
+                st.caption("Models and caches")
+                st.json(component_stats)
+            st.download_button(
+                "Download Prometheus metrics",
+                Tracer.prometheus_text(),
+                file_name="rag_metrics.prom",
+                mime="text/plain"
+            )
+    
     @staticmethod
     def display_chat_history_sidebar(session_history, session_id: str = "default_session"):
         """
@@ -0,0 +1,26 @@
+import pytest
+import src.document_processor as document_processor
+from src.fakes import FakeEmbeddings, make_synthetic_pdf
+from src.serving import InMemoryFile
+
+
+@pytest.fixture
+def embeddings():
+    """Small deterministic embedding model"""
+    return FakeEmbeddings(size=64)
+
+
+@pytest.fixture
+def processor(embeddings, monkeypatch):
+    """DocumentProcessor over fake embeddings with the in-process NumPy vector store"""
+    monkeypatch.setattr(document_processor, "VECTOR_STORE_BACKEND", "numpy")
+    return document_processor.DocumentProcessor(embeddings=embeddings)
+
+
+@pytest.fixture
+def make_upload():
+    """Factory for in-memory PDF uploads whose pages mention 'PN-<index><page>'"""
+    def make(index, pages=3):
+        texts = [f"file {index} page {page} refund policy PN-{index}{page} " * 50 for page in range(pages)]
+        return InMemoryFile(f"f{index}.pdf", make_synthetic_pdf(texts))
+    return make
@@ -0,0 +1,111 @@
+import pytest
+from src.answer_cache import SemanticAnswerCache
+from src.document_processor import DocumentProcessor
+from src.tracing import Tracer
+
+
+def _vector(*values):
+    return list(values) + [0.0] * (4 - len(values))
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("src.answer_cache.time.time", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def cache(clock):
+    return SemanticAnswerCache(max_entries=3, ttl_seconds=100, similarity_threshold=0.95, sweep_interval=10)
+
+
+def _store(cache, corpus, index, *vector):
+    cache.store(corpus, f"question {index}", _vector(*vector), f"answer {index}", [])
+
+
+def test_hit_requires_similar_question_over_same_corpus(cache):
+    _store(cache, "corpus-a", 1, 1.0, 0.0)
+    hit = cache.lookup("corpus-a", _vector(1.0, 0.1))
+    assert hit["answer"] == "answer 1" and hit["similarity"] > 0.95
+    assert cache.lookup("corpus-a", _vector(0.0, 1.0)) is None
+    assert cache.lookup("corpus-b", _vector(1.0, 0.0)) is None
+    stats = cache.get_stats()
+    assert (stats["lookups"], stats["hits"], stats["hit_rate"]) == (3, 1, 0.333)
+
+
+def test_expired_answers_never_match_and_are_swept(cache, clock):
+    _store(cache, "corpus-a", 1, 1.0)
+    clock[0] += 50
+    _store(cache, "corpus-a", 2, 0.0, 1.0)
+    clock[0] += 55  # The first answer is past its TTL, the second is not
+    assert cache.lookup("corpus-a", _vector(1.0)) is None
+    assert cache.lookup("corpus-a", _vector(0.0, 1.0))["answer"] == "answer 2"
+    # The lookup swept the expired entry (the last sweep was more than 10 s ago)
+    assert cache.get_stats()["entries"] == 1
+    assert cache.stats["expirations"] == 1
+
+
+def test_sweep_is_rate_limited(cache, clock):
+    _store(cache, "corpus-a", 1, 1.0)
+    clock[0] += 101
+    cache.lookup("corpus-a", _vector(0.0, 1.0))  # Sweeps entry 1
+    _store(cache, "corpus-a", 2, 1.0)
+    clock[0] += 5
+    _store(cache, "corpus-a", 3, 0.0, 1.0)
+    clock[0] += 96  # Entry 2 is 101 s old, entry 3 only 96 s
+    cache.lookup("corpus-a", _vector(0.0, 0.0, 1.0))  # Sweeps entry 2
+    assert cache.stats["expirations"] == 2
+    clock[0] += 5  # Entry 3 expires now, within 10 s of the last sweep
+    assert cache.lookup("corpus-a", _vector(0.0, 1.0)) is None
+    assert cache.get_stats()["entries"] == 1
+    clock[0] += 10
+    cache.lookup("corpus-a", _vector(0.0, 1.0))
+    assert cache.get_stats()["entries"] == 0
+
+
+def test_least_recently_used_answer_is_evicted(cache):
+    _store(cache, "corpus-a", 1, 1.0)
+    _store(cache, "corpus-a", 2, 0.0, 1.0)
+    _store(cache, "corpus-b", 3, 0.0, 0.0, 1.0)
+    assert cache.lookup("corpus-a", _vector(1.0))["answer"] == "answer 1"  # Refresh the oldest
+    _store(cache, "corpus-b", 4, 0.0, 0.0, 0.0, 1.0)
+    assert cache.stats["evictions"] == 1
+    assert cache.lookup("corpus-a", _vector(0.0, 1.0)) is None
+    assert cache.lookup("corpus-a", _vector(1.0))["answer"] == "answer 1"
+    assert cache.lookup("corpus-b", _vector(0.0, 0.0, 1.0))["answer"] == "answer 3"
+
+
+def _corpus(*uploads):
+    return DocumentProcessor.corpus_fingerprint(
+        {DocumentProcessor.compute_file_hash(upload): upload for upload in uploads}
+    )
+
+
+def test_reindexed_corpus_does_not_reuse_old_answers(cache, make_upload):
+    before = _corpus(make_upload(0))
+    after = _corpus(make_upload(0), make_upload(1))
+    assert before != after
+    _store(cache, before, 1, 1.0)
+    assert cache.lookup(after, _vector(1.0)) is None
+
+    cache.invalidate(before)
+    assert cache.lookup(before, _vector(1.0)) is None
+    assert cache.get_stats()["entries"] == 0
+
+
+def test_invalidate_one_corpus_or_all(cache):
+    _store(cache, "corpus-a", 1, 1.0)
+    _store(cache, "corpus-b", 2, 1.0)
+    cache.invalidate("corpus-a")
+    assert cache.lookup("corpus-a", _vector(1.0)) is None
+    assert cache.lookup("corpus-b", _vector(1.0))["answer"] == "answer 2"
+    cache.invalidate()
+    assert cache.lookup("corpus-b", _vector(1.0)) is None
+
+
+def test_shared_cache_stats_are_registered(monkeypatch):
+    monkeypatch.setattr(SemanticAnswerCache, "_shared", None)
+    assert Tracer.component_stats()["answer_cache"] == {}
+    SemanticAnswerCache.get_shared().lookup("corpus-a", _vector(1.0))
+    assert Tracer.component_stats()["answer_cache"]["lookups"] == 1
@@ -0,0 +1,16 @@
+from langchain_core.documents import Document
+from src.context_packer import ContextPacker
+
+
+def test_fit_budget_trims_last_passage_at_word_boundary():
+    packer = ContextPacker(token_budget=100, use_mmr=False)
+    packed = packer.fit_budget([Document(page_content="a" * 200), Document(page_content="word " * 200)])
+    assert len(packed) == 2
+    assert packed[1].page_content.endswith("word")
+    assert len(packed[1].page_content) <= 50 * 4
+
+
+def test_fit_budget_skips_all_whitespace_prefix():
+    packer = ContextPacker(token_budget=100, use_mmr=False)
+    packed = packer.fit_budget([Document(page_content="a" * 200), Document(page_content=" " * 1000 + "tail")])
+    assert [d.page_content for d in packed] == ["a" * 200]
@@ -0,0 +1,93 @@
+import pytest
+from src.corpus_registry import CorpusRegistry
+from src.sharded_index import ShardedVectorStore
+
+
+def _file_names(documents):
+    return {document.metadata["file_name"] for document in documents}
+
+
+def test_sessions_share_indexed_documents(processor, make_upload):
+    registry = CorpusRegistry(processor)
+    _, _, _, changes_a = registry.sync_session("A", [make_upload(0), make_upload(1)])
+    _, retriever_b, indexed_b, changes_b = registry.sync_session("B", [make_upload(1), make_upload(2)])
+
+    assert changes_a["shared"] == []
+    assert changes_b["shared"] == ["f1.pdf"]
+    assert registry.stats == {"files_indexed": 3, "files_shared": 1, "files_evicted": 0}
+    assert sorted(entry["name"] for entry in indexed_b.values()) == ["f1.pdf", "f2.pdf"]
+    # A session only retrieves its own documents from the shared store
+    assert _file_names(retriever_b.invoke("PN-01 refund policy")) <= {"f1.pdf", "f2.pdf"}
+
+    stats = registry.memory_stats()
+    assert stats["files"] == 3 and stats["sessions"] == 2
+    assert stats["chunks_saved_by_sharing"] == len(indexed_b[processor.compute_file_hash(make_upload(1))]["chunk_ids"])
+
+
+def test_release_and_evict(processor, make_upload):
+    registry = CorpusRegistry(processor, max_unreferenced_files=1)
+    registry.sync_session("A", [make_upload(0), make_upload(1)])
+    registry.sync_session("B", [make_upload(1)])
+    chunks_before = len(registry.vectorstore.get()["ids"])
+
+    # f0 loses its only reference but fits in the unreferenced budget
+    registry.release_session("A")
+    assert registry.stats["files_evicted"] == 0
+    assert len(registry.vectorstore.get()["ids"]) == chunks_before
+
+    # f1 stays referenced by B; f0 is the least recently released and goes once f2 is dropped too
+    registry.sync_session("C", [make_upload(2)])
+    registry.release_session("C")
+    assert registry.stats["files_evicted"] == 1
+    remaining = {m["file_name"] for m in registry.vectorstore.get(include=["metadatas"])["metadatas"]}
+    assert remaining == {"f1.pdf", "f2.pdf"}
+    assert registry.memory_stats()["referenced_files"] == 1
+
+
+def test_reacquire_unreferenced_document_without_reindexing(processor, make_upload):
+    registry = CorpusRegistry(processor, max_unreferenced_files=1)
+    registry.sync_session("A", [make_upload(0)])
+    registry.release_session("A")
+    _, _, _, changes = registry.sync_session("B", [make_upload(0)])
+    assert changes["shared"] == ["f0.pdf"]
+    assert registry.stats["files_indexed"] == 1
+
+
+def test_failed_sync_gives_references_back(processor, make_upload, monkeypatch):
+    registry = CorpusRegistry(processor, max_unreferenced_files=0)
+    registry.sync_session("A", [make_upload(0)])
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("embedding failed")
+        yield
+
+    monkeypatch.setattr(processor, "iter_index_files", fail)
+    with pytest.raises(RuntimeError):
+        registry.sync_session("B", [make_upload(0), make_upload(1)])
+    # B's reference to the shared f0 was dropped again, A's is kept
+    assert registry.memory_stats()["referenced_files"] == 1
+    assert registry._files[processor.compute_file_hash(make_upload(0))]["refcount"] == 1
+    assert registry._indexing == {}
+
+
+def test_persistent_store_adopts_documents_and_never_evicts(processor, embeddings, make_upload, tmp_path):
+    path = str(tmp_path / "library")
+    registry = CorpusRegistry(processor, max_unreferenced_files=0)
+    registry.vectorstore = ShardedVectorStore(embeddings, path, shard_size=16)
+    registry.sync_session("A", [make_upload(0)])
+    registry.release_session("A")
+    assert registry.stats["files_evicted"] == 0
+    chunk_count = len(registry.vectorstore)
+    registry.vectorstore.close()
+
+    # A new process finds the document on disk instead of embedding it again
+    restarted = CorpusRegistry(processor)
+    restarted.vectorstore = ShardedVectorStore(embeddings, path)
+    try:
+        _, retriever, indexed_files, changes = restarted.sync_session("B", [make_upload(0)])
+        assert changes["shared"] == ["f0.pdf"]
+        assert restarted.stats["files_indexed"] == 0
+        assert len(next(iter(indexed_files.values()))["chunk_ids"]) == chunk_count
+        assert _file_names(retriever.invoke("PN-01 refund")) == {"f0.pdf"}
+    finally:
+        restarted.vectorstore.close()
@@ -0,0 +1,71 @@
+import pytest
+from src.embedding_cache import CachedEmbeddings
+from src.fakes import FakeEmbeddings
+
+
+class CountingEmbeddings(FakeEmbeddings):
+    """FakeEmbeddings that counts the texts it embeds"""
+
+    def __init__(self):
+        super().__init__(size=8)
+        self.embedded = 0
+
+    def embed_documents(self, texts):
+        self.embedded += len(texts)
+        return super().embed_documents(texts)
+
+
+@pytest.fixture
+def make_cache(tmp_path):
+    def make(max_entries=100, model=None):
+        return CachedEmbeddings(model or CountingEmbeddings(), "fake", str(tmp_path / "cache.sqlite"), max_entries)
+    return make
+
+
+def _row_count(cache):
+    return cache._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+
+def test_hits_and_misses(make_cache):
+    model = CountingEmbeddings()
+    cache = make_cache(model=model)
+    first = cache.embed_documents(["alpha", "beta", "alpha"])
+    second = cache.embed_documents(["beta", "gamma"])
+    assert model.embedded == 3  # alpha, beta, gamma, each once
+    assert first[1] == second[0]
+    stats = cache.get_stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (2, 3, 3)
+
+
+def test_evicts_least_recently_used_down_to_90_percent(make_cache):
+    cache = make_cache(max_entries=20)
+    cache.embed_documents([f"old {i}" for i in range(10)])
+    cache.embed_documents([f"new {i}" for i in range(10)])
+    cache.embed_documents([f"old {i}" for i in range(5)])  # Refresh the first five old texts
+    assert cache.evictions == 0
+
+    cache.embed_documents(["one more"])
+    assert _row_count(cache) == 18
+    assert cache.evictions == 3
+    # The least recently used texts went first: old 5, 6 and 7
+    model = cache.embeddings
+    before = model.embedded
+    cache.embed_documents([f"old {i}" for i in range(5)] + ["old 8", "old 9", "one more"])
+    assert model.embedded == before
+    cache.embed_documents(["old 5"])
+    assert model.embedded == before + 1
+
+
+def test_running_count_is_an_upper_bound_after_replace(make_cache):
+    cache = make_cache(max_entries=10)
+    cache.embed_documents([f"text {i}" for i in range(9)])
+    # Another process wrote the same vectors meanwhile: INSERT OR REPLACE adds no rows
+    cache._store({CachedEmbeddings.hash_text(f"text {i}"): [0.0] * 8 for i in range(5)})
+    assert cache._entries >= _row_count(cache) == 9
+    assert cache.evictions == 0  # The exact recount found nothing to evict
+    assert cache._entries == 9
+
+
+def test_running_count_survives_reopen(make_cache):
+    make_cache().embed_documents([f"text {i}" for i in range(7)])
+    assert make_cache()._entries == 7
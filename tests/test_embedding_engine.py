@@ -0,0 +1,85 @@
+from langchain_core.embeddings import Embeddings
+import numpy as np
+import pytest
+from src.embedding_engine import EmbeddingEngine
+
+
+class RecordingEmbeddings(Embeddings):
+    """Unnormalized vectors that identify their text, plus a log of the batches received"""
+
+    def __init__(self):
+        self.batches = []
+
+    @staticmethod
+    def _vector(text):
+        return [float(len(text)), 3.0, float(text.count("x"))]
+
+    def embed_documents(self, texts):
+        self.batches.append(list(texts))
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._vector(text)
+
+
+@pytest.fixture
+def texts():
+    # Mixed lengths in no particular order: 1 to 200 estimated tokens (4 characters each)
+    lengths = [3, 200, 17, 1, 120, 64, 9, 150, 33, 2, 80, 5, 45, 190, 12, 7]
+    return [f"{index:02d}" + "x" * (4 * length - 2) for index, length in enumerate(lengths)]
+
+
+def _engine(model, **kwargs):
+    return EmbeddingEngine(model, **{"max_batch_size": 4, "batch_tokens": 400, "max_seq_tokens": 512,
+                                     "threads": 1, **kwargs})
+
+
+def test_batches_cover_every_text_within_the_token_budget(texts):
+    engine = _engine(RecordingEmbeddings())
+    lengths = engine.token_lengths(texts)
+    batches = engine.plan_batches(texts)
+    assert sorted(index for batch in batches for index in batch) == list(range(len(texts)))
+    for batch in batches:
+        assert len(batch) <= engine.max_batch_size
+        # Padded size: every text is padded to the longest, which comes first
+        assert lengths[batch[0]] == max(lengths[i] for i in batch)
+        assert len(batch) == 1 or len(batch) * lengths[batch[0]] <= engine.batch_tokens
+    # Longest first, so similar lengths share a batch
+    firsts = [lengths[batch[0]] for batch in batches]
+    assert firsts == sorted(firsts, reverse=True)
+
+
+def test_truncated_texts_are_budgeted_at_the_model_limit(texts):
+    engine = _engine(RecordingEmbeddings(), max_seq_tokens=100, batch_tokens=300)
+    assert max(engine.token_lengths(texts)) == 100
+    assert [len(batch) for batch in engine.plan_batches(texts)][:2] == [3, 3]
+
+
+def test_vectors_come_back_in_input_order_and_normalized(texts):
+    model = RecordingEmbeddings()
+    vectors = np.array(_engine(model).embed_documents(texts))
+    expected = np.array([model._vector(text) for text in texts])
+    expected /= np.linalg.norm(expected, axis=1, keepdims=True)
+    np.testing.assert_allclose(vectors, expected, rtol=1e-6)
+    assert len(model.batches) > 1
+    # Batches reached the model longest first
+    assert len(model.batches[0][0]) == max(len(text) for text in texts)
+
+    query = _engine(model).embed_query(texts[3])
+    np.testing.assert_allclose(query, expected[3], rtol=1e-6)
+
+
+def test_normalization_can_be_turned_off(texts):
+    model = RecordingEmbeddings()
+    vectors = _engine(model, normalize=False).embed_documents(texts[:3])
+    assert vectors == [model._vector(text) for text in texts[:3]]
+
+
+def test_stats_count_chunks_and_padding(texts):
+    engine = _engine(RecordingEmbeddings())
+    engine.embed_documents(texts)
+    stats = engine.get_stats()
+    assert stats["chunks"] == len(texts)
+    assert stats["batches"] == len(engine.plan_batches(texts))
+    assert 0 < stats["padding_efficiency"] <= 1
+    assert engine.embed_documents([]) == []
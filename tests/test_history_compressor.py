@@ -0,0 +1,86 @@
+from langchain_community.chat_message_histories import ChatMessageHistory
+from langchain_core.messages import AIMessage, HumanMessage
+import asyncio
+import pytest
+from src.fakes import StubChatModel
+from src.history_compressor import HistoryCompressor, SUMMARY_PREFIX
+from src.session_store import SQLiteSessionStore, StoredChatMessageHistory
+
+
+def _turn(index):
+    return [HumanMessage(content=f"question {index} " + "word " * 40), AIMessage(content=f"answer {index} " + "word " * 40)]
+
+
+@pytest.fixture
+def compressor():
+    HistoryCompressor._states.clear()
+    yield HistoryCompressor(StubChatModel(), token_budget=100, keep_turns=1, max_sessions=2)
+    HistoryCompressor._states.clear()
+
+
+def _ask(compressor, history, session_id="default_session"):
+    return compressor.compress(history.messages, session_id, history)
+
+
+def test_summary_survives_sliding_window(compressor, tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.sqlite"), pool_size=1)
+    history = StoredChatMessageHistory("default_session", store, window=6)
+    calls = []
+    for index in range(8):
+        history.add_messages(_turn(index))
+        _, _, llm_calls = _ask(compressor, history)
+        calls.append(llm_calls)
+    # Only the turn that does not fit the budget is folded each time; the summary is never rebuilt
+    assert calls[0] == 0 and all(calls[1:])
+    messages, _, llm_calls = _ask(compressor, history)
+    assert llm_calls == 0
+    assert messages[0].content.startswith(SUMMARY_PREFIX)
+    assert [m.content.split()[1] for m in messages[1:]] == ["7", "7"]
+
+    # A fresh history object over the same store (another tab or a restart) reuses the summary
+    reloaded = StoredChatMessageHistory("default_session", store, window=6)
+    assert _ask(compressor, reloaded)[2] == 0
+
+
+def test_cleared_history_resets_summary(compressor, tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.sqlite"), pool_size=1)
+    history = StoredChatMessageHistory("s", store, window=6)
+    for index in range(3):
+        history.add_messages(_turn(index))
+        _ask(compressor, history, "s")
+    history.clear()
+    history.add_messages(_turn(9))
+    messages, _, _ = _ask(compressor, history, "s")
+    assert [m.type for m in messages] == ["human", "ai"]
+
+
+def test_in_memory_histories_under_one_session_id_are_separate(compressor):
+    first, second = ChatMessageHistory(), ChatMessageHistory()
+    for index in range(3):
+        first.add_messages(_turn(index))
+        _ask(compressor, first)
+    second.add_messages(_turn(5))
+    messages, _, _ = _ask(compressor, second)
+    assert [m.type for m in messages] == ["human", "ai"]
+    assert _ask(compressor, first)[0][0].content.startswith(SUMMARY_PREFIX)
+
+
+def test_states_are_bounded(compressor):
+    histories = [ChatMessageHistory() for _ in range(3)]
+    for history in histories:
+        for index in range(3):
+            history.add_messages(_turn(index))
+            _ask(compressor, history)
+    assert len(HistoryCompressor._states) == 2
+
+
+def test_async_compression_matches_sync(compressor):
+    history = ChatMessageHistory()
+    for index in range(4):
+        history.add_messages(_turn(index))
+    expected = _ask(compressor, history)
+    HistoryCompressor._states.clear()
+    compressed = asyncio.run(compressor.acompress(history.messages, "default_session", history))
+    assert compressed == expected and compressed[2] == 1
+    # The async path records the summary too
+    assert asyncio.run(compressor.acompress(history.messages, "default_session", history))[2] == 0
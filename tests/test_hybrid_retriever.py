@@ -0,0 +1,55 @@
+from langchain_core.documents import Document
+import pytest
+from src.hybrid_retriever import BM25Index, HybridRetriever, fuse_rankings
+from src.numpy_vector_store import NumpyVectorStore
+
+
+@pytest.fixture
+def indexed(embeddings):
+    documents = [
+        Document(page_content=f"section {i} of the manual covers {'error ERR-404' if i % 5 == 0 else 'setup'}",
+                 metadata={"file_hash": f"h{i % 2}"})
+        for i in range(20)
+    ]
+    ids = [f"c{i}" for i in range(20)]
+    store = NumpyVectorStore(embeddings)
+    store.add_documents(documents, ids=ids)
+    index = BM25Index()
+    index.add(ids, documents)
+    return store, index
+
+
+def test_search_loads_documents_from_the_store(indexed):
+    store, index = indexed
+    results = index.search("ERR-404", k=3, vectorstore=store)
+    assert [d.id for d, _ in results] and all("ERR-404" in d.page_content for d, _ in results)
+    assert not hasattr(index, "_documents")
+
+
+def test_search_with_filter(indexed):
+    store, index = indexed
+    results = index.search("err-404", k=2, filter={"file_hash": "h1"}, vectorstore=store)
+    assert sorted(d.id for d, _ in results) == ["c15", "c5"]
+
+
+def test_removed_and_missing_chunks_are_skipped(indexed):
+    store, index = indexed
+    index.remove(["c0"])
+    store.delete(["c5"])
+    ids = [d.id for d, _ in index.search("ERR-404", k=10, vectorstore=store)]
+    assert ids and "c0" not in ids and "c5" not in ids
+
+
+def test_hybrid_retriever_finds_identifiers(indexed):
+    store, index = indexed
+    retriever = HybridRetriever(vectorstore=store, lexical_index=index, k=4,
+                                search_kwargs={"filter": {"file_hash": "h0"}})
+    documents = retriever.invoke("ERR-404")
+    assert {"c0", "c10"} <= {d.id for d in documents}
+    assert all(d.metadata["file_hash"] == "h0" for d in documents)
+
+
+def test_fuse_rankings_rewards_agreement():
+    a, b, c = (Document(page_content=text, id=text) for text in "abc")
+    assert fuse_rankings([[a, b, c], [b, c]], k=3) == [b, c, a]
+    assert fuse_rankings([[a], [b]], k=1) == [a]  # Earlier lists win ties
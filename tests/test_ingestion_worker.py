@@ -0,0 +1,140 @@
+import time
+import pytest
+from src.corpus_registry import CorpusRegistry
+from src.document_processor import DocumentProcessor
+from src.ingestion_worker import IngestionJob, IngestionWorker, CANCELLED, DONE, FAILED
+from src.serving import InMemoryFile
+from src.sharded_index import ShardedVectorStore
+
+
+@pytest.fixture
+def dropped(processor, monkeypatch):
+    """Vector stores the worker dropped"""
+    stores = []
+    drop_index = processor.drop_index
+    monkeypatch.setattr(processor, "drop_index", lambda store: (stores.append(store), drop_index(store)))
+    return stores
+
+
+def _wait(job, timeout=30):
+    deadline = time.time() + timeout
+    while not job.finished and time.time() < deadline:
+        time.sleep(0.01)
+    assert job.finished
+
+
+def _run(worker, uploads, vectorstore=None, indexed_files=None, on_progress=None):
+    """Run a job on the calling thread"""
+    hashes = [DocumentProcessor.compute_file_hash(upload) for upload in uploads]
+    job = IngestionJob(hashes, [upload.name for upload in uploads])
+    if on_progress is not None:
+        job.on_progress = on_progress(job)
+    worker.job = job
+    worker._run_job(job, uploads, vectorstore, dict(indexed_files or {}))
+    return job
+
+
+def _cancel_on_first_progress(job):
+    """Progress callback that cancels the job after its first page or file"""
+    def on_progress(*args):
+        job.cancel()
+    return on_progress
+
+
+def test_job_publishes_index_once(processor, make_upload):
+    worker = IngestionWorker(processor)
+    job = worker.submit([make_upload(0), make_upload(1)])
+    _wait(job)
+    assert job.status == DONE
+    assert job.snapshot()["fraction"] == 1.0
+
+    vectorstore, retriever, indexed_files, changes = worker.take_result()
+    assert sorted(changes["added"]) == ["f0.pdf", "f1.pdf"]
+    assert len(vectorstore.get()["ids"]) == sum(len(e["chunk_ids"]) for e in indexed_files.values())
+    assert worker.take_result() is None
+
+
+def test_update_leaves_published_index_untouched(processor, make_upload):
+    worker = IngestionWorker(processor)
+    published, _, indexed_files, _ = _run(worker, [make_upload(0), make_upload(1)]).result
+    published_ids = sorted(published.get()["ids"])
+
+    job = _run(worker, [make_upload(0), make_upload(2)], published, indexed_files)
+    staged, _, _, changes = job.result
+    assert changes == {"added": ["f2.pdf"], "removed": ["f1.pdf"]}
+    assert staged is not published
+    assert sorted(published.get()["ids"]) == published_ids
+
+
+def test_cancel_drops_staging_index(processor, make_upload, dropped):
+    worker = IngestionWorker(processor)
+    published, _, indexed_files, _ = _run(worker, [make_upload(0)]).result
+    published_ids = sorted(published.get()["ids"])
+
+    job = _run(worker, [make_upload(0), make_upload(1, pages=5)], published, indexed_files,
+               on_progress=_cancel_on_first_progress)
+    assert job.status == CANCELLED
+    assert worker.take_result() is None
+    assert len(dropped) == 1 and dropped[0] is not published
+    assert sorted(published.get()["ids"]) == published_ids
+
+
+def test_failure_drops_staging_index(processor, dropped):
+    worker = IngestionWorker(processor)
+    job = _run(worker, [InMemoryFile("broken.pdf", b"not a pdf")])
+    assert job.status == FAILED
+    assert job.error
+    assert len(dropped) == 1
+
+
+def test_cancelled_before_start(processor, make_upload, dropped):
+    worker = IngestionWorker(processor)
+    job = IngestionJob([], ["f0.pdf"])
+    job.cancel()
+    worker._run_job(job, [make_upload(0)], None, {})
+    assert job.status == CANCELLED
+    assert dropped == []
+
+
+def test_new_submit_supersedes_running_job(processor, make_upload):
+    worker = IngestionWorker(processor)
+    first = worker.submit([make_upload(i, pages=10) for i in range(3)])
+    second = worker.submit([make_upload(0)])
+    _wait(first)
+    _wait(second)
+    assert first.status == CANCELLED
+    assert second.status == DONE
+    assert worker.take_result()[3]["added"] == ["f0.pdf"]
+
+
+def test_registry_job_never_drops_shared_store(processor, make_upload, dropped, embeddings, tmp_path):
+    registry = CorpusRegistry(processor)
+    registry.vectorstore = ShardedVectorStore(embeddings, str(tmp_path / "library"))
+    worker = IngestionWorker(processor, corpus_registry=registry, session_key="A")
+
+    job = _run(worker, [make_upload(0), make_upload(1)], on_progress=_cancel_on_first_progress)
+    assert job.status == CANCELLED
+    assert dropped == []
+    assert registry.memory_stats()["referenced_files"] == 0
+    registry.vectorstore.close()
+
+
+def test_registry_cancel_after_sync_restores_published_files(processor, make_upload, monkeypatch):
+    registry = CorpusRegistry(processor)
+    worker = IngestionWorker(processor, corpus_registry=registry, session_key="A")
+    published, _, indexed_files, _ = _run(worker, [make_upload(0), make_upload(1)]).result
+
+    sync_session = registry.sync_session
+
+    def sync_then_cancel(*args, **kwargs):
+        result = sync_session(*args, **kwargs)
+        worker.job.cancel()  # Superseded just after the sync finished
+        return result
+
+    monkeypatch.setattr(registry, "sync_session", sync_then_cancel)
+    job = _run(worker, [make_upload(0), make_upload(2)], published, indexed_files)
+    assert job.status == CANCELLED
+    assert registry.session_view("A")[2].keys() == indexed_files.keys()
+    stats = registry.memory_stats()
+    # f1 is referenced again; f2, indexed by the cancelled job, is kept for reuse until evicted
+    assert (stats["referenced_files"], stats["unreferenced_files"]) == (2, 1)
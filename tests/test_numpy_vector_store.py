@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+from src.numpy_vector_store import NumpyVectorStore, quantize
+
+
+def _unit_rows(rows, dim=16, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(rows, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.fixture
+def store(embeddings):
+    store = NumpyVectorStore(embeddings, initial_capacity=2)
+    vectors = _unit_rows(5, dim=64)
+    store.add_embeddings(
+        [f"text {i}" for i in range(5)], vectors,
+        metadatas=[{"file_hash": f"h{i % 2}"} for i in range(5)], ids=[f"c{i}" for i in range(5)]
+    )
+    return store, vectors
+
+
+def test_int8_scales_map_the_largest_component_to_127():
+    vectors = _unit_rows(8)
+    quantized, scales = quantize(vectors, "int8")
+    assert quantized.dtype == np.int8 and scales.dtype == np.float32
+    assert np.array_equal(np.abs(quantized).max(axis=1), np.full(8, 127))
+    np.testing.assert_allclose(scales, np.abs(vectors).max(axis=1) / 127.0, rtol=1e-6)
+    # Rounding error is at most half a step per component
+    assert np.all(np.abs(quantized * scales[:, None] - vectors) <= scales[:, None] / 2 + 1e-7)
+
+    zero, zero_scales = quantize(np.zeros((1, 4), dtype=np.float32), "int8")
+    assert not zero.any() and zero_scales[0] == 1.0
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float16", "int8"])
+def test_round_trip_finds_each_vector_first(embeddings, dtype):
+    vectors = _unit_rows(50, dim=64, seed=1)
+    store = NumpyVectorStore(embeddings, dtype=dtype)
+    store.add_embeddings([f"text {i}" for i in range(50)], vectors, ids=[f"c{i}" for i in range(50)])
+    results = store.search_by_vectors(vectors, k=1)
+    assert [hits[0][0].id for hits in results] == [f"c{i}" for i in range(50)]
+    assert all(abs(hits[0][1] - 1.0) < 0.02 for hits in results)
+
+
+def test_caller_embeddings_are_not_modified(embeddings):
+    vectors = np.full((2, 4), 2.0, dtype=np.float32)
+    NumpyVectorStore(embeddings).add_embeddings(["a", "b"], vectors)
+    assert np.all(vectors == 2.0)
+
+
+def test_delete_moves_the_last_row_into_the_gap(store):
+    store, vectors = store
+    store.delete(["c1", "missing"])
+    assert len(store) == 4
+    assert store._ids == ["c0", "c4", "c2", "c3"]
+    assert store._rows == {"c0": 0, "c4": 1, "c2": 2, "c3": 3}
+    np.testing.assert_allclose(store._vectors[1], vectors[4], rtol=1e-6)
+    assert store.search_by_vectors(vectors[4], k=1)[0][0][0].page_content == "text 4"
+    assert store.get(["c1"])["ids"] == []
+
+    store.delete(["c3"])  # The last row itself
+    assert store._ids == ["c0", "c4", "c2"]
+
+
+def test_filter_masks_are_cached_until_rows_change(store):
+    store, vectors = store
+    filter = {"file_hash": {"$in": ["h1"]}}
+    assert {document.id for document, _ in store.search_by_vectors(vectors[0], k=5, filter=filter)[0]} == {"c1", "c3"}
+    assert len(store._masks) == 1
+
+    store.add_embeddings(["text 5"], _unit_rows(1, dim=64, seed=2), metadatas=[{"file_hash": "h1"}], ids=["c5"])
+    assert not store._masks
+    hits = store.search_by_vectors(vectors[0], k=5, filter=filter)[0]
+    assert {document.id for document, _ in hits} == {"c1", "c3", "c5"}
+
+    store.delete(["c3"])
+    assert not store._masks
+    hits = store.search_by_vectors(vectors[0], k=5, filter=filter)[0]
+    assert {document.id for document, _ in hits} == {"c1", "c5"}
+
+
+def test_copy_is_independent(store):
+    store, vectors = store
+    copy = store.copy()
+    copy.delete(["c0"])
+    copy.add_embeddings(["text 9"], _unit_rows(1, dim=64, seed=3), ids=["c9"])
+    assert store._ids == ["c0", "c1", "c2", "c3", "c4"]
+    assert store.search_by_vectors(vectors[0], k=1)[0][0][0].id == "c0"
+    assert sorted(copy.get()["ids"]) == ["c1", "c2", "c3", "c4", "c9"]
+    assert copy.search_by_vectors(vectors[2], k=1)[0][0][0].id == "c2"
@@ -0,0 +1,64 @@
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from collections import OrderedDict
+import pytest
+from config.settings import CONTEXTUALIZE_Q_SYSTEM_PROMPT
+from src.fakes import StubChatModel
+from src.question_rewriter import QuestionRewriter
+from src.tracing import Tracer
+
+HISTORY = [HumanMessage(content="Tell me about part PN-1"), AIMessage(content="It is a valve.")]
+
+
+@pytest.fixture
+def rewriter(monkeypatch):
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", CONTEXTUALIZE_Q_SYSTEM_PROMPT),
+        MessagesPlaceholder("chat_history"),
+        ("human", "{input}"),
+    ])
+    monkeypatch.setattr(QuestionRewriter, "_cache", OrderedDict())
+    monkeypatch.setattr(QuestionRewriter, "stats", {key: 0 for key in QuestionRewriter.stats})
+    return QuestionRewriter(StubChatModel(rewrite_suffix=" of part PN-1"), prompt)
+
+
+def test_standalone_questions_pass_through(rewriter):
+    assert rewriter.rewrite("What is the warranty period for pumps?", HISTORY) == (
+        "What is the warranty period for pumps?", 0
+    )
+    # Without history even a follow-up-looking question is left alone
+    assert rewriter.rewrite("What does it cost?", []) == ("What does it cost?", 0)
+    assert QuestionRewriter.get_stats()["skipped"] == 2
+
+
+def test_follow_up_questions_are_rewritten(rewriter):
+    assert rewriter.needs_rewrite("What does it cost?", HISTORY)
+    assert rewriter.needs_rewrite("Why?", HISTORY)  # Shorter than min_words
+    standalone, llm_calls = rewriter.rewrite("What does it cost?", HISTORY)
+    assert (standalone, llm_calls) == ("What does it cost? of part PN-1", 1)
+    inputs = rewriter.rewrite_inputs({"input": "Why?", "chat_history": HISTORY})
+    assert inputs["standalone_question"] == "Why? of part PN-1" and inputs["rewrite_llm_calls"] == 1
+
+
+def test_memo_is_keyed_by_history_digest(rewriter):
+    rewriter.rewrite("What does it cost?", HISTORY)
+    assert rewriter.is_resolved("What does it cost?", HISTORY)
+    # An equal history (new message objects) hits the memo
+    same_history = [HumanMessage(content="Tell me about part PN-1"), AIMessage(content="It is a valve.")]
+    assert rewriter.rewrite("What does it cost?", same_history) == ("What does it cost? of part PN-1", 0)
+    # A different history is a different conversation
+    other_history = HISTORY + [HumanMessage(content="And PN-2?"), AIMessage(content="A pump.")]
+    assert rewriter.history_digest(other_history) != rewriter.history_digest(HISTORY)
+    assert not rewriter.is_resolved("What does it cost?", other_history)
+    assert rewriter.rewrite("What does it cost?", other_history)[1] == 1
+
+    stats = Tracer.component_stats()["question_rewriter"]
+    assert stats == {"requests": 3, "skipped": 0, "cache_hits": 1, "llm_calls": 2, "cached_rewrites": 2}
+
+
+def test_memo_is_bounded(rewriter):
+    rewriter.cache_size = 2
+    for index in range(3):
+        rewriter.rewrite(f"What about it {index}?", HISTORY)
+    assert not rewriter.is_resolved("What about it 0?", HISTORY)
+    assert rewriter.is_resolved("What about it 2?", HISTORY)
@@ -0,0 +1,17 @@
+from collections import OrderedDict
+import src.rag_chain as rag_chain
+from src.rag_chain import RAGChain
+
+
+def test_llm_clients_are_shared_and_bounded(monkeypatch):
+    monkeypatch.setattr(RAGChain, "_llm_clients", OrderedDict())
+    monkeypatch.setattr(rag_chain, "LLM_CLIENT_CACHE_SIZE", 2)
+    first = RAGChain.get_llm("key-1")
+    assert RAGChain.get_llm("key-1") is first
+    second = RAGChain.get_llm("key-2")
+    RAGChain.get_llm("key-1")  # Most recently used again
+    RAGChain.get_llm("key-3")
+    assert len(RAGChain._llm_clients) == 2
+    assert RAGChain.get_llm("key-1") is first
+    assert RAGChain.get_llm("key-2") is not second
+    assert all("key-" not in str(key) for key in RAGChain._llm_clients)
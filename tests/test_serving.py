@@ -0,0 +1,18 @@
+import asyncio
+import time
+from src.fakes import StubChatModel
+from src.serving import ConcurrencyLimitedChatModel
+
+
+def test_llm_calls_wait_for_a_slot():
+    llm = ConcurrencyLimitedChatModel(llm=StubChatModel(delay=0.05), max_concurrency=2)
+
+    async def ask_all():
+        return await asyncio.gather(*(llm.ainvoke(f"question {index}") for index in range(6)))
+
+    start = time.perf_counter()
+    replies = asyncio.run(ask_all())
+    elapsed = time.perf_counter() - start
+    assert [reply.content for reply in replies] == [f"Stub answer to: question {index}" for index in range(6)]
+    assert elapsed >= 0.15  # Three rounds of two calls
+    assert llm.llm.call_count == 6
@@ -0,0 +1,90 @@
+from langchain_core.messages import AIMessage, HumanMessage
+import time
+import pytest
+from src.session_manager import SessionManager
+from src.session_store import SQLiteSessionStore, StoredChatMessageHistory
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SQLiteSessionStore(str(tmp_path / "sessions.sqlite"), pool_size=2, idle_seconds=3600, max_cached_sessions=2)
+
+
+def _exchange(index):
+    return [HumanMessage(content=f"question {index}"), AIMessage(content=f"answer {index}")]
+
+
+def test_messages_round_trip_with_row_ids(store):
+    messages = _exchange(0)
+    store.append("s1", messages)
+    loaded = store.load_recent("s1", limit=10)
+    assert [message.content for message in loaded] == ["question 0", "answer 0"]
+    assert [message.id for message in loaded] == [message.id for message in messages]
+    assert isinstance(loaded[1], AIMessage)
+    assert store.load_recent("s2", limit=10) == []
+
+
+def test_load_recent_pages_back_from_the_newest(store):
+    for index in range(5):
+        store.append("s1", _exchange(index))
+    page = store.load_recent("s1", limit=4)
+    assert [message.content for message in page] == ["question 3", "answer 3", "question 4", "answer 4"]
+    older = store.load_recent("s1", limit=4, before_id=page[0].id)
+    assert [message.content for message in older] == ["question 1", "answer 1", "question 2", "answer 2"]
+
+
+def test_history_keeps_only_a_window_in_memory(store):
+    for index in range(3):
+        store.append("s1", _exchange(index))
+    history = StoredChatMessageHistory("s1", store, window=4)
+    assert [message.content for message in history.messages] == [
+        "question 1", "answer 1", "question 2", "answer 2"
+    ]
+    history.add_messages(_exchange(3))
+    assert [message.content for message in history.messages] == [
+        "question 2", "answer 2", "question 3", "answer 3"
+    ]
+    # Everything stays in the store
+    assert len(store.load_recent("s1", limit=100)) == 8
+
+
+def test_histories_are_cached_and_evicted(store, monkeypatch):
+    first = store.get_history("s1")
+    assert store.get_history("s1") is first
+    store.get_history("s2")
+    store.get_history("s3")  # Over the cap of two: the least recently used (s1) goes
+    assert store.cached_session_count() == 2
+    assert store.get_history("s1") is not first
+
+    now = [time.time()]
+    monkeypatch.setattr("src.session_store.time.time", lambda: now[0])
+    store.get_history("s4")
+    assert store.cached_session_count() == 2
+    now[0] += 3601
+    store.get_history("s4")  # Every other history has been idle too long
+    assert store.cached_session_count() == 1
+
+
+def test_clear_removes_messages_and_cached_history(store):
+    store.get_history("s1").add_messages(_exchange(0))
+    store.append("s2", _exchange(1))
+    assert sorted(store.list_sessions()) == ["s1", "s2"]
+    store.clear("s1")
+    assert store.list_sessions() == ["s2"]
+    assert store.get_history("s1").messages == []
+    store.clear_all()
+    assert store.list_sessions() == []
+
+
+def test_all_sessions_come_from_the_store_cache(store):
+    manager = SessionManager(store={}, backend="memory")
+    manager.backend = store
+    manager.get_session_history("s1").add_messages(_exchange(0))
+    store.append("s2", _exchange(1))
+
+    sessions = manager.get_all_sessions()
+    assert sorted(sessions) == ["s1", "s2"] and len(sessions) == 2
+    assert store.cached_session_count() == 1  # Listing loads nothing
+    assert sessions["s1"] is manager.get_session_history("s1")
+    assert [message.content for message in sessions["s2"].messages] == ["question 1", "answer 1"]
+    assert "s3" not in sessions
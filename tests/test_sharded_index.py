@@ -0,0 +1,169 @@
+import os
+import numpy as np
+import pytest
+from src.sharded_index import ShardedVectorStore
+
+
+def _chunks(count, start=0):
+    """Texts, metadata and ids of synthetic chunks spread over three files"""
+    texts = [f"chunk {i} about {'refund' if i % 4 == 0 else 'shipping'} code{i}" for i in range(start, start + count)]
+    metadatas = [{"file_hash": f"h{i % 3}", "file_name": f"f{i % 3}.pdf"} for i in range(start, start + count)]
+    ids = [f"c{i}" for i in range(start, start + count)]
+    return texts, metadatas, ids
+
+
+def _brute_force(store, query, allowed_ids=None):
+    """Exact cosine similarity of every live chunk (or of allowed_ids) to the query, by id"""
+    stored = store.get(include=["documents"])
+    ids = [i for i in stored["ids"] if allowed_ids is None or i in allowed_ids]
+    texts = dict(zip(stored["ids"], stored["documents"]))
+    vectors = np.array(store.embeddings.embed_documents([texts[i] for i in ids]))
+    scores = vectors @ np.array(store.embeddings.embed_query(query))
+    return dict(zip(ids, scores))
+
+
+def _assert_exact_top_k(results, expected, k):
+    """The results carry the k best scores of the brute-force search (ties may come in any order)"""
+    assert len(results) == min(k, len(expected))
+    for document, score in results:
+        assert score == pytest.approx(expected[document.id], abs=1e-5)
+    best = sorted(expected.values(), reverse=True)[:k]
+    assert [score for _, score in results] == pytest.approx(best, abs=1e-5)
+
+
+@pytest.fixture
+def store(embeddings, tmp_path):
+    store = ShardedVectorStore(embeddings, str(tmp_path / "index"), shard_size=8, dtype="float32",
+                               search_workers=2)
+    yield store
+    store.close()
+
+
+def test_add_and_delete(store):
+    texts, metadatas, ids = _chunks(20)
+    store.add_texts(texts, metadatas, ids)
+    assert len(store) == 20
+
+    store.delete(ids[:5])
+    assert len(store) == 15
+    assert sorted(store.get()["ids"]) == sorted(ids[5:])
+    assert store.get(ids=["c0"])["ids"] == []
+
+    # Re-adding an id replaces the chunk instead of duplicating it
+    store.add_texts(["chunk 7 replaced"], [metadatas[7]], ["c7"])
+    assert len(store) == 15
+    assert store.get(ids=["c7"], include=["documents"])["documents"] == ["chunk 7 replaced"]
+
+
+def test_search_across_shard_boundary(store):
+    texts, metadatas, ids = _chunks(30)
+    for start in range(0, 30, 7):  # Batches that straddle the 8-row shards
+        store.add_texts(texts[start:start + 7], metadatas[start:start + 7], ids[start:start + 7])
+    assert store.stats()["shards"] == 4
+
+    results = store.similarity_search_with_score("code29", k=5)
+    _assert_exact_top_k(results, _brute_force(store, "code29"), 5)
+    assert "c29" in [d.id for d, _ in results]  # Lives in the last, partly filled shard
+
+
+def test_tombstoned_rows_are_not_returned(store):
+    texts, metadatas, ids = _chunks(20)
+    store.add_texts(texts, metadatas, ids)
+    store.delete(["c12"])
+    results = store.similarity_search("code12", k=20)
+    assert "c12" not in [d.id for d in results]
+    assert len(results) == 19
+
+
+def test_filtered_and_unfiltered_search(store):
+    texts, metadatas, ids = _chunks(24)
+    store.add_texts(texts, metadatas, ids)
+    query = "refund code3"
+
+    unfiltered = store.similarity_search_with_score(query, k=6)
+    _assert_exact_top_k(unfiltered, _brute_force(store, query), 6)
+    assert "c3" in [d.id for d, _ in unfiltered]
+
+    allowed = {i for i, m in zip(ids, metadatas) if m["file_hash"] in ("h1", "h2")}
+    filtered = store.similarity_search_with_score(query, k=6, filter={"file_hash": {"$in": ["h1", "h2"]}})
+    _assert_exact_top_k(filtered, _brute_force(store, query, allowed), 6)
+    assert all(d.metadata["file_hash"] in ("h1", "h2") for d, _ in filtered)
+    assert "c3" not in [d.id for d, _ in filtered]
+
+    by_name = store.similarity_search(query, k=6, filter={"file_name": "f0.pdf"})
+    assert by_name and all(d.metadata["file_name"] == "f0.pdf" for d in by_name)
+
+
+def test_reopen_keeps_chunks_and_shard_size(embeddings, store):
+    texts, metadatas, ids = _chunks(20)
+    store.add_texts(texts, metadatas, ids)
+    store.delete(["c3"])
+    expected = [d.id for d in store.similarity_search("refund code8", k=5)]
+    store.close()
+
+    # A different shard_size is ignored; the files on disk decide
+    reopened = ShardedVectorStore(embeddings, store.path, shard_size=100)
+    try:
+        assert reopened.shard_size == 8
+        assert len(reopened) == 19
+        assert [d.id for d in reopened.similarity_search("refund code8", k=5)] == expected
+
+        # Appending after a restart continues the partly filled shard
+        more_texts, more_metadatas, more_ids = _chunks(5, start=20)
+        reopened.add_texts(more_texts, more_metadatas, more_ids)
+        assert reopened.stats()["shards"] == 4
+        assert "c24" in [d.id for d in reopened.similarity_search("code24", k=3)]
+    finally:
+        reopened.close()
+
+
+def test_lexical_search_after_delete(store):
+    texts, metadatas, ids = _chunks(20)
+    store.add_texts(texts, metadatas, ids)
+    assert "c8" in [d.id for d, _ in store.lexical_index.search("code8", 5)]
+
+    store.delete(["c8"])
+    assert "c8" not in [d.id for d, _ in store.lexical_index.search("code8", 5)]
+    refunds = store.lexical_index.search("refund", 10)
+    assert sorted(d.id for d, _ in refunds) == sorted(f"c{i}" for i in range(0, 20, 4) if i != 8)
+
+    # The FTS table follows replacements as well
+    store.add_texts(["chunk 4 mentions warranty"], [metadatas[4]], ["c4"])
+    assert "c4" not in [d.id for d, _ in store.lexical_index.search("refund", 10)]
+    assert [d.id for d, _ in store.lexical_index.search("warranty", 5)] == ["c4"]
+
+
+def test_lexical_search_with_filter(store):
+    texts, metadatas, ids = _chunks(24)
+    store.add_texts(texts, metadatas, ids)
+    results = store.lexical_index.search("refund", 10, {"file_hash": "h0"})
+    assert results and all(d.metadata["file_hash"] == "h0" for d, _ in results)
+
+
+def test_file_entry(store):
+    texts, metadatas, ids = _chunks(9)
+    store.add_texts(texts, metadatas, ids)
+    entry = store.file_entry("h1")
+    assert entry["name"] == "f1.pdf"
+    assert sorted(entry["chunk_ids"]) == ["c1", "c4", "c7"]
+    assert store.file_entry("missing") is None
+
+
+def test_shared_store_refuses_delete_collection(embeddings, tmp_path):
+    path = str(tmp_path / "library")
+    shared = ShardedVectorStore.open_shared(embeddings, path)
+    try:
+        assert ShardedVectorStore.open_shared(embeddings, path) is shared
+        with pytest.raises(ValueError):
+            shared.delete_collection()
+        assert os.path.exists(path)
+    finally:
+        with ShardedVectorStore._shared_lock:
+            ShardedVectorStore._shared.pop(os.path.abspath(path), None)
+        shared.close()
+
+
+def test_private_store_delete_collection(store):
+    store.add_texts(*_chunks(3))
+    store.delete_collection()
+    assert not os.path.exists(store.path)
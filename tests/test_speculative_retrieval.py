@@ -0,0 +1,52 @@
+import asyncio
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.runnables import RunnableLambda
+import pytest
+from config.settings import CONTEXTUALIZE_Q_SYSTEM_PROMPT
+from src.fakes import StubChatModel
+from src.question_rewriter import QuestionRewriter
+from src.speculative_retrieval import SpeculativeRetrieval
+
+HISTORY = [HumanMessage(content="Tell me about part PN-1"), AIMessage(content="It is a valve.")]
+
+
+def _retriever(failing_question):
+    """Retriever returning one document per question, raising for failing_question"""
+    def retrieve(question):
+        if question == failing_question:
+            raise RuntimeError("vector store unavailable")
+        return [Document(id=question, page_content=question)]
+    return RunnableLambda(retrieve)
+
+
+@pytest.fixture
+def rewriter():
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", CONTEXTUALIZE_Q_SYSTEM_PROMPT),
+        MessagesPlaceholder("chat_history"),
+        ("human", "{input}"),
+    ])
+    QuestionRewriter._cache.clear()
+    return QuestionRewriter(StubChatModel(rewrite_suffix=" of part PN-1"), prompt)
+
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_failed_speculation_falls_back_to_sequential_retrieval(rewriter, use_async):
+    question = "What does it cost?"
+    speculation = SpeculativeRetrieval(_retriever(failing_question=question), rewriter)
+    failed = SpeculativeRetrieval.get_stats()["failed"]
+    inputs = {"input": question, "chat_history": HISTORY}
+
+    if use_async:
+        inputs = asyncio.run(speculation.arewrite_inputs(inputs))
+        result = asyncio.run(speculation.aretrieve_inputs(inputs))
+    else:
+        inputs = speculation.rewrite_inputs(inputs)
+        result = speculation.retrieve_inputs(inputs)
+
+    assert "speculative_context" not in inputs
+    assert SpeculativeRetrieval.get_stats()["failed"] == failed + 1
+    assert [d.id for d in result["context"]] == [result["standalone_question"]]
+    assert result["speculative_retrieval"] is None
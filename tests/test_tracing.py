@@ -0,0 +1,13 @@
+from src.tracing import Tracer
+
+
+def test_component_stats_are_exported(monkeypatch):
+    monkeypatch.setattr(Tracer, "_stats_providers", {})
+    Tracer.register_stats("cache", lambda: {"hits": 3, "hit_rate": 0.75, "enabled": True, "model": {"load_time_s": 1.5}})
+    assert Tracer.component_stats() == {
+        "cache": {"hits": 3, "hit_rate": 0.75, "enabled": True, "model": {"load_time_s": 1.5}}
+    }
+    text = Tracer.prometheus_text()
+    assert 'rag_component_stat{component="cache",name="hits"} 3' in text
+    assert 'rag_component_stat{component="cache",name="model.load_time_s"} 1.5' in text
+    assert "enabled" not in text